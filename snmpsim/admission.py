@@ -0,0 +1,297 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# SNMP request admission control
+#
+import collections
+import os
+import time
+
+from pyasn1.error import PyAsn1Error
+from pyasn1.type import univ
+from pysnmp.proto import rfc1905
+
+from snmpsim import error
+from snmpsim import log
+from snmpsim.reporting.manager import ReportingManager
+
+DROP = "drop"
+
+# SNMPv2 error-status to SNMPv1 mapping (RFC 3584, section 4.4)
+SNMP_2TO1_ERROR_STATUS = {
+    6: 2,  # noAccess -> noSuchName
+    7: 3,  # wrongType -> badValue
+    8: 3,  # wrongLength -> badValue
+    9: 3,  # wrongEncoding -> badValue
+    10: 3,  # wrongValue -> badValue
+    11: 2,  # noCreation -> noSuchName
+    12: 3,  # inconsistentValue -> badValue
+    13: 5,  # resourceUnavailable -> genErr
+    14: 5,  # commitFailed -> genErr
+    15: 5,  # undoFailed -> genErr
+    16: 2,  # authorizationError -> noSuchName
+    17: 2,  # notWritable -> noSuchName
+    18: 2,  # inconsistentName -> noSuchName
+}
+
+Policy = collections.namedtuple("Policy", ("rate", "burst", "action"))
+
+
+class TokenBucket:
+    """Allow `rate` events per second on average, up to `burst` at once"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        """Consume a token, return `False` if there is none"""
+        tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+
+        self.updated = now
+
+        if tokens < 1:
+            self.tokens = tokens
+            return False
+
+        self.tokens = tokens - 1
+
+        return True
+
+
+def parse_policy(*args):
+    """Build rate limiting policy out of `rate[:burst[:action]]`"""
+    try:
+        rate = float(args[0])
+
+        burst = len(args) > 1 and args[1] and float(args[1]) or max(rate, 1)
+
+    except (IndexError, ValueError):
+        raise error.SnmpsimError(
+            "Malformed rate limit: %s. Expected: "
+            "rate[:burst[:action]]" % ":".join(args)
+        )
+
+    if rate <= 0 or burst < 1:
+        raise error.SnmpsimError(
+            "Rate limit must be positive and burst must be at least 1"
+        )
+
+    action = len(args) > 2 and args[2] or DROP
+
+    if action != DROP:
+        try:
+            action = int(rfc1905.errorStatus.clone(action))
+
+        except PyAsn1Error:
+            raise error.SnmpsimError(
+                "Unknown rate limit action %s. Expected: %s or SNMP "
+                "error-status name" % (action, DROP)
+            )
+
+        if not action:
+            raise error.SnmpsimError("Rate limit error-status can not be noError")
+
+    return Policy(rate, burst, action)
+
+
+class AdmissionControl:
+    """Admit SNMP requests under per-source and per-community rate limits.
+
+    Every transport peer address and every community name gets a token
+    bucket of its own, filled as set by the source and the community
+    policy respectively. A request is admitted only if there is a token
+    in its buckets, otherwise the policy action applies: the request is
+    either dropped or answered with an error-status.
+
+    Community policy may be set per simulation data directory, it then
+    applies to the community names of the data files found there.
+    Community names are those the data files are registered under (e.g.
+    `public/1.3.6.1.6.1.1.0/127.0.0.1`), requests to unknown communities
+    are left to SNMP engine to discard. Least recently used buckets are
+    forgotten once there are over `MAX_BUCKETS` of them.
+    """
+
+    MAX_BUCKETS = 65536
+
+    _source_policy = None
+
+    # data directory -> policy, None for all other directories
+    _data_dir_policies = {}
+
+    # community name -> policy, None for the default one
+    _community_policies = {}
+
+    _buckets = collections.OrderedDict()
+
+    dropped = rejected = 0
+
+    @classmethod
+    def configure_source(cls, *args):
+        cls._source_policy = parse_policy(*args)
+
+        log.info(
+            "Admitting %s request(s) per second (%s at once) from each "
+            "source address" % cls._source_policy[:2]
+        )
+
+    @classmethod
+    def configure_community(cls, spec):
+        """Set community policy given as `[data-dir=]rate[:burst[:action]]`"""
+        data_dir, _, spec = spec.rpartition("=")
+
+        if data_dir:
+            data_dir = os.path.realpath(data_dir)
+
+        else:
+            data_dir = None
+
+        cls._data_dir_policies[data_dir] = policy = parse_policy(*spec.split(":"))
+
+        log.info(
+            "Admitting %s request(s) per second (%s at once) to each "
+            "community%s" % (policy[:2] + (data_dir and " of %s" % data_dir or "",))
+        )
+
+    @classmethod
+    def is_enabled(cls):
+        return bool(cls._source_policy or cls._data_dir_policies)
+
+    @classmethod
+    def assign(cls, community, data_dir):
+        """Register community name, apply data directory policy to it"""
+        policy = cls._data_dir_policies.get(os.path.realpath(data_dir))
+
+        cls._community_policies[univ.OctetString(community).asOctets()] = policy
+
+    @classmethod
+    def _admit(cls, key, policy):
+        now = time.monotonic()
+
+        buckets = cls._buckets
+
+        try:
+            bucket = buckets[key]
+
+        except KeyError:
+            bucket = buckets[key] = TokenBucket(policy.rate, policy.burst, now)
+
+            if len(buckets) > cls.MAX_BUCKETS:
+                buckets.popitem(last=False)
+
+        else:
+            buckets.move_to_end(key)
+
+        if bucket.take(now):
+            return
+
+        if policy.action == DROP:
+            cls.dropped += 1
+
+        else:
+            cls.rejected += 1
+
+        return policy.action
+
+    @classmethod
+    def admit_source(cls, transport_domain, transport_address):
+        """Return `None` to admit request or the action to take on it"""
+        if cls._source_policy is None:
+            return
+
+        action = cls._admit(
+            (transport_domain, transport_address[0]), cls._source_policy
+        )
+
+        if action is not None and ReportingManager.is_enabled():
+            ReportingManager.update_metrics(
+                transport_domain=univ.ObjectIdentifier(transport_domain),
+                shed_reason="source-rate",
+                shed_count=1,
+            )
+
+        return action
+
+    @classmethod
+    def admit_community(cls, community):
+        """Return `None` to admit request or the action to take on it"""
+        community = bytes(community)
+
+        try:
+            policy = cls._community_policies[community]
+
+        except KeyError:
+            return
+
+        if policy is None:
+            policy = cls._data_dir_policies.get(None)
+
+            if policy is None:
+                return
+
+        action = cls._admit(community, policy)
+
+        if action is not None and ReportingManager.is_enabled():
+            ReportingManager.update_metrics(shed_reason="community-rate", shed_count=1)
+
+        return action
+
+
+class RequestDeadline:
+    """Drop SNMP requests that have waited too long to be handled.
+
+    Once the simulator falls behind, e.g. blocked by a slow variation
+    module, requests queue up at the sockets. Managers give up on them
+    after a few seconds, so requests older than `max-age` seconds by
+    the time they are handled are dropped rather than answered.
+    """
+
+    MAX_AGE = None
+
+    dropped = 0
+
+    @classmethod
+    def configure(cls, max_age):
+        if max_age <= 0:
+            raise error.SnmpsimError("Request max age must be positive")
+
+        cls.MAX_AGE = max_age
+
+        log.info("Dropping requests older than %s seconds" % max_age)
+
+    @classmethod
+    def is_enabled(cls):
+        return cls.MAX_AGE is not None
+
+    @classmethod
+    def expired(cls, transport, transport_domain):
+        """Tell if the request being received by transport is too old"""
+        arrival = getattr(transport, "arrival", None)
+
+        if arrival is None or time.time() - arrival <= cls.MAX_AGE:
+            return False
+
+        cls.dropped += 1
+
+        if ReportingManager.is_enabled():
+            ReportingManager.update_metrics(
+                transport_domain=univ.ObjectIdentifier(transport_domain),
+                shed_reason="deadline",
+                shed_count=1,
+            )
+
+        return True
+
+
+def error_status(action, version):
+    """Return error-status to answer rejected request with"""
+    if version:
+        return action
+
+    return SNMP_2TO1_ERROR_STATUS.get(action, action)
@@ -0,0 +1,494 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# Fast-path BER codec for SNMP v1/v2c messages
+#
+import collections
+
+from pyasn1.codec.ber import encoder
+from pyasn1.error import PyAsn1Error
+from pyasn1.type import univ
+from pysnmp.proto import api
+from pysnmp.proto import rfc1902
+from pysnmp.proto import rfc1905
+
+SEQUENCE = 0x30
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OBJECT_IDENTIFIER = 0x06
+
+GET_REQUEST = 0xA0
+GET_NEXT_REQUEST = 0xA1
+GET_RESPONSE = 0xA2
+SET_REQUEST = 0xA3
+TRAP = 0xA4
+GET_BULK_REQUEST = 0xA5
+INFORM_REQUEST = 0xA6
+SNMPV2_TRAP = 0xA7
+REPORT = 0xA8
+
+PDU_NAMES = {
+    GET_REQUEST: "GetRequestPDU",
+    GET_NEXT_REQUEST: "GetNextRequestPDU",
+    GET_RESPONSE: "GetResponsePDU",
+    SET_REQUEST: "SetRequestPDU",
+    TRAP: "TrapPDU",
+    GET_BULK_REQUEST: "GetBulkRequestPDU",
+    INFORM_REQUEST: "InformRequestPDU",
+    SNMPV2_TRAP: "SNMPv2TrapPDU",
+    REPORT: "ReportPDU",
+}
+
+NULL_VALUE = univ.Null("")
+
+# largest message fitting UDP datagram
+MAX_MESSAGE_SIZE = 65535
+
+Request = collections.namedtuple(
+    "Request",
+    (
+        "version",
+        "community",
+        "pdu_type",
+        "request_id",
+        "non_repeaters",
+        "max_repetitions",
+        "var_binds",
+    ),
+)
+Request.__doc__ = """SNMP v1/v2c request message.
+
+`pdu_type` is BER tag of the PDU, `var_binds` is a list of
+`(ObjectName, value)` tuples. GETBULK parameters are zero for
+other PDU types.
+"""
+
+
+def _header(data, offset, tag):
+    """Return content boundaries of definite-length TLV at `offset`"""
+    if data[offset] != tag:
+        raise ValueError()
+
+    length = data[offset + 1]
+
+    offset += 2
+
+    if length & 0x80:
+        size = length & 0x7F
+
+        # indefinite length or unreasonably long message
+        if not size or size > 4:
+            raise ValueError()
+
+        length = int.from_bytes(data[offset : offset + size], "big")
+
+        offset += size
+
+    end = offset + length
+
+    if end > len(data):
+        raise ValueError()
+
+    return offset, end
+
+
+def _integer(data, offset):
+    """Return INTEGER value at `offset` and offset past it"""
+    start, end = _header(data, offset, INTEGER)
+
+    if start == end:
+        raise ValueError()
+
+    return int.from_bytes(data[start:end], "big", signed=True), end
+
+
+def _object_identifier(data, start, end):
+    if start == end or data[end - 1] & 0x80:
+        raise ValueError()
+
+    arcs = []
+    arc = 0
+
+    for octet in data[start:end]:
+        # non-minimal sub-identifier encoding
+        if not arc and octet == 0x80:
+            raise ValueError()
+
+        arc = arc << 7 | octet & 0x7F
+
+        if not octet & 0x80:
+            arcs.append(arc)
+            arc = 0
+
+    first = arcs[0]
+
+    if first < 40:
+        arcs[0:1] = 0, first
+
+    elif first < 80:
+        arcs[0:1] = 1, first - 40
+
+    else:
+        arcs[0:1] = 2, first - 80
+
+    return tuple(arcs)
+
+
+def decode_request(data):
+    """Decode SNMP v1/v2c GET, GETNEXT or GETBULK request message.
+
+    Only handles a single message carrying NULL values. Returns
+    `Request` or `None` for any other (including malformed) data,
+    which should be decoded by pyasn1.
+    """
+    try:
+        start, end = _header(data, 0, SEQUENCE)
+
+        if end != len(data):
+            return
+
+        version, offset = _integer(data, start)
+
+        if version not in (0, 1):
+            return
+
+        start, offset = _header(data, offset, OCTET_STRING)
+
+        community = univ.OctetString(data[start:offset])
+
+        pdu_type = data[offset]
+
+        if pdu_type not in (GET_REQUEST, GET_NEXT_REQUEST, GET_BULK_REQUEST):
+            return
+
+        if pdu_type == GET_BULK_REQUEST and not version:
+            return
+
+        start, pdu_end = _header(data, offset, pdu_type)
+
+        if pdu_end != end:
+            return
+
+        request_id, offset = _integer(data, start)
+        non_repeaters, offset = _integer(data, offset)
+        max_repetitions, offset = _integer(data, offset)
+
+        # leave out-of-range values to pyasn1 constraints to report
+        if version and not (
+            -0x80000000 <= request_id <= 0x7FFFFFFF
+            and 0 <= max_repetitions <= rfc1905.max_bindings
+            and (
+                pdu_type != GET_BULK_REQUEST
+                or 0 <= non_repeaters <= rfc1905.max_bindings
+            )
+        ):
+            return
+
+        offset, var_binds_end = _header(data, offset, SEQUENCE)
+
+        if var_binds_end != end:
+            return
+
+        var_binds = []
+
+        while offset < end:
+            start, var_bind_end = _header(data, offset, SEQUENCE)
+            start, offset = _header(data, start, OBJECT_IDENTIFIER)
+
+            name = rfc1902.ObjectName(_object_identifier(data, start, offset))
+
+            if data[offset : offset + 2] != b"\x05\x00":
+                return
+
+            offset += 2
+
+            if offset != var_bind_end:
+                return
+
+            var_binds.append((name, NULL_VALUE))
+
+    except (IndexError, ValueError):
+        return
+
+    if pdu_type != GET_BULK_REQUEST:
+        non_repeaters = max_repetitions = 0
+
+    return Request(
+        version,
+        community,
+        pdu_type,
+        request_id,
+        non_repeaters,
+        max_repetitions,
+        var_binds,
+    )
+
+
+def decode_community(data):
+    """Return community name of SNMP v1/v2c message or `None`"""
+    try:
+        start, end = _header(data, 0, SEQUENCE)
+
+        version, offset = _integer(data, start)
+
+        if version not in (0, 1):
+            return
+
+        start, end = _header(data, offset, OCTET_STRING)
+
+    except (IndexError, ValueError):
+        return
+
+    return data[start:end]
+
+
+def request_from_message(p_mod, msg):
+    """Build `Request` out of pyasn1 SNMP v1/v2c message"""
+    pdu = p_mod.apiMessage.get_pdu(msg)
+
+    tag = pdu.tagSet[-1]
+
+    pdu_type = tag.tagClass | tag.tagFormat | tag.tagId
+
+    if pdu_type == GET_BULK_REQUEST:
+        non_repeaters = int(p_mod.apiBulkPDU.get_non_repeaters(pdu))
+        max_repetitions = int(p_mod.apiBulkPDU.get_max_repetitions(pdu))
+
+    else:
+        non_repeaters = max_repetitions = 0
+
+    # SNMPv1 trap PDU is shaped differently
+    if pdu_type == TRAP:
+        request_id, var_binds = 0, []
+
+    else:
+        request_id = int(p_mod.apiPDU.get_request_id(pdu))
+        var_binds = p_mod.apiPDU.get_varbinds(pdu)
+
+    return Request(
+        int(p_mod.apiMessage.get_version(msg)),
+        p_mod.apiMessage.get_community(msg),
+        pdu_type,
+        request_id,
+        non_repeaters,
+        max_repetitions,
+        var_binds,
+    )
+
+
+def _length_octets(length):
+    """BER-encode length of contents"""
+    if length < 0x80:
+        return bytes((length,))
+
+    octets = length.to_bytes((length.bit_length() + 7) // 8, "big")
+
+    return bytes((0x80 | len(octets),)) + octets
+
+
+def _tlv(tag, octets):
+    """BER-encode tag, length and contents octets"""
+    return tag + _length_octets(len(octets)) + octets
+
+
+def _integer_octets(value):
+    value = int(value)
+
+    # pyasn1 may spend an extra octet on negative values
+    return value.to_bytes(value.bit_length() // 8 + 1, "big", signed=True)
+
+
+def _octet_string_octets(value):
+    return value.asOctets()
+
+
+def _null_octets(value):
+    return b""
+
+
+def _object_identifier_octets(value):
+    arcs = value.asTuple()
+
+    first, second = arcs[0], arcs[1]
+
+    if first == 2:
+        arcs = (second + 80,) + arcs[2:]
+
+    elif first in (0, 1) and 0 <= second <= 39:
+        arcs = (first * 40 + second,) + arcs[2:]
+
+    else:
+        raise ValueError()
+
+    if max(arcs) < 0x80:
+        return bytes(arcs)
+
+    octets = bytearray()
+
+    for arc in arcs:
+        if arc < 0x80:
+            octets.append(arc)
+            continue
+
+        chunk = [arc & 0x7F]
+
+        arc >>= 7
+
+        while arc:
+            chunk.append(0x80 | arc & 0x7F)
+            arc >>= 7
+
+        octets.extend(reversed(chunk))
+
+    return bytes(octets)
+
+
+def _tag_octet(typ):
+    tag = typ.tagSet[-1]
+
+    return bytes((tag.tagClass | tag.tagFormat | tag.tagId,))
+
+
+# value type -> (BER tag, contents encoder)
+VALUE_ENCODERS = {
+    typ.tagSet: (_tag_octet(typ), fun)
+    for typ, fun in (
+        (rfc1902.Integer32, _integer_octets),
+        (rfc1902.OctetString, _octet_string_octets),
+        (univ.Null, _null_octets),
+        (univ.ObjectIdentifier, _object_identifier_octets),
+        (rfc1902.IpAddress, _octet_string_octets),
+        (rfc1902.Counter32, _integer_octets),
+        (rfc1902.Gauge32, _integer_octets),
+        (rfc1902.TimeTicks, _integer_octets),
+        (rfc1902.Opaque, _octet_string_octets),
+        (rfc1902.Counter64, _integer_octets),
+        (rfc1905.NoSuchObject, _null_octets),
+        (rfc1905.NoSuchInstance, _null_octets),
+        (rfc1905.EndOfMibView, _null_octets),
+    )
+}
+
+_SEQUENCE = bytes((SEQUENCE,))
+_INTEGER = bytes((INTEGER,))
+_OCTET_STRING = bytes((OCTET_STRING,))
+_OBJECT_IDENTIFIER = bytes((OBJECT_IDENTIFIER,))
+_GET_RESPONSE = bytes((GET_RESPONSE,))
+
+
+class ResponseEncoder:
+    """BER encoder of SNMP v1/v2c response messages.
+
+    The message is built back to front in a preallocated buffer, so
+    that the lengths of constructed values are known by the time their
+    headers are written. The buffer grows should the message not fit
+    in. The output is identical to what pyasn1 makes of the same
+    response.
+
+    Var-binds carrying values of other than SNMP base types are left
+    to pyasn1 to encode.
+    """
+
+    def __init__(self, size=MAX_MESSAGE_SIZE):
+        self._buffer = bytearray(size)
+
+    def _write(self, offset, octets):
+        """Write `octets` to the buffer right before `offset`"""
+        start = offset - len(octets)
+
+        if start < 0:
+            raise OverflowError()
+
+        self._buffer[start:offset] = octets
+
+        return start
+
+    def _write_var_binds(self, version, var_binds):
+        """Write var-bind list to the end of the buffer, return its offset"""
+        end = offset = len(self._buffer)
+
+        if isinstance(var_binds, bytes):
+            return self._write(end, var_binds)
+
+        try:
+            for name, value in reversed(var_binds):
+                tag, encode = VALUE_ENCODERS[value.tagSet]
+
+                offset = self._write(
+                    offset,
+                    _tlv(
+                        _SEQUENCE,
+                        _tlv(_OBJECT_IDENTIFIER, _object_identifier_octets(name))
+                        + _tlv(tag, encode(value)),
+                    ),
+                )
+
+        except (KeyError, IndexError, ValueError, PyAsn1Error):
+            p_mod = api.PROTOCOL_MODULES[version]
+
+            pdu = p_mod.GetResponsePDU()
+            p_mod.apiPDU.set_varbinds(pdu, var_binds)
+
+            return self._write(end, encoder.encode(p_mod.apiPDU.get_varbind_list(pdu)))
+
+        return self._write(offset, _SEQUENCE + _length_octets(end - offset))
+
+    def _write_message(
+        self, version, community, request_id, error_status, error_index, var_binds
+    ):
+        """Write response message to the end of the buffer, return its offset"""
+        offset = self._write_var_binds(version, var_binds)
+
+        length = len(self._buffer) - offset
+
+        pdu = (
+            _tlv(_INTEGER, _integer_octets(request_id))
+            + _tlv(_INTEGER, _integer_octets(error_status))
+            + _tlv(_INTEGER, _integer_octets(error_index))
+        )
+
+        message = (
+            _tlv(_INTEGER, _integer_octets(version))
+            + _tlv(_OCTET_STRING, bytes(community))
+            + _GET_RESPONSE
+            + _length_octets(len(pdu) + length)
+            + pdu
+        )
+
+        return self._write(
+            offset, _SEQUENCE + _length_octets(len(message) + length) + message
+        )
+
+    def _encode(self, write, *args):
+        while True:
+            try:
+                return bytes(self._buffer[write(*args) :])
+
+            except OverflowError:
+                self._buffer = bytearray(len(self._buffer) * 2)
+
+    def encode_var_binds(self, version, var_binds):
+        """Return BER-encoded var-bind list of SNMP v1/v2c response"""
+        return self._encode(self._write_var_binds, version, var_binds)
+
+    def encode(
+        self, version, community, request_id, error_status, error_index, var_binds
+    ):
+        """Return BER-encoded SNMP v1/v2c response message.
+
+        `var_binds` is a sequence of `(ObjectName, value)` tuples or
+        var-bind list returned by `encode_var_binds`.
+        """
+        return self._encode(
+            self._write_message,
+            version,
+            community,
+            request_id,
+            error_status,
+            error_index,
+            var_binds,
+        )
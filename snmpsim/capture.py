@@ -0,0 +1,280 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# SNMP traffic capture
+#
+import atexit
+import collections
+import glob
+import os
+import struct
+import time
+
+from snmpsim import error
+from snmpsim import log
+
+MAGIC = b"SNMPSIM-CAPTURE/1\n"
+
+REQUEST = 0
+RESPONSE = 1
+
+# sequence number, timestamp, direction, transport info and message sizes
+RECORD = struct.Struct("!IdBHI")
+
+SEGMENT_NAME = "capture-%03d.bin"
+SEGMENT_GLOB = "capture-*.bin"
+
+
+class TrafficCapture:
+    """Capture raw SNMP messages into on-disk ring buffer.
+
+    Captured requests and responses, along with their arrival or
+    departure time and peer transport information, are appended to
+    one of a fixed number of segment files. Once current segment
+    outgrows its share of `max-size`, the oldest segment is overwritten.
+
+    Responses are paired with requests by sequence number. Unless the
+    sequence number of the request is given along with the response,
+    the response is paired with the last request from the same peer.
+    Up to `MAX_PENDING` peers are tracked. Unpaired responses get
+    sequence number 0, which no request has.
+    """
+
+    MAX_SIZE = 64 * 1024 * 1024
+    SEGMENTS = 8
+    MAX_PENDING = 65536
+
+    _capture_dir = None
+    _segment = None
+    _segment_index = 0
+    _segment_size = 0
+    _sequence = 0
+
+    # peer -> sequence number of its last request not yet responded
+    _pending = collections.OrderedDict()
+
+    @classmethod
+    def configure(cls, *args):
+        if not args:
+            raise error.SnmpsimError(
+                "Missing capture parameter(s). Expected: "
+                "<capture-dir>[:max-size[:segments]]"
+            )
+
+        # daemon changes working directory
+        cls._capture_dir = os.path.abspath(args[0])
+
+        try:
+            if len(args) > 1 and args[1]:
+                cls.MAX_SIZE = int(args[1])
+
+            if len(args) > 2 and args[2]:
+                cls.SEGMENTS = int(args[2])
+
+        except ValueError:
+            raise error.SnmpsimError(
+                "Malformed capture parameters: %s" % ":".join(args[1:])
+            )
+
+        if cls.MAX_SIZE <= 0 or cls.SEGMENTS <= 0:
+            raise error.SnmpsimError("Capture size and segments must be positive")
+
+        try:
+            if not os.path.exists(cls._capture_dir):
+                os.makedirs(cls._capture_dir)
+
+            # captures of previous runs would mix with this one
+            for path in glob.glob(os.path.join(cls._capture_dir, SEGMENT_GLOB)):
+                os.unlink(path)
+
+        except OSError as exc:
+            raise error.SnmpsimError(
+                "Failed to prepare capture directory %s: "
+                "%s" % (cls._capture_dir, exc)
+            )
+
+        cls._segment_index = -1
+        cls._next_segment()
+
+        atexit.register(cls.stop)
+
+        log.info(
+            "Capturing SNMP traffic into %s, up to %s bytes in %s "
+            "segments" % (cls._capture_dir, cls.MAX_SIZE, cls.SEGMENTS)
+        )
+
+    @classmethod
+    def is_enabled(cls):
+        return cls._segment is not None
+
+    @classmethod
+    def _next_segment(cls):
+        if cls._segment:
+            cls._segment.close()
+
+        cls._segment_index = (cls._segment_index + 1) % cls.SEGMENTS
+
+        path = os.path.join(cls._capture_dir, SEGMENT_NAME % cls._segment_index)
+
+        try:
+            cls._segment = open(path, "wb")
+            cls._segment.write(MAGIC)
+
+        except OSError as exc:
+            log.error("Capture stopped, failed to open %s: %s" % (path, exc))
+            cls._segment = None
+            return
+
+        cls._segment_size = len(MAGIC)
+
+    @classmethod
+    def _write(cls, sequence, direction, transport_domain, transport_address, message):
+        info = "%s %s %s" % (
+            ".".join([str(x) for x in transport_domain]),
+            transport_address[0],
+            transport_address[1],
+        )
+        info = info.encode("utf-8")
+
+        record = RECORD.pack(sequence, time.time(), direction, len(info), len(message))
+
+        size = len(record) + len(info) + len(message)
+
+        if cls._segment_size + size > cls.MAX_SIZE // cls.SEGMENTS:
+            cls._next_segment()
+
+            if not cls._segment:
+                return
+
+        try:
+            cls._segment.write(record + info + message)
+
+        except OSError as exc:
+            log.error("Capture stopped, write failed: %s" % exc)
+
+            try:
+                cls._segment.close()
+
+            except OSError:
+                pass
+
+            cls._segment = None
+            return
+
+        cls._segment_size += size
+
+    @classmethod
+    def request(cls, transport_domain, transport_address, message):
+        """Capture incoming SNMP message, return its sequence number"""
+        # zero is for unpaired responses
+        cls._sequence = cls._sequence % 0xFFFFFFFF + 1
+
+        pending = cls._pending
+
+        peer = tuple(transport_domain), tuple(transport_address)
+
+        pending[peer] = cls._sequence
+        pending.move_to_end(peer)
+
+        if len(pending) > cls.MAX_PENDING:
+            pending.popitem(last=False)
+
+        cls._write(
+            cls._sequence, REQUEST, transport_domain, transport_address, bytes(message)
+        )
+
+        return cls._sequence
+
+    @classmethod
+    def response(cls, transport_domain, transport_address, message, sequence=None):
+        """Capture SNMP message sent in response to request `sequence`.
+
+        Pair the response with the last request from the peer if
+        `sequence` is not known.
+        """
+        peer = tuple(transport_domain), tuple(transport_address)
+
+        if sequence is None:
+            sequence = cls._pending.pop(peer, 0)
+
+        elif cls._pending.get(peer) == sequence:
+            del cls._pending[peer]
+
+        cls._write(
+            sequence, RESPONSE, transport_domain, transport_address, bytes(message)
+        )
+
+    @classmethod
+    def stop(cls):
+        if cls._segment:
+            cls._segment.close()
+            cls._segment = None
+
+
+def _read_segment(path):
+    records = []
+
+    with open(path, "rb") as segment:
+        magic = segment.read(len(MAGIC))
+
+        # segment being written may not be flushed yet
+        if not magic:
+            return records
+
+        if magic != MAGIC:
+            raise error.SnmpsimError("Not an SNMP capture file: %s" % path)
+
+        while True:
+            header = segment.read(RECORD.size)
+
+            if len(header) < RECORD.size:
+                break
+
+            sequence, timestamp, direction, info_size, message_size = RECORD.unpack(
+                header
+            )
+
+            info = segment.read(info_size)
+            message = segment.read(message_size)
+
+            # last record may be truncated by a crash
+            if len(info) < info_size or len(message) < message_size:
+                break
+
+            domain, host, port = info.decode("utf-8").rsplit(" ", 2)
+
+            records.append(
+                (
+                    sequence,
+                    timestamp,
+                    direction,
+                    tuple(int(x) for x in domain.split(".")),
+                    (host, int(port)),
+                    message,
+                )
+            )
+
+    return records
+
+
+def read_capture(capture_dir):
+    """Return captured records, oldest first.
+
+    Each record is a tuple of sequence number, timestamp, direction
+    (`REQUEST` or `RESPONSE`), transport domain, peer address and
+    raw SNMP message.
+    """
+    segments = []
+
+    for path in glob.glob(os.path.join(capture_dir, SEGMENT_GLOB)):
+        records = _read_segment(path)
+
+        if records:
+            segments.append(records)
+
+    segments.sort(key=lambda x: x[0][1])
+
+    return [record for records in segments for record in records]
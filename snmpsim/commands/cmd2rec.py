@@ -393,11 +393,8 @@ def main():
                 log.info('Variation module "%s" not found' % mod)
                 continue
 
-            ctx = {"path": mod, "moduleContext": {}}
-
             try:
-                with open(mod) as fl:
-                    exec(compile(fl.read(), mod, "exec"), ctx)
+                ctx = variation.load_module(mod, moduleContext={})
 
             except Exception as exc:
                 log.error('Variation module "%s" execution failure: ' "%s" % (mod, exc))
@@ -0,0 +1,383 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# SNMP notifications storm generator
+#
+import argparse
+import os
+import random
+import sys
+import time
+import traceback
+
+from pysnmp import debug as pysnmp_debug
+from pysnmp.entity import engine
+
+from snmpsim import confdir
+from snmpsim import datafile
+from snmpsim import error
+from snmpsim import log
+from snmpsim import utils
+from snmpsim.originator import NotificationOriginator
+from snmpsim.originator import get_auth_data
+from snmpsim.originator import get_notification_type
+from snmpsim.originator import parse_notification_options
+from snmpsim.record import snmprec
+
+DESCRIPTION = (
+    "Send SNMP TRAP/INFORM notifications configured by the notification "
+    "variation module in simulation data at a steady aggregate rate. "
+    "Online documentation at https://www.pysnmp.com/snmpsim"
+)
+
+
+def _parse_endpoint(arg):
+    host, _, port = arg.rpartition(":")
+
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError('Endpoint "%s" must be HOST:PORT' % arg)
+
+    return host.strip("[]"), int(port)
+
+
+def _scan_notifications(data_dirs, args):
+    """Collect notification records from simulation data files"""
+    sources = []
+
+    for data_dir in data_dirs:
+        log.info('Scanning "%s" directory for notification records...' % data_dir)
+
+        if not os.path.exists(data_dir):
+            log.info('Directory "%s" does not exist' % data_dir)
+            continue
+
+        for full_path, data_file_type, ident in datafile.get_data_files(data_dir):
+            if not isinstance(data_file_type, snmprec.SnmprecRecord):
+                continue
+
+            with data_file_type.open(full_path) as data_file:
+                for line in data_file:
+                    if line.startswith(b"#"):
+                        continue
+
+                    try:
+                        oid, tag, value = data_file_type.grammar.parse(line)
+
+                    except error.SnmpsimError:
+                        continue
+
+                    if not tag.endswith(":notification"):
+                        continue
+
+                    settings = parse_notification_options(value)
+
+                    if args.target_address:
+                        settings["host"], settings["port"] = args.target_address
+
+                    # SNMPv1 does not support INFORM
+                    if args.notification_type and settings.get("version") != "1":
+                        settings["ntftype"] = args.notification_type
+
+                    if "host" not in settings:
+                        log.info(
+                            "%s: target hostname not configured for OID "
+                            "%s" % (ident, oid)
+                        )
+                        continue
+
+                    try:
+                        auth_data = get_auth_data(settings)
+                        notification_type = get_notification_type(settings)
+
+                    except Exception as exc:
+                        log.error("%s: OID %s: %s" % (ident, oid, exc))
+                        continue
+
+                    sources.append((ident, oid, settings, auth_data, notification_type))
+
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+
+    parser.add_argument("-v", "--version", action="version", version=utils.TITLE)
+
+    parser.add_argument(
+        "--debug",
+        choices=pysnmp_debug.flagMap,
+        action="append",
+        type=str,
+        default=[],
+        help="Enable one or more categories of SNMP debugging.",
+    )
+
+    parser.add_argument(
+        "--logging-method",
+        type=lambda x: x.split(":"),
+        metavar="=<%s[:args]>]" % "|".join(log.METHODS_MAP),
+        default="stderr",
+        help="Logging method.",
+    )
+
+    parser.add_argument(
+        "--log-level",
+        choices=log.LEVELS_MAP,
+        type=str,
+        default="info",
+        help="Logging level.",
+    )
+
+    parser.add_argument(
+        "--data-dir",
+        dest="data_dirs",
+        metavar="<DIR>",
+        action="append",
+        type=str,
+        help="SNMP simulation data directory to take notification records from",
+    )
+
+    parser.add_argument(
+        "--target-address",
+        metavar="<HOST:PORT>",
+        type=_parse_endpoint,
+        help="Send all notifications to this address rather than configured "
+        "in simulation data",
+    )
+
+    parser.add_argument(
+        "--notification-type",
+        choices=["trap", "inform"],
+        help="Send notifications of this type rather than configured "
+        "in simulation data",
+    )
+
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=100,
+        help="Aggregate number of notifications to send per second",
+    )
+
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0,
+        help="Randomize intervals between notifications by up to this "
+        "fraction of the mean interval (0..1)",
+    )
+
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=0,
+        help="Stop after this many seconds (0 means no limit)",
+    )
+
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=0,
+        help="Stop after sending this many notifications (0 means no limit)",
+    )
+
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=1024,
+        help="Maximum number of notifications being sent at the same time",
+    )
+
+    parser.add_argument(
+        "--timeout", type=float, default=1, help="INFORM response timeout"
+    )
+
+    parser.add_argument("--retries", type=int, default=3, help="INFORM retries")
+
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=10,
+        help="Log sending statistics every this many seconds",
+    )
+
+    args = parser.parse_args()
+
+    if args.debug:
+        pysnmp_debug.set_logger(pysnmp_debug.Debug(*args.debug))
+
+    if args.rate <= 0:
+        sys.stderr.write("ERROR: --rate must be positive\r\n")
+        parser.print_usage(sys.stderr)
+        return 1
+
+    if not 0 <= args.jitter <= 1:
+        sys.stderr.write("ERROR: --jitter must be within 0..1\r\n")
+        parser.print_usage(sys.stderr)
+        return 1
+
+    proc_name = os.path.basename(sys.argv[0])
+
+    try:
+        log.set_logger(proc_name, *args.logging_method, force=True)
+
+        if args.log_level:
+            log.set_level(args.log_level)
+
+    except error.SnmpsimError as exc:
+        sys.stderr.write("%s\r\n" % exc)
+        parser.print_usage(sys.stderr)
+        return 1
+
+    sources = _scan_notifications(args.data_dirs or confdir.data, args)
+
+    if not sources:
+        log.error("no notification records found in simulation data")
+        return 1
+
+    log.info(
+        "%d notification records found, sending at %s notifications/sec"
+        % (len(sources), args.rate)
+    )
+
+    snmp_engine = engine.SnmpEngine()
+
+    originator = NotificationOriginator(queue_size=args.queue_size)
+
+    latencies = []
+
+    def cb_fun(error_indication, error_status, error_index, latency, cb_ctx):
+        if error_indication or error_status:
+            log.debug(
+                "%s: notification for OID %s failed: %s"
+                % (cb_ctx[0], cb_ctx[1], error_indication or error_status)
+            )
+
+        else:
+            latencies.append(latency)
+
+    def report(interval):
+        counters = originator.collect()
+
+        current_latencies = latencies[:]
+        del latencies[: len(current_latencies)]
+
+        log.info(
+            "sent %d (%.2f/sec), failed %d, dropped %d, INFORM retries %d, "
+            "latency avg %.3f max %.3f sec"
+            % (
+                counters["sent"],
+                interval and counters["sent"] / interval or 0,
+                counters["failed"],
+                counters["dropped"],
+                counters["retried"],
+                current_latencies
+                and sum(current_latencies) / len(current_latencies)
+                or 0,
+                current_latencies and max(current_latencies) or 0,
+            )
+        )
+
+    interval = 1.0 / args.rate
+
+    started = last_report = next_send = time.time()
+
+    submitted = 0
+
+    try:
+        while True:
+            now = time.time()
+
+            if args.duration and now - started >= args.duration:
+                break
+
+            if args.count and submitted >= args.count:
+                break
+
+            while next_send <= now:
+                ident, oid, settings, auth_data, notification_type = sources[
+                    submitted % len(sources)
+                ]
+
+                try:
+                    target = originator.get_target(
+                        settings["proto"],
+                        settings["host"],
+                        int(settings["port"]),
+                        settings.get("bindaddr"),
+                        auth_data=auth_data,
+                        timeout=args.timeout,
+                        retries=0,
+                    )
+
+                except Exception as exc:
+                    log.error("%s: OID %s: %s" % (ident, oid, exc))
+
+                else:
+                    originator.submit(
+                        snmp_engine,
+                        auth_data,
+                        target,
+                        settings["ntftype"],
+                        notification_type,
+                        retries=args.retries,
+                        cb_fun=cb_fun,
+                        cb_ctx=(ident, oid),
+                    )
+
+                submitted += 1
+
+                if args.count and submitted >= args.count:
+                    break
+
+                next_send += interval * (1 + args.jitter * random.uniform(-1, 1))
+
+            if now - last_report >= args.report_interval:
+                report(now - last_report)
+                last_report = now
+
+            time.sleep(max(0, min(next_send - time.time(), 0.1)))
+
+    except KeyboardInterrupt:
+        log.info("shutting down...")
+
+    # let in-flight notifications complete
+    deadline = time.time() + args.timeout * (args.retries + 1) + 5
+
+    while originator.stats()["pending"] and time.time() < deadline:
+        time.sleep(0.1)
+
+    report(time.time() - last_report)
+
+    originator.stop(timeout=1)
+
+    stats = originator.stats()
+
+    log.info(
+        "total sent %(sent)d (%(rate).2f/sec), failed %(failed)d, "
+        "dropped %(dropped)d, INFORM retries %(retried)d, average latency "
+        "%(latency).3f sec" % stats
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        rc = main()
+
+    except KeyboardInterrupt:
+        sys.stderr.write("shutting down process...")
+        rc = 0
+
+    except Exception as exc:
+        sys.stderr.write("process terminated: %s" % exc)
+
+        for line in traceback.format_exception(*sys.exc_info()):
+            sys.stderr.write(line.replace("\n", ";"))
+        rc = 1
+
+    sys.exit(rc)
@@ -38,6 +38,7 @@ from snmpsim import confdir
 from snmpsim import error
 from snmpsim import log
 from snmpsim import utils
+from snmpsim import variation
 from snmpsim.record import dump
 from snmpsim.record import mvc
 from snmpsim.record import sap
@@ -337,11 +338,8 @@ def main():
                 log.info('Variation module "%s" not found' % mod)
                 continue
 
-            ctx = {"path": mod, "moduleContext": {}}
-
             try:
-                with open(mod) as fl:
-                    exec(compile(fl.read(), mod, "exec"), ctx)
+                ctx = variation.load_module(mod, moduleContext={})
 
             except Exception as exc:
                 log.error('Variation module "%s" execution ' "failure: %s" % (mod, exc))
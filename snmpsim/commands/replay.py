@@ -0,0 +1,468 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# SNMP traffic capture replay tool
+#
+import argparse
+import collections
+import os
+import select
+import socket
+import sys
+import time
+import traceback
+
+from pyasn1.codec.ber import decoder
+from pyasn1.codec.ber import encoder
+from pyasn1.error import PyAsn1Error
+from pysnmp.proto import api
+from pysnmp.proto.mpmod import rfc3412
+
+from snmpsim import capture
+from snmpsim import error
+from snmpsim import log
+from snmpsim import utils
+
+DESCRIPTION = (
+    "Re-send SNMP requests captured by SNMP command responder against "
+    "SNMP simulator on the captured schedule, report response latency, "
+    "schedule lag and responses differing from the captured ones. "
+    "Online documentation at https://www.pysnmp.com/snmpsim"
+)
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def _parse_endpoint(arg):
+    host, _, port = arg.rpartition(":")
+
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError('Endpoint "%s" must be HOST:PORT' % arg)
+
+    return host.strip("[]"), int(port)
+
+
+def _collect_requests(records, values=False):
+    """Pair captured requests with captured responses.
+
+    Returns a list of request timestamp, SNMP message, its request ID
+    and contents of the captured response or `None`.
+    """
+    requests = []
+    responses = {}
+
+    for sequence, timestamp, direction, _, _, message in records:
+        if direction == capture.REQUEST:
+            requests.append((sequence, timestamp, message))
+
+        elif direction == capture.RESPONSE:
+            responses[sequence] = message
+
+    collected = []
+
+    for sequence, timestamp, message in requests:
+        request_id, _ = _decode(message)
+
+        expected = responses.get(sequence)
+
+        if expected is not None:
+            _, pdu = _decode(expected)
+
+            expected = _contents(pdu, values)
+
+        collected.append((timestamp, message, request_id, expected))
+
+    return collected
+
+
+def _decode(message):
+    """Return request ID and PDU of SNMP message.
+
+    SNMP v1/v2c messages are identified by PDU request-id, SNMPv3
+    messages by msgID. PDU is `None` if it is encrypted. Returns
+    `(None, None)` if message can not be decoded.
+    """
+    try:
+        version = int(api.decodeMessageVersion(message))
+
+        if version in api.PROTOCOL_MODULES:
+            msg, _ = decoder.decode(
+                message, asn1Spec=api.PROTOCOL_MODULES[version].Message()
+            )
+
+            pdu = msg["data"].getComponent()
+
+            return int(pdu["request-id"]), pdu
+
+        if version == 3:
+            msg, _ = decoder.decode(message, asn1Spec=rfc3412.SNMPv3Message())
+
+            key = int(msg["msgGlobalData"]["msgID"])
+
+            if msg["msgData"].getName() != "plaintext":
+                return key, None
+
+            return key, msg["msgData"]["plaintext"]["data"].getComponent()
+
+    # malformed data breaks pyasn1 in many ways
+    except Exception:
+        pass
+
+    return None, None
+
+
+def _contents(pdu, values=False):
+    """Return comparable contents of response PDU or `None`.
+
+    Contents are error-status, error-index and var-bind names, along
+    with var-bind values (type included) if `values` is set.
+    """
+    if pdu is None:
+        return
+
+    try:
+        var_binds = tuple(
+            (tuple(var_bind[0]), values and encoder.encode(var_bind[1]) or None)
+            for var_bind in pdu["variable-bindings"]
+        )
+
+        return int(pdu["error-status"]), int(pdu["error-index"]), var_binds
+
+    except (PyAsn1Error, KeyError):
+        return
+
+
+def _percentile(values, fraction):
+    """Return nearest-rank percentile of sorted values"""
+    if not values:
+        return 0
+
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def _replay(sock, requests, speed, timeout, values=False):
+    """Send requests on schedule, match responses to them.
+
+    Each request in `requests` is a tuple of capture timestamp, SNMP
+    message, its request ID and captured response contents (as returned
+    by `_contents`) or `None`. Requests are sent at captured time
+    intervals divided by `speed`, regardless of responses to previous
+    requests still being awaited. With `speed` of 0 the next request
+    is sent once no response is awaited.
+
+    Responses are matched to requests by request ID, the oldest
+    request awaiting a response first. Requests not responded within
+    `timeout` seconds time out, responses arriving later are counted
+    as unmatched.
+
+    Responses are compared with the captured ones by error-status,
+    error-index and var-bind names, also by var-bind values if `values`
+    is set. Responses lacking captured counterpart or contents (e.g.
+    encrypted) are not compared.
+
+    Returns response latencies, send lags behind schedule and the
+    number of timed out, mismatched, uncompared and unmatched responses.
+    Replay is cut short by `KeyboardInterrupt`.
+    """
+    latencies = []
+    lags = []
+
+    counters = dict.fromkeys(("timed_out", "mismatched", "uncompared", "unmatched"), 0)
+
+    # request index -> (request ID, send time, expected contents)
+    outstanding = {}
+
+    # request ID -> indices of outstanding requests, in send order
+    by_id = collections.defaultdict(collections.deque)
+
+    # (deadline, request index), ordered as timeout is the same for all
+    deadlines = collections.deque()
+
+    started = time.perf_counter()
+    first_timestamp = requests[0][0]
+
+    idx = 0
+
+    try:
+        while idx < len(requests) or outstanding:
+            now = time.perf_counter()
+
+            while idx < len(requests):
+                timestamp, request, request_id, expected = requests[idx]
+
+                if speed:
+                    due = started + (timestamp - first_timestamp) / speed
+
+                    if due > now:
+                        break
+
+                    lags.append(now - due)
+
+                elif outstanding:
+                    break
+
+                try:
+                    sock.send(request)
+
+                except OSError as exc:
+                    log.error("failed to send request #%d: %s" % (idx, exc))
+
+                else:
+                    sent = time.perf_counter()
+
+                    outstanding[idx] = request_id, sent, expected
+                    by_id[request_id].append(idx)
+                    deadlines.append((sent + timeout, idx))
+
+                idx += 1
+
+            while deadlines and deadlines[0][0] <= now:
+                _, expired = deadlines.popleft()
+
+                if expired not in outstanding:
+                    continue
+
+                request_id, _, _ = outstanding.pop(expired)
+
+                by_id[request_id].remove(expired)
+
+                if not by_id[request_id]:
+                    del by_id[request_id]
+
+                counters["timed_out"] += 1
+
+                log.debug("request #%d timed out" % expired)
+
+            if idx < len(requests) and speed:
+                wake = started + (requests[idx][0] - first_timestamp) / speed
+
+            else:
+                wake = None
+
+            if deadlines and (wake is None or deadlines[0][0] < wake):
+                wake = deadlines[0][0]
+
+            if wake is None:
+                continue
+
+            if not select.select([sock], [], [], max(0, wake - time.perf_counter()))[0]:
+                continue
+
+            while True:
+                try:
+                    response = sock.recv(65535)
+
+                except BlockingIOError:
+                    break
+
+                except OSError:
+                    # e.g. ICMP port unreachable
+                    continue
+
+                received = time.perf_counter()
+
+                request_id, pdu = _decode(response)
+
+                try:
+                    matched = by_id[request_id].popleft()
+
+                except IndexError:
+                    del by_id[request_id]
+
+                    counters["unmatched"] += 1
+
+                    continue
+
+                if not by_id[request_id]:
+                    del by_id[request_id]
+
+                _, sent, expected = outstanding.pop(matched)
+
+                latencies.append(received - sent)
+
+                contents = _contents(pdu, values)
+
+                if expected is None or contents is None:
+                    counters["uncompared"] += 1
+
+                elif contents != expected:
+                    counters["mismatched"] += 1
+
+                    log.debug("response to request #%d differs from captured" % matched)
+
+    except KeyboardInterrupt:
+        log.info("shutting down...")
+
+    return latencies, lags, counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+
+    parser.add_argument("-v", "--version", action="version", version=utils.TITLE)
+
+    parser.add_argument(
+        "--logging-method",
+        type=lambda x: x.split(":"),
+        metavar="=<%s[:args]>]" % "|".join(log.METHODS_MAP),
+        default="stderr",
+        help="Logging method.",
+    )
+
+    parser.add_argument(
+        "--log-level",
+        choices=log.LEVELS_MAP,
+        type=str,
+        default="info",
+        help="Logging level.",
+    )
+
+    parser.add_argument(
+        "--capture-dir",
+        metavar="<DIR>",
+        type=str,
+        required=True,
+        help="Directory holding SNMP traffic capture",
+    )
+
+    parser.add_argument(
+        "--target-address",
+        metavar="<HOST:PORT>",
+        type=_parse_endpoint,
+        default=("127.0.0.1", 161),
+        help="Send SNMP requests to this address",
+    )
+
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1,
+        help="Replay speed relative to the captured one (0 means send "
+        "requests as fast as responses come in)",
+    )
+
+    parser.add_argument(
+        "--timeout", type=float, default=1, help="SNMP response timeout"
+    )
+
+    parser.add_argument(
+        "--compare-values",
+        action="store_true",
+        help="Compare var-bind values of responses, not just error status "
+        "and var-bind names",
+    )
+
+    args = parser.parse_args()
+
+    if args.speed < 0:
+        sys.stderr.write("ERROR: --speed must not be negative\r\n")
+        parser.print_usage(sys.stderr)
+        return 1
+
+    proc_name = os.path.basename(sys.argv[0])
+
+    try:
+        log.set_logger(proc_name, *args.logging_method, force=True)
+
+        if args.log_level:
+            log.set_level(args.log_level)
+
+    except error.SnmpsimError as exc:
+        sys.stderr.write("%s\r\n" % exc)
+        parser.print_usage(sys.stderr)
+        return 1
+
+    try:
+        requests = _collect_requests(
+            capture.read_capture(args.capture_dir), args.compare_values
+        )
+
+    except (OSError, error.SnmpsimError) as exc:
+        log.error("failed to read capture: %s" % exc)
+        return 1
+
+    if not requests:
+        log.error("no captured requests found in %s" % args.capture_dir)
+        return 1
+
+    log.info(
+        "replaying %d captured requests to %s:%s"
+        % ((len(requests),) + args.target_address)
+    )
+
+    try:
+        address = socket.getaddrinfo(*args.target_address, type=socket.SOCK_DGRAM)[0]
+
+    except OSError as exc:
+        log.error("bad target address %s:%s: %s" % (args.target_address + (exc,)))
+        return 1
+
+    sock = socket.socket(address[0], socket.SOCK_DGRAM)
+    sock.connect(address[4])
+    sock.setblocking(False)
+
+    started = time.time()
+
+    try:
+        latencies, lags, counters = _replay(
+            sock, requests, args.speed, args.timeout, args.compare_values
+        )
+
+    finally:
+        sock.close()
+
+    latencies.sort()
+    lags.sort()
+
+    log.info(
+        "replayed %d requests in %.3f sec, responses %d, timed out %d, "
+        "mismatched %d, not compared %d, unmatched %d"
+        % (
+            len(latencies) + counters["timed_out"],
+            time.time() - started,
+            len(latencies),
+            counters["timed_out"],
+            counters["mismatched"],
+            counters["uncompared"],
+            counters["unmatched"],
+        )
+    )
+
+    for name, values in (("latency", latencies), ("send lag", lags)):
+        if not values:
+            continue
+
+        log.info(
+            "%s %s, max %.6f sec"
+            % (
+                name,
+                ", ".join(
+                    "p%g %.6f" % (fraction * 100, _percentile(values, fraction))
+                    for fraction in PERCENTILES
+                ),
+                values[-1],
+            )
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        rc = main()
+
+    except KeyboardInterrupt:
+        sys.stderr.write("shutting down process...")
+        rc = 0
+
+    except Exception as exc:
+        sys.stderr.write("process terminated: %s" % exc)
+
+        for line in traceback.format_exception(*sys.exc_info()):
+            sys.stderr.write(line.replace("\n", ";"))
+        rc = 1
+
+    sys.exit(rc)
@@ -10,10 +10,13 @@ import argparse
 import functools
 import os
 import sys
+import time
 import traceback
 from hashlib import md5
 
 from pyasn1 import debug as pyasn1_debug
+from pyasn1.codec.ber import decoder
+from pyasn1.error import PyAsn1Error
 from pyasn1.type import univ
 from pysnmp import debug as pysnmp_debug
 from pysnmp import error
@@ -24,7 +27,10 @@ from pysnmp.entity import config
 from pysnmp.entity import engine
 from pysnmp.entity.rfc3413 import cmdrsp
 from pysnmp.entity.rfc3413 import context
+from pysnmp.proto import api
 
+from snmpsim import admission
+from snmpsim import ber
 from snmpsim import confdir
 from snmpsim import controller
 from snmpsim import daemon
@@ -33,9 +39,14 @@ from snmpsim import endpoints
 from snmpsim import log
 from snmpsim import utils
 from snmpsim import variation
+from snmpsim.admission import AdmissionControl
+from snmpsim.admission import RequestDeadline
+from snmpsim.capture import TrafficCapture
 from snmpsim.error import NoDataNotification
 from snmpsim.error import SnmpsimError
+from snmpsim.reporting import timing
 from snmpsim.reporting.manager import ReportingManager
+from snmpsim.rtxcache import RetransmissionCache
 
 AUTH_PROTOCOLS = {
     "MD5": config.USM_AUTH_HMAC96_MD5,
@@ -102,7 +113,7 @@ def probe_hash_context(responder, snmp_engine):
 
         else:
             log.info(
-                "Using %s selected by candidate %s; transport ID %s, "
+                lambda: "Using %s selected by candidate %s; transport ID %s, "
                 "source address %s, context engine ID %s, "
                 "community name "
                 '"%s"'
@@ -120,7 +131,7 @@ def probe_hash_context(responder, snmp_engine):
     else:
         mib_instrum = responder.snmpContext.getMibInstrum(context_name)
         log.info(
-            'Using %s selected by contextName "%s", transport ID %s, '
+            lambda: 'Using %s selected by contextName "%s", transport ID %s, '
             "source address %s"
             % (
                 mib_instrum,
@@ -140,6 +151,158 @@ def probe_hash_context(responder, snmp_engine):
     return context_name
 
 
+# SNMP engine execution points concluding request processing stages
+STAGE_EXECUTION_POINTS = {
+    "rfc3412.receiveMessage:request": "decode",
+    "rfc3412.returnResponsePdu": "encode",
+}
+
+# receive callback ID of messages handled without SNMP engine
+HANDLED = "handled"
+
+
+def time_request_stage(snmp_engine, execpoint, variables, stages):
+    """Account request processing time at SNMP engine execution point"""
+    timer = timing.current()
+
+    if timer:
+        timer.lap(stages[execpoint])
+
+
+def report_request_origin(snmp_engine, execpoint, variables, cb_ctx):
+    """Report SNMP community and source address of a request"""
+    ReportingManager.update_metrics(
+        community=variables["communityName"].prettyPrint(),
+        source_address=variables["transportInformation"][1][0],
+    )
+
+
+def route_message(transport_dispatcher, transport_domain, transport_address, whole_msg):
+    """Route incoming message to SNMP engine by transport domain"""
+    timing.start()
+
+    if TrafficCapture.is_enabled():
+        TrafficCapture.request(transport_domain, transport_address, whole_msg)
+
+    if RequestDeadline.is_enabled() and RequestDeadline.expired(
+        transport_dispatcher.get_transport(transport_domain), transport_domain
+    ):
+        return HANDLED
+
+    action = None
+
+    if AdmissionControl.is_enabled():
+        action = AdmissionControl.admit_source(transport_domain, transport_address)
+
+        if action == admission.DROP:
+            return HANDLED
+
+    if RetransmissionCache.is_enabled():
+        response = RetransmissionCache.lookup(
+            transport_domain, transport_address, whole_msg
+        )
+
+        if response is not None:
+            transport_dispatcher.send_message(
+                response, transport_domain, transport_address
+            )
+
+            return HANDLED
+
+    if action is None and AdmissionControl.is_enabled():
+        # community table maps community names to data files verbatim,
+        # so request community is the data file community name
+        community = ber.decode_community(whole_msg)
+
+        if community is not None:
+            action = AdmissionControl.admit_community(community)
+
+    if action == admission.DROP:
+        return HANDLED
+
+    elif action is not None:
+        reject_message(
+            transport_dispatcher,
+            transport_domain,
+            transport_address,
+            whole_msg,
+            action,
+        )
+
+        return HANDLED
+
+    return transport_domain
+
+
+def reject_message(
+    transport_dispatcher, transport_domain, transport_address, whole_msg, action
+):
+    """Answer SNMP v1/v2c request with error-status, drop anything else"""
+    request = ber.decode_request(whole_msg)
+
+    if request is None:
+        try:
+            p_mod = api.PROTOCOL_MODULES[api.decodeMessageVersion(whole_msg)]
+
+            req_msg, _ = decoder.decode(whole_msg, asn1Spec=p_mod.Message())
+
+        except (KeyError, PyAsn1Error):
+            return
+
+        request = ber.request_from_message(p_mod, req_msg)
+
+    if request.pdu_type not in (
+        ber.GET_REQUEST,
+        ber.GET_NEXT_REQUEST,
+        ber.GET_BULK_REQUEST,
+        ber.SET_REQUEST,
+    ):
+        return
+
+    # error response echoes request variable-bindings
+    response_encoder = ber.ResponseEncoder(size=len(whole_msg) + 64)
+
+    response = response_encoder.encode(
+        request.version,
+        request.community,
+        request.request_id,
+        admission.error_status(action, request.version),
+        0,
+        request.var_binds,
+    )
+
+    transport_dispatcher.send_message(response, transport_domain, transport_address)
+
+
+def drop_message(transport_dispatcher, transport_domain, transport_address, whole_msg):
+    """Receive message which is not up to SNMP engine to handle"""
+
+
+class TransportDispatcher(AsyncioDispatcher):
+    """Transport dispatcher timing, capturing and caching outgoing responses"""
+
+    def send_message(self, outgoing_message, transport_domain, transport_address):
+        AsyncioDispatcher.send_message(
+            self, outgoing_message, transport_domain, transport_address
+        )
+
+        if TrafficCapture.is_enabled():
+            TrafficCapture.response(
+                transport_domain, transport_address, outgoing_message
+            )
+
+        if RetransmissionCache.is_enabled():
+            RetransmissionCache.store(
+                transport_domain, transport_address, outgoing_message
+            )
+
+        timer = timing.current()
+
+        if timer:
+            timer.lap("send")
+            timing.finish()
+
+
 class GetCommandResponder(cmdrsp.GetCommandResponder):
     """v3arch GET command handler"""
 
@@ -278,6 +441,21 @@ def main():
         help="Logging level.",
     )
 
+    parser.add_argument(
+        "--log-queue-size",
+        type=int,
+        default=0,
+        help="Write log messages from a background thread, queueing up to "
+        "this many messages (0 means synchronous logging).",
+    )
+
+    parser.add_argument(
+        "--log-queue-policy",
+        choices=(log.QUEUE_DROP, log.QUEUE_BLOCK),
+        default=log.QUEUE_DROP,
+        help="Drop new log messages or block on log queue overflow.",
+    )
+
     parser.add_argument(
         "--reporting-method",
         type=lambda x: x.split(":"),
@@ -286,6 +464,52 @@ def main():
         help="Activity metrics reporting method.",
     )
 
+    parser.add_argument(
+        "--capture",
+        type=lambda x: x.split(":"),
+        metavar="=<capture-dir[:max-size[:segments]]>",
+        help="Capture SNMP requests and responses into on-disk ring buffer.",
+    )
+
+    parser.add_argument(
+        "--retransmission-cache",
+        type=lambda x: x.split(":"),
+        nargs="?",
+        const=[],
+        metavar="=<[window[:max-size]]>",
+        help="Resend cached response to retransmitted request rather than "
+        "handling it once again.",
+    )
+
+    parser.add_argument(
+        "--source-rate-limit",
+        type=lambda x: x.split(":"),
+        metavar="=<rate[:burst[:action]]>",
+        help="Limit requests per second from each source address, dropping "
+        "excess requests or answering them with the error-status named by "
+        "action.",
+    )
+
+    parser.add_argument(
+        "--community-rate-limit",
+        type=str,
+        action="append",
+        metavar="=<[data-dir=]rate[:burst[:action]]>",
+        dest="community_rate_limits",
+        default=[],
+        help="Limit SNMP v1/v2c requests per second to each community name "
+        "(of data files in data-dir), dropping excess requests or answering "
+        "them with the error-status named by action.",
+    )
+
+    parser.add_argument(
+        "--max-request-age",
+        type=float,
+        metavar="<SECONDS>",
+        help="Drop requests received over this many seconds before they "
+        "could be handled.",
+    )
+
     parser.add_argument(
         "--daemonize",
         action="store_true",
@@ -351,6 +575,14 @@ def main():
         help="Options for a specific variation module",
     )
 
+    parser.add_argument(
+        "--max-record-contexts",
+        type=int,
+        default=0,
+        help="Maximum number of per-record contexts to keep for each "
+        "variation module capable of re-creating them (0 means no limit)",
+    )
+
     parser.add_argument(
         "--v3-only",
         action="store_true",
@@ -469,14 +701,16 @@ configured automatically based on simulation data file paths relative to
         "--agent-udpv4-endpoint",
         type=endpoints.parse_endpoint,
         metavar="<[X.X.X.X]:NNNNN>",
-        help="SNMP agent UDP/IPv4 address to listen on (name:port)",
+        help="SNMP agent UDP/IPv4 address or address range to listen on "
+        "(name:port, network/prefix:port or first-last:port)",
     )
 
     v3_group.add_argument(
         "--agent-udpv6-endpoint",
         type=functools.partial(endpoints.parse_endpoint, ipv6=True),
         metavar="<[X:X:..X]:NNNNN>",
-        help="SNMP agent UDP/IPv6 address to listen on ([name]:port)",
+        help="SNMP agent UDP/IPv6 address or address range to listen on "
+        "([name]:port, [network/prefix]:port or [first-last]:port)",
     )
 
     v3_group.add_argument(
@@ -586,6 +820,39 @@ configured automatically based on simulation data file paths relative to
             snmp_helper.print_usage(sys.stderr)
             return 1
 
+        if args.capture:
+            try:
+                TrafficCapture.configure(*args.capture)
+
+            except SnmpsimError as exc:
+                sys.stderr.write("%s\r\n" % exc)
+                snmp_helper.print_usage(sys.stderr)
+                return 1
+
+        if args.retransmission_cache is not None:
+            try:
+                RetransmissionCache.configure(*args.retransmission_cache)
+
+            except SnmpsimError as exc:
+                sys.stderr.write("%s\r\n" % exc)
+                snmp_helper.print_usage(sys.stderr)
+                return 1
+
+        try:
+            if args.source_rate_limit:
+                AdmissionControl.configure_source(*args.source_rate_limit)
+
+            for community_rate_limit in args.community_rate_limits:
+                AdmissionControl.configure_community(community_rate_limit)
+
+            if args.max_request_age is not None:
+                RequestDeadline.configure(args.max_request_age)
+
+        except SnmpsimError as exc:
+            sys.stderr.write("%s\r\n" % exc)
+            snmp_helper.print_usage(sys.stderr)
+            return 1
+
     if args.daemonize:
         try:
             daemon.daemonize(args.pid_file)
@@ -595,6 +862,19 @@ configured automatically based on simulation data file paths relative to
             snmp_helper.print_usage(sys.stderr)
             return 1
 
+    if args.log_queue_size:
+        # writer thread must be started past daemon forking
+        try:
+            log.set_queue(args.log_queue_size, args.log_queue_policy)
+
+        except SnmpsimError as exc:
+            sys.stderr.write("%s\r\n" % exc)
+            snmp_helper.print_usage(sys.stderr)
+            return 1
+
+    # as is reporting thread
+    ReportingManager.start()
+
     if not os.path.exists(confdir.cache):
         try:
             with daemon.PrivilegesOf(args.process_user, args.process_group):
@@ -610,7 +890,7 @@ configured automatically based on simulation data file paths relative to
             log.info('Cache directory "%s" created' % confdir.cache)
 
     variation_modules = variation.load_variation_modules(
-        confdir.variation, variation_modules_options
+        confdir.variation, variation_modules_options, args.max_record_contexts
     )
 
     with daemon.PrivilegesOf(args.process_user, args.process_group):
@@ -676,6 +956,8 @@ configured automatically based on simulation data file paths relative to
 
                 log.info(f"SNMPv1/2c community name: {community_name}")
 
+                AdmissionControl.assign(community_name, dataDir)
+
                 agent_name = md5(
                     univ.OctetString(community_name).asOctets()
                 ).hexdigest()
@@ -715,18 +997,43 @@ configured automatically based on simulation data file paths relative to
         del _data_files
 
     # Bind transport endpoints
+    started = time.time()
+
+    transports_count = 0
+
     for idx, opt in enumerate(snmp_args):
         if opt[0] == "--agent-udpv4-endpoint":
-            snmp_args[idx] = (opt[0], endpoints.IPv4TransportEndpoints().add(opt[1]))
+            snmp_args[idx] = (
+                opt[0],
+                endpoints.bind_endpoints(
+                    opt[1], timestamps=RequestDeadline.is_enabled()
+                ),
+            )
+            transports_count += len(snmp_args[idx][1])
 
         elif opt[0] == "--agent-udpv6-endpoint":
-            snmp_args[idx] = (opt[0], endpoints.IPv6TransportEndpoints().add(opt[1]))
+            snmp_args[idx] = (
+                opt[0],
+                endpoints.bind_endpoints(
+                    opt[1], ipv6=True, timestamps=RequestDeadline.is_enabled()
+                ),
+            )
+            transports_count += len(snmp_args[idx][1])
+
+    log.info(
+        "%s transport endpoint(s) bound in %.3f sec"
+        % (transports_count, time.time() - started)
+    )
 
     # Start configuring SNMP engine(s)
 
-    transport_dispatcher = AsyncioDispatcher()
+    transport_dispatcher = TransportDispatcher()
+
+    transport_dispatcher.register_routing_callback(
+        functools.partial(route_message, transport_dispatcher)
+    )
 
-    transport_dispatcher.register_routing_callback(lambda td, t, d: td)
+    transport_dispatcher.register_recv_callback(drop_message, HANDLED)
 
     if not snmp_args or snmp_args[0][0] != "--v3-engine-id":
         snmp_args.insert(0, ("--v3-engine-id", "auto"))
@@ -987,6 +1294,16 @@ configured automatically based on simulation data file paths relative to
 
             config.add_context(snmp_engine, "")
 
+            if ReportingManager.is_enabled():
+                snmp_engine.observer.register_observer(
+                    time_request_stage,
+                    *STAGE_EXECUTION_POINTS,
+                    cbCtx=STAGE_EXECUTION_POINTS,
+                )
+                snmp_engine.observer.register_observer(
+                    report_request_origin, "rfc2576.processIncomingMsg"
+                )
+
         elif opt[0] == "--v3-context-engine-id":
             v3_context_engine_ids.append((univ.OctetString(hexValue=opt[1]), []))
 
@@ -1058,10 +1375,10 @@ configured automatically based on simulation data file paths relative to
                 v3_priv_protos[v3_users[-1]] = opt[1].upper()
 
         elif opt[0] == "--agent-udpv4-endpoint":
-            agent_udpv4_endpoints.append(opt[1])
+            agent_udpv4_endpoints.extend(opt[1])
 
         elif opt[0] == "--agent-udpv6-endpoint":
-            agent_udpv6_endpoints.append(opt[1])
+            agent_udpv6_endpoints.extend(opt[1])
 
         elif opt[0] == "--timeout":
             timeout = opt[1]
@@ -1092,6 +1409,24 @@ configured automatically based on simulation data file paths relative to
                     else:
                         log.info('Variation module "%s" shutdown OK' % name)
 
+            if AdmissionControl.is_enabled():
+                log.info(
+                    "Dropped %s, rejected %s request(s) over rate limit"
+                    % (AdmissionControl.dropped, AdmissionControl.rejected)
+                )
+
+            if RequestDeadline.is_enabled():
+                log.info(
+                    "Dropped %s request(s) older than %s seconds"
+                    % (RequestDeadline.dropped, RequestDeadline.MAX_AGE)
+                )
+
+            if RetransmissionCache.is_enabled():
+                log.info(
+                    "Replayed responses to %s retransmitted request(s)"
+                    % RetransmissionCache.hits
+                )
+
             transport_dispatcher.close_dispatcher()
 
             log.info("Process terminated")
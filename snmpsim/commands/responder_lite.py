@@ -6,13 +6,14 @@
 # SNMP Agent Simulator: lightweight SNMP v1/v2c command responder
 #
 import argparse
+import functools
 import os
 import sys
+import time
 import traceback
 
 from pyasn1 import debug as pyasn1_debug
 from pyasn1.codec.ber import decoder
-from pyasn1.codec.ber import encoder
 from pyasn1.type import univ
 from pysnmp import debug as pysnmp_debug
 from pysnmp.carrier.asyncio.dgram import udp
@@ -22,6 +23,8 @@ from pysnmp.proto import api
 from pysnmp.proto import rfc1902
 from pysnmp.proto import rfc1905
 
+from snmpsim import admission
+from snmpsim import ber
 from snmpsim import confdir
 from snmpsim import controller
 from snmpsim import daemon
@@ -30,9 +33,15 @@ from snmpsim import endpoints
 from snmpsim import log
 from snmpsim import utils
 from snmpsim import variation
+from snmpsim.admission import AdmissionControl
+from snmpsim.admission import RequestDeadline
+from snmpsim.capture import TrafficCapture
 from snmpsim.error import NoDataNotification
 from snmpsim.error import SnmpsimError
+from snmpsim.reporting import timing
 from snmpsim.reporting.manager import ReportingManager
+from snmpsim.rspcache import ResponseCache
+from snmpsim.rtxcache import RetransmissionCache
 
 SNMP_2TO1_ERROR_MAP = {
     rfc1902.Counter64.tagSet: 5,
@@ -91,6 +100,21 @@ def main():
         help="Logging level.",
     )
 
+    parser.add_argument(
+        "--log-queue-size",
+        type=int,
+        default=0,
+        help="Write log messages from a background thread, queueing up to "
+        "this many messages (0 means synchronous logging).",
+    )
+
+    parser.add_argument(
+        "--log-queue-policy",
+        choices=(log.QUEUE_DROP, log.QUEUE_BLOCK),
+        default=log.QUEUE_DROP,
+        help="Drop new log messages or block on log queue overflow.",
+    )
+
     parser.add_argument(
         "--reporting-method",
         type=lambda x: x.split(":"),
@@ -99,6 +123,13 @@ def main():
         help="Activity metrics reporting method.",
     )
 
+    parser.add_argument(
+        "--capture",
+        type=lambda x: x.split(":"),
+        metavar="=<capture-dir[:max-size[:segments]]>",
+        help="Capture SNMP requests and responses into on-disk ring buffer.",
+    )
+
     parser.add_argument(
         "--daemonize",
         action="store_true",
@@ -164,6 +195,14 @@ def main():
         help="Options for a specific variation module",
     )
 
+    parser.add_argument(
+        "--max-record-contexts",
+        type=int,
+        default=0,
+        help="Maximum number of per-record contexts to keep for each "
+        "variation module capable of re-creating them (0 means no limit)",
+    )
+
     parser.add_argument(
         "--v2c-arch",
         action="store_true",
@@ -202,7 +241,80 @@ def main():
         help="SNMP simulation data recordings directory.",
     )
 
-    endpoint_group = parser.add_mutually_exclusive_group(required=True)
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Read up to this many pending datagrams per socket wakeup, "
+        "sending out responses together (1 disables batching)",
+    )
+
+    parser.add_argument(
+        "--batch-latency",
+        type=float,
+        default=0.005,
+        help="Stop reading datagrams into a batch once it has been "
+        "processed for this many seconds",
+    )
+
+    parser.add_argument(
+        "--overload-queue-size",
+        type=int,
+        default=0,
+        help="Queue up to this many pending datagrams per socket, shedding "
+        "the oldest ones on overflow (0 disables queueing)",
+    )
+
+    parser.add_argument(
+        "--response-cache",
+        type=lambda x: x.split(":"),
+        nargs="?",
+        const=[],
+        metavar="=<[max-entries[:ttl]]>",
+        help="Cache responses to repeated requests for plain (not variated) "
+        "data file records.",
+    )
+
+    parser.add_argument(
+        "--retransmission-cache",
+        type=lambda x: x.split(":"),
+        nargs="?",
+        const=[],
+        metavar="=<[window[:max-size]]>",
+        help="Resend cached response to retransmitted request rather than "
+        "handling it once again.",
+    )
+
+    parser.add_argument(
+        "--source-rate-limit",
+        type=lambda x: x.split(":"),
+        metavar="=<rate[:burst[:action]]>",
+        help="Limit requests per second from each source address, dropping "
+        "excess requests or answering them with the error-status named by "
+        "action.",
+    )
+
+    parser.add_argument(
+        "--community-rate-limit",
+        type=str,
+        action="append",
+        metavar="=<[data-dir=]rate[:burst[:action]]>",
+        dest="community_rate_limits",
+        default=[],
+        help="Limit requests per second to each SNMP community name (of "
+        "data files in data-dir), dropping excess requests or answering "
+        "them with the error-status named by action.",
+    )
+
+    parser.add_argument(
+        "--max-request-age",
+        type=float,
+        metavar="<SECONDS>",
+        help="Drop requests received over this many seconds before they "
+        "could be handled.",
+    )
+
+    endpoint_group = parser.add_mutually_exclusive_group()
 
     endpoint_group.add_argument(
         "--agent-udpv4-endpoint",
@@ -211,7 +323,8 @@ def main():
         metavar="<[X.X.X.X]:NNNNN>",
         dest="agent_udpv4_endpoints",
         default=[],
-        help="SNMP agent UDP/IPv4 address to listen on (name:port)",
+        help="SNMP agent UDP/IPv4 address or address range to listen on "
+        "(name:port, network/prefix:port or first-last:port)",
     )
 
     endpoint_group.add_argument(
@@ -221,13 +334,57 @@ def main():
         metavar="<[X:X:..X]:NNNNN>",
         dest="agent_udpv6_endpoints",
         default=[],
-        help="SNMP agent UDP/IPv6 address to listen on ([name]:port)",
+        help="SNMP agent UDP/IPv6 address or address range to listen on "
+        "([name]:port, [network/prefix]:port or [first-last]:port)",
+    )
+
+    # may go along with any other endpoints
+    parser.add_argument(
+        "--agent-udpv4-pktinfo-endpoint",
+        type=str,
+        action="append",
+        metavar="<X.X.X.X/NN:NNNNN>",
+        dest="agent_udpv4_pktinfo_endpoints",
+        default=[],
+        help="Range of SNMP agent UDP/IPv4 addresses to serve over a single "
+        "socket (network/prefix:port or first-last:port)",
+    )
+
+    parser.add_argument(
+        "--agent-udpv6-pktinfo-endpoint",
+        type=str,
+        action="append",
+        metavar="<[X:X:..X/NN]:NNNNN>",
+        dest="agent_udpv6_pktinfo_endpoints",
+        default=[],
+        help="Range of SNMP agent UDP/IPv6 addresses to serve over a single "
+        "socket ([network/prefix]:port or [first-last]:port)",
     )
 
     args = parser.parse_args()
 
+    if not (
+        args.agent_udpv4_endpoints
+        or args.agent_udpv6_endpoints
+        or args.agent_udpv4_pktinfo_endpoints
+        or args.agent_udpv6_pktinfo_endpoints
+    ):
+        sys.stderr.write("ERROR: at least one agent endpoint is required\r\n")
+        parser.print_usage(sys.stderr)
+        return 1
+
+    if args.batch_size < 1 or args.batch_latency < 0:
+        sys.stderr.write("ERROR: --batch-size and --batch-latency must be positive\r\n")
+        parser.print_usage(sys.stderr)
+        return 1
+
+    if args.overload_queue_size < 0:
+        sys.stderr.write("ERROR: --overload-queue-size must not be negative\r\n")
+        parser.print_usage(sys.stderr)
+        return 1
+
     if args.debug:
-        pysnmp_debug.setLogger(pysnmp_debug.Debug(*args.debug))
+        pysnmp_debug.set_logger(pysnmp_debug.Debug(*args.debug))
 
     if args.debug_asn1:
         pyasn1_debug.setLogger(pyasn1_debug.Debug(*args.debug_asn1))
@@ -264,6 +421,48 @@ def main():
             parser.print_usage(sys.stderr)
             return 1
 
+        if args.capture:
+            try:
+                TrafficCapture.configure(*args.capture)
+
+            except SnmpsimError as exc:
+                sys.stderr.write("%s\r\n" % exc)
+                parser.print_usage(sys.stderr)
+                return 1
+
+        if args.response_cache is not None:
+            try:
+                ResponseCache.configure(*args.response_cache)
+
+            except SnmpsimError as exc:
+                sys.stderr.write("%s\r\n" % exc)
+                parser.print_usage(sys.stderr)
+                return 1
+
+        if args.retransmission_cache is not None:
+            try:
+                RetransmissionCache.configure(*args.retransmission_cache)
+
+            except SnmpsimError as exc:
+                sys.stderr.write("%s\r\n" % exc)
+                parser.print_usage(sys.stderr)
+                return 1
+
+        try:
+            if args.source_rate_limit:
+                AdmissionControl.configure_source(*args.source_rate_limit)
+
+            for community_rate_limit in args.community_rate_limits:
+                AdmissionControl.configure_community(community_rate_limit)
+
+            if args.max_request_age is not None:
+                RequestDeadline.configure(args.max_request_age)
+
+        except SnmpsimError as exc:
+            sys.stderr.write("%s\r\n" % exc)
+            parser.print_usage(sys.stderr)
+            return 1
+
     if args.daemonize:
         try:
             daemon.daemonize(args.pid_file)
@@ -273,6 +472,19 @@ def main():
             parser.print_usage(sys.stderr)
             return 1
 
+    if args.log_queue_size:
+        # writer thread must be started past daemon forking
+        try:
+            log.set_queue(args.log_queue_size, args.log_queue_policy)
+
+        except SnmpsimError as exc:
+            sys.stderr.write("%s\r\n" % exc)
+            parser.print_usage(sys.stderr)
+            return 1
+
+    # as is reporting thread
+    ReportingManager.start()
+
     if not os.path.exists(confdir.cache):
         try:
             with daemon.PrivilegesOf(args.process_user, args.process_group):
@@ -288,7 +500,7 @@ def main():
             log.info('Cache directory "%s" created' % confdir.cache)
 
     variation_modules = variation.load_variation_modules(
-        confdir.variation, variation_modules_options
+        confdir.variation, variation_modules_options, args.max_record_contexts
     )
 
     with daemon.PrivilegesOf(args.process_user, args.process_group):
@@ -356,6 +568,8 @@ def main():
 
                 contexts[univ.OctetString(community_name)] = mib_instrum
 
+                AdmissionControl.assign(community_name, dataDir)
+
                 data_index_instrum_controller.add_data_file(full_path, community_name)
 
             log.msg.dec_ident()
@@ -387,40 +601,111 @@ def main():
 
         return rsp_var_binds
 
+    def call_backend(backend_fun, var_binds):
+        """Invoke MIB instrumentation not bound to an SNMP engine"""
+        return backend_fun(*var_binds, snmpEngine=None, acFun=None, cbCtx=None)
+
     def commandResponderCbFun(
         transport_dispatcher, transport_domain, transport_address, whole_msg
     ):
         """v2c arch command responder request handling callback"""
+        sequence = None
+
+        if TrafficCapture.is_enabled():
+            sequence = TrafficCapture.request(
+                transport_domain, transport_address, whole_msg
+            )
+
+        if RequestDeadline.is_enabled() and RequestDeadline.expired(
+            transport_dispatcher.get_transport(transport_domain), transport_domain
+        ):
+            return
+
+        action = None
+
+        if AdmissionControl.is_enabled():
+            action = AdmissionControl.admit_source(transport_domain, transport_address)
+
+            if action == admission.DROP:
+                return
+
+        if RetransmissionCache.is_enabled():
+            out_msg = RetransmissionCache.lookup(
+                transport_domain, transport_address, whole_msg
+            )
+
+            if out_msg is not None:
+                send_response(
+                    transport_dispatcher,
+                    transport_domain,
+                    transport_address,
+                    out_msg,
+                    timing.start(),
+                    sequence,
+                )
+
+                return
+
         while whole_msg:
-            msg_ver = api.decodeMessageVersion(whole_msg)
+            timer = timing.start()
+
+            request = ber.decode_request(whole_msg)
 
-            if msg_ver in api.protoModules:
-                p_mod = api.protoModules[msg_ver]
+            if request:
+                whole_msg = None
+
+                msg_ver = request.version
 
             else:
-                log.error(f"Unsupported SNMP version {msg_ver}")
-                return
+                # anything but plain read requests
+                msg_ver = api.decodeMessageVersion(whole_msg)
 
-            req_msg, whole_msg = decoder.decode(whole_msg, asn1Spec=p_mod.Message())
+                if msg_ver in api.PROTOCOL_MODULES:
+                    p_mod = api.PROTOCOL_MODULES[msg_ver]
 
-            community_name = req_msg.getComponentByPosition(1)
+                else:
+                    log.error(f"Unsupported SNMP version {msg_ver}")
+                    return
+
+                req_msg, whole_msg = decoder.decode(whole_msg, asn1Spec=p_mod.Message())
+
+                request = ber.request_from_message(p_mod, req_msg)
+
+            if timer:
+                timer.lap("decode")
+
+            community_name = request.community
+
+            if timer:
+                ReportingManager.update_metrics(
+                    community=community_name.prettyPrint(),
+                    source_address=transport_address[0],
+                )
+
+            if transport_domain in pktinfo_transports:
+                local_domain = pktinfo_transports[transport_domain].address_domain(
+                    transport_address
+                )
+
+            else:
+                local_domain = transport_domain
 
             for candidate in datafile.probe_context(
-                transport_domain,
+                local_domain,
                 transport_address,
                 context_engine_id=datafile.SELF_LABEL,
                 context_name=community_name,
             ):
                 if candidate in contexts:
                     log.info(
-                        "Using %s selected by candidate %s; transport ID %s, "
+                        lambda: "Using %s selected by candidate %s; transport ID %s, "
                         "source address %s, context engine ID <empty>, "
                         "community name "
                         '"%s"'
                         % (
                             contexts[candidate],
                             candidate,
-                            univ.ObjectIdentifier(transport_domain),
+                            univ.ObjectIdentifier(local_domain),
                             transport_address[0],
                             community_name,
                         )
@@ -434,29 +719,40 @@ def main():
                     "address %s, community name "
                     '"%s"'
                     % (
-                        univ.ObjectIdentifier(transport_domain),
+                        univ.ObjectIdentifier(local_domain),
                         transport_address[0],
                         community_name,
                     )
                 )
                 return whole_msg
 
-            rsp_msg = p_mod.apiMessage.getResponse(req_msg)
-            rsp_pdu = p_mod.apiMessage.getPDU(rsp_msg)
-            req_pdu = p_mod.apiMessage.getPDU(req_msg)
+            pdu_name = ber.PDU_NAMES.get(request.pdu_type, hex(request.pdu_type))
+
+            if timer:
+                timer.pdu_type = pdu_name
+                timer.lap("probe")
 
-            if req_pdu.isSameTypeWith(p_mod.GetRequestPDU()):
-                backend_fun = contexts[community_name].readVars
+            # request properties response depends on, None if not cacheable
+            cache_params = ()
 
-            elif req_pdu.isSameTypeWith(p_mod.SetRequestPDU()):
-                backend_fun = contexts[community_name].writeVars
+            if request.pdu_type == ber.GET_REQUEST:
+                backend_fun = functools.partial(
+                    call_backend, contexts[community_name].read_variables
+                )
+
+            elif request.pdu_type == ber.SET_REQUEST:
+                backend_fun = functools.partial(
+                    call_backend, contexts[community_name].write_variables
+                )
 
-            elif req_pdu.isSameTypeWith(p_mod.GetNextRequestPDU()):
-                backend_fun = contexts[community_name].readNextVars
+                cache_params = None
 
-            elif hasattr(p_mod, "GetBulkRequestPDU") and req_pdu.isSameTypeWith(
-                p_mod.GetBulkRequestPDU()
-            ):
+            elif request.pdu_type == ber.GET_NEXT_REQUEST:
+                backend_fun = functools.partial(
+                    call_backend, contexts[community_name].read_next_variables
+                )
+
+            elif request.pdu_type == ber.GET_BULK_REQUEST:
                 if not msg_ver:
                     log.info(
                         "GETBULK over SNMPv1 from %s:%s"
@@ -467,51 +763,168 @@ def main():
                 def backend_fun(var_binds):
                     return get_bulk_handler(
                         var_binds,
-                        p_mod.apiBulkPDU.getNonRepeaters(req_pdu),
-                        p_mod.apiBulkPDU.getMaxRepetitions(req_pdu),
-                        contexts[community_name].readNextVars,
+                        request.non_repeaters,
+                        request.max_repetitions,
+                        functools.partial(
+                            call_backend, contexts[community_name].read_next_variables
+                        ),
                     )
 
+                cache_params = (request.non_repeaters, request.max_repetitions)
+
             else:
                 log.error(
                     "Unsupported PDU type %s from "
-                    "%s:%s"
-                    % (req_pdu.__class__.__name__, transport_domain, transport_address)
+                    "%s:%s" % (pdu_name, transport_domain, transport_address)
                 )
                 return whole_msg
 
+            if action is None and AdmissionControl.is_enabled():
+                action = AdmissionControl.admit_community(community_name)
+
+            if action == admission.DROP:
+                return whole_msg
+
+            elif action is not None:
+                out_msg = response_encoder.encode(
+                    msg_ver,
+                    request.community,
+                    request.request_id,
+                    admission.error_status(action, msg_ver),
+                    0,
+                    request.var_binds,
+                )
+
+                send_response(
+                    transport_dispatcher,
+                    transport_domain,
+                    transport_address,
+                    out_msg,
+                    timer,
+                    sequence,
+                )
+
+                continue
+
+            rsp_cache_key = None
+
+            # SNMPv1 error response echoes request values, which are
+            # not part of the cache key
+            if (
+                cache_params is not None
+                and ResponseCache.is_enabled()
+                and all(val.tagSet == univ.Null.tagSet for _, val in request.var_binds)
+            ):
+                rsp_cache_key = (
+                    community_name,
+                    msg_ver,
+                    request.pdu_type,
+                    tuple(oid for oid, _ in request.var_binds),
+                ) + cache_params
+
+                entry = ResponseCache.lookup(rsp_cache_key)
+
+                if entry is not None:
+                    out_msg = response_encoder.encode(
+                        msg_ver,
+                        request.community,
+                        request.request_id,
+                        entry.error_status,
+                        entry.error_index,
+                        entry.var_binds,
+                    )
+
+                    if timer:
+                        timer.lap("encode")
+
+                    send_response(
+                        transport_dispatcher,
+                        transport_domain,
+                        transport_address,
+                        out_msg,
+                        timer,
+                        sequence,
+                    )
+
+                    continue
+
             try:
-                var_binds = backend_fun(p_mod.apiPDU.getVarBinds(req_pdu))
+                var_binds = backend_fun(request.var_binds)
 
             except NoDataNotification:
+                ResponseCache.discard()
                 return whole_msg
 
             except Exception as exc:
+                ResponseCache.discard()
                 log.error("Ignoring SNMP engine failure: %s" % exc)
                 return whole_msg
 
+            error_status = error_index = 0
+
             if not msg_ver:
                 for idx in range(len(var_binds)):
                     oid, val = var_binds[idx]
 
                     if val.tagSet in SNMP_2TO1_ERROR_MAP:
-                        var_binds = p_mod.apiPDU.getVarBinds(req_pdu)
+                        var_binds = request.var_binds
 
-                        p_mod.apiPDU.setErrorStatus(
-                            rsp_pdu, SNMP_2TO1_ERROR_MAP[val.tagSet]
-                        )
-                        p_mod.apiPDU.setErrorIndex(rsp_pdu, idx + 1)
+                        error_status = SNMP_2TO1_ERROR_MAP[val.tagSet]
+                        error_index = idx + 1
 
                         break
 
-            p_mod.apiPDU.setVarBinds(rsp_pdu, var_binds)
+            if rsp_cache_key is not None:
+                var_binds = response_encoder.encode_var_binds(msg_ver, var_binds)
 
-            transport_dispatcher.sendMessage(
-                encoder.encode(rsp_msg), transport_domain, transport_address
+                ResponseCache.store(rsp_cache_key, error_status, error_index, var_binds)
+
+            out_msg = response_encoder.encode(
+                msg_ver,
+                request.community,
+                request.request_id,
+                error_status,
+                error_index,
+                var_binds,
+            )
+
+            if timer:
+                timer.lap("encode")
+
+            send_response(
+                transport_dispatcher,
+                transport_domain,
+                transport_address,
+                out_msg,
+                timer,
+                sequence,
             )
 
         return whole_msg
 
+    def send_response(
+        transport_dispatcher,
+        transport_domain,
+        transport_address,
+        out_msg,
+        timer,
+        sequence,
+    ):
+        transport_dispatcher.send_message(out_msg, transport_domain, transport_address)
+
+        if TrafficCapture.is_enabled():
+            TrafficCapture.response(
+                transport_domain, transport_address, out_msg, sequence
+            )
+
+        if RetransmissionCache.is_enabled():
+            RetransmissionCache.store(transport_domain, transport_address, out_msg)
+
+        # batching transport just queues response till the end of the batch
+        if timer:
+            timer.lap("send")
+            timing.finish()
+
     # Configure access to data index
 
     log.info(
@@ -530,61 +943,138 @@ def main():
 
     contexts["index"] = data_index_instrum_controller
 
+    response_encoder = ber.ResponseEncoder()
+
     # Configure socket server
     transport_dispatcher = AsyncioDispatcher()
 
+    # transports serving many local addresses, by transport domain
+    pktinfo_transports = {}
+
+    started = time.time()
+
+    transports = []
+
     transport_index = args.transport_id_offset
     for agent_udpv4_endpoint in args.agent_udpv4_endpoints:
-        transport_domain = udp.domainName + (transport_index,)
-        transport_index += 1
+        for transport, endpoint in endpoints.bind_endpoints(
+            agent_udpv4_endpoint,
+            batch_size=args.batch_size,
+            latency_cap=args.batch_latency,
+            queue_size=args.overload_queue_size,
+            timestamps=RequestDeadline.is_enabled(),
+        ):
+            transport_domain = udp.DOMAIN_NAME + (transport_index,)
+            transport_index += 1
+
+            transport_dispatcher.register_transport(transport_domain, transport)
+
+            transports.append(transport)
+
+            log.msg(
+                "Listening at UDP/IPv4 endpoint %s, transport ID "
+                "%s"
+                % (endpoint, ".".join([str(handler) for handler in transport_domain]))
+            )
 
-        agent_udpv4_endpoint = endpoints.IPv4TransportEndpoints().add(
-            agent_udpv4_endpoint
-        )
+    for agent_udpv4_pktinfo_endpoint in args.agent_udpv4_pktinfo_endpoints:
+        transport_domain = udp.DOMAIN_NAME + (transport_index,)
+
+        agent_udpv4_pktinfo_endpoint = endpoints.IPv4PktInfoTransportEndpoints(
+            transport_index,
+            batch_size=args.batch_size,
+            latency_cap=args.batch_latency,
+            queue_size=args.overload_queue_size,
+            timestamps=RequestDeadline.is_enabled(),
+        ).add(agent_udpv4_pktinfo_endpoint)
+
+        transport_index += agent_udpv4_pktinfo_endpoint[2]
 
-        transport_dispatcher.registerTransport(
-            transport_domain, agent_udpv4_endpoint[0]
+        transport_dispatcher.register_transport(
+            transport_domain, agent_udpv4_pktinfo_endpoint[0]
         )
 
+        pktinfo_transports[transport_domain] = agent_udpv4_pktinfo_endpoint[0]
+
+        transports.append(agent_udpv4_pktinfo_endpoint[0])
+
         log.msg(
-            "Listening at UDP/IPv4 endpoint %s, transport ID "
-            "%s"
+            "Listening at UDP/IPv4 endpoint range %s, transport IDs "
+            "%s..%s"
             % (
-                agent_udpv4_endpoint[1],
+                agent_udpv4_pktinfo_endpoint[1],
                 ".".join([str(handler) for handler in transport_domain]),
+                transport_index - 1,
             )
         )
 
     transport_index = args.transport_id_offset
 
     for agent_udpv6_endpoint in args.agent_udpv6_endpoints:
-        transport_domain = udp6.domainName + (transport_index,)
-        transport_index += 1
+        for transport, endpoint in endpoints.bind_endpoints(
+            agent_udpv6_endpoint,
+            ipv6=True,
+            batch_size=args.batch_size,
+            latency_cap=args.batch_latency,
+            queue_size=args.overload_queue_size,
+            timestamps=RequestDeadline.is_enabled(),
+        ):
+            transport_domain = udp6.DOMAIN_NAME + (transport_index,)
+            transport_index += 1
+
+            transport_dispatcher.register_transport(transport_domain, transport)
+
+            transports.append(transport)
+
+            log.msg(
+                "Listening at UDP/IPv6 endpoint %s, transport ID "
+                "%s"
+                % (endpoint, ".".join([str(handler) for handler in transport_domain]))
+            )
 
-        agent_udpv6_endpoint = endpoints.IPv4TransportEndpoints().add(
-            agent_udpv6_endpoint
-        )
+    for agent_udpv6_pktinfo_endpoint in args.agent_udpv6_pktinfo_endpoints:
+        transport_domain = udp6.DOMAIN_NAME + (transport_index,)
+
+        agent_udpv6_pktinfo_endpoint = endpoints.IPv6PktInfoTransportEndpoints(
+            transport_index,
+            batch_size=args.batch_size,
+            latency_cap=args.batch_latency,
+            queue_size=args.overload_queue_size,
+            timestamps=RequestDeadline.is_enabled(),
+        ).add(agent_udpv6_pktinfo_endpoint)
+
+        transport_index += agent_udpv6_pktinfo_endpoint[2]
 
-        transport_dispatcher.registerTransport(
-            transport_domain, agent_udpv6_endpoint[0]
+        transport_dispatcher.register_transport(
+            transport_domain, agent_udpv6_pktinfo_endpoint[0]
         )
 
+        pktinfo_transports[transport_domain] = agent_udpv6_pktinfo_endpoint[0]
+
+        transports.append(agent_udpv6_pktinfo_endpoint[0])
+
         log.msg(
-            "Listening at UDP/IPv6 endpoint %s, transport ID "
-            "%s"
+            "Listening at UDP/IPv6 endpoint range %s, transport IDs "
+            "%s..%s"
             % (
-                agent_udpv6_endpoint[1],
+                agent_udpv6_pktinfo_endpoint[1],
                 ".".join([str(handler) for handler in transport_domain]),
+                transport_index - 1,
             )
         )
 
-    transport_dispatcher.registerRecvCbFun(commandResponderCbFun)
+    log.info(
+        "%s transport endpoint(s) configured in %.3f sec"
+        % (len(transports), time.time() - started)
+    )
+
+    transport_dispatcher.register_recv_callback(commandResponderCbFun)
 
-    transport_dispatcher.jobStarted(1)  # server job would never finish
+    transport_dispatcher.job_started(1)  # server job would never finish
 
     with daemon.PrivilegesOf(args.process_user, args.process_group, final=True):
         try:
-            transport_dispatcher.runDispatcher()
+            transport_dispatcher.run_dispatcher()
 
         except KeyboardInterrupt:
             log.info("Shutting down process...")
@@ -606,7 +1096,57 @@ def main():
                     else:
                         log.info('Variation module "%s" shutdown OK' % name)
 
-            transport_dispatcher.closeDispatcher()
+            batch_transports = [
+                transport
+                for transport in transports
+                if isinstance(transport, endpoints.BatchUdpTransport)
+            ]
+
+            wakeups = sum(transport.wakeups for transport in batch_transports)
+            datagrams = sum(transport.datagrams for transport in batch_transports)
+
+            if wakeups:
+                log.info(
+                    "Handled %s datagram(s) in %s socket wakeup(s), %.2f per "
+                    "wakeup on average, %s at most"
+                    % (
+                        datagrams,
+                        wakeups,
+                        datagrams / wakeups,
+                        max(transport.max_batch for transport in batch_transports),
+                    )
+                )
+
+            shed = sum(transport.shed for transport in batch_transports)
+
+            if shed:
+                log.info("Shed %s request(s) on overload" % shed)
+
+            if AdmissionControl.is_enabled():
+                log.info(
+                    "Dropped %s, rejected %s request(s) over rate limit"
+                    % (AdmissionControl.dropped, AdmissionControl.rejected)
+                )
+
+            if RequestDeadline.is_enabled():
+                log.info(
+                    "Dropped %s request(s) older than %s seconds"
+                    % (RequestDeadline.dropped, RequestDeadline.MAX_AGE)
+                )
+
+            if ResponseCache.is_enabled():
+                log.info(
+                    "Response cache hits %s, misses %s"
+                    % (ResponseCache.hits, ResponseCache.misses)
+                )
+
+            if RetransmissionCache.is_enabled():
+                log.info(
+                    "Replayed responses to %s retransmitted request(s)"
+                    % RetransmissionCache.hits
+                )
+
+            transport_dispatcher.close_dispatcher()
 
             log.info("Process terminated")
 
@@ -26,7 +26,7 @@ class MibInstrumController:
         return str(self._data_file)
 
     def _get_call_context(self, ac_info, next_flag=False, set_flag=False):
-        if ac_info is None:
+        if ac_info is None or ac_info[1] is None:  # v2c arch
             return {"nextFlag": next_flag, "setFlag": set_flag}
 
         ac_fun, snmp_engine = ac_info  # we injected snmpEngine object earlier
@@ -66,7 +66,7 @@ class MibInstrumController:
             transport_protocol = "unknown"
 
         log.info(
-            "SNMP EngineID %s, transportDomain %s, transportAddress %s, "
+            lambda: "SNMP EngineID %s, transportDomain %s, transportAddress %s, "
             "securityModel %s, securityName %s, securityLevel "
             "%s"
             % (
@@ -8,6 +8,7 @@
 #
 import os
 import stat
+import time
 
 from pyasn1.type import univ
 from pysnmp.carrier.asyncio.dgram import udp
@@ -23,7 +24,9 @@ from snmpsim.error import SnmpsimError
 from snmpsim.record.search.database import RecordIndex
 from snmpsim.record.search.file import get_record
 from snmpsim.record.search.file import search_record_by_oid
+from snmpsim.reporting import timing
 from snmpsim.reporting.manager import ReportingManager
+from snmpsim.rspcache import ResponseCache
 
 SELF_LABEL = "self"
 
@@ -42,6 +45,10 @@ class DataFile(AbstractLayout):
         self._text_parser = textParser
         self._text_file = textFile
         self._variation_modules = variationModules
+        # (data file, record offset) -> (record tag, pre-resolved
+        # variation module)
+        self._variation_cache = {}
+        self._indexed_time = None
 
     def index_text(self, forceIndexBuild=False, validateData=False):
         self._record_index.create(forceIndexBuild, validateData)
@@ -61,9 +68,27 @@ class DataFile(AbstractLayout):
 
             log.info("Opening %s" % self)
 
-        return self._record_index.get_handles()
+        handles = self._record_index.get_handles()
+
+        # record offsets change once modified text file is re-indexed
+        if self._indexed_time != self._record_index.text_file_time:
+            self._indexed_time = self._record_index.text_file_time
+            self._variation_cache.clear()
+
+        return handles
 
     def process_var_binds(self, var_binds, **context):
+        started = time.time()
+
+        timer = timing.current()
+
+        if timer:
+            # time since message decoding is spent on data file selection
+            # and access control
+            timer.lap("probe")
+            timer.data_file = self._text_file
+            timer.pdu_type = context.get("pduType", timer.pdu_type)
+
         rsp_var_binds = []
 
         if context.get("nextFlag"):
@@ -78,6 +103,8 @@ class DataFile(AbstractLayout):
         except SnmpsimError as exc:
             log.error("Problem with data file or its index: %s" % exc)
 
+            ResponseCache.track(self._text_file, cacheable=False)
+
             ReportingManager.update_metrics(
                 data_file=self._text_file,
                 datafile_failure_count=1,
@@ -90,8 +117,10 @@ class DataFile(AbstractLayout):
         vars_remaining = vars_total = len(var_binds)
         err_total = 0
 
+        variated = False
+
         log.info(
-            "Request var-binds: %s, flags: %s, "
+            lambda: "Request var-binds: %s, flags: %s, "
             "%s"
             % (
                 ", ".join([f"{vb[0]}=<{vb[1].prettyPrint()}>" for vb in var_binds]),
@@ -122,12 +151,17 @@ class DataFile(AbstractLayout):
 
             offset = int(offset)
 
+            if timer:
+                timer.lap("lookup")
+
             text.seek(offset)
 
             vars_remaining -= 1
 
             line, _, _ = get_record(text)  # matched line
 
+            line_offset = text.tell() - len(line)
+
             while True:
                 if exact_match:
                     if context.get("nextFlag") and not subtree_flag:
@@ -141,7 +175,7 @@ class DataFile(AbstractLayout):
                             try:
                                 _, subtree_flag, _ = self._record_index.lookup(
                                     str(_next_oid)
-                                ).split(',', 2)
+                                ).split(b",", 2)
 
                             except KeyError:
                                 log.error(
@@ -153,6 +187,7 @@ class DataFile(AbstractLayout):
                             else:
                                 subtree_flag = int(subtree_flag)
                                 line = _next_line
+                                line_offset = text.tell() - len(line)
 
                         else:
                             line = _next_line
@@ -188,6 +223,7 @@ class DataFile(AbstractLayout):
                             if _prev_oid.isPrefixOf(oid):
                                 # use previous line to the matched one
                                 line = _prev_line
+                                line_offset = text.tell() - len(line)
                                 subtree_flag = True
 
                 if not line:
@@ -207,11 +243,17 @@ class DataFile(AbstractLayout):
                     varsTotal=vars_total,
                     varsRemaining=vars_remaining,
                     variationModules=self._variation_modules,
+                    variationCache=self._variation_cache,
+                    recordOffset=line_offset,
                 )
 
                 try:
                     _oid, _val = self._text_parser.evaluate(line, **call_context)
 
+                    # records skipped over may be variated as well
+                    if (self._text_file, line_offset) in self._variation_cache:
+                        variated = True
+
                     if _val is exval.endOfMib:
                         exact_match = True
                         subtree_flag = False
@@ -231,21 +273,32 @@ class DataFile(AbstractLayout):
 
                 break
 
+            if timer:
+                timer.lap("read")
+
             rsp_var_binds.append((_oid, _val))
 
         log.info(
-            "Response var-binds: %s"
+            lambda: "Response var-binds: %s"
             % (", ".join([f"{vb[0]}=<{vb[1].prettyPrint()}>" for vb in rsp_var_binds]))
         )
 
-        ReportingManager.update_metrics(
-            data_file=self._text_file,
-            varbind_count=vars_total,
-            datafile_call_count=1,
-            datafile_failure_count=err_total,
-            transport_call_count=1,
-            **context,
-        )
+        ResponseCache.track(self._text_file, cacheable=not (err_total or variated))
+
+        if timer:
+            timer.mark()
+
+        if ReportingManager.is_enabled():
+            ReportingManager.update_metrics(
+                data_file=self._text_file,
+                varbind_count=vars_total,
+                datafile_call_count=1,
+                datafile_failure_count=err_total,
+                datafile_latency=time.time() - started,
+                transport_call_count=1,
+                varbind_oids=[vb[0] for vb in var_binds],
+                **context,
+            )
 
         return rsp_var_binds
 
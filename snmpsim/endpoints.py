@@ -6,12 +6,29 @@
 #
 # SNMP transport endpoints initialization harness
 #
+import collections
+import ipaddress
 import socket
+import struct
+import sys
+import time
 
+from pysnmp.carrier import error
 from pysnmp.carrier.asyncio.dgram import udp
 from pysnmp.carrier.asyncio.dgram import udp6
 
+from snmpsim import log
 from snmpsim.error import SnmpsimError
+from snmpsim.reporting.manager import ReportingManager
+
+# not exported by Python's socket module before 3.12
+IP_PKTINFO = getattr(socket, "IP_PKTINFO", sys.platform == "linux" and 8 or None)
+SO_TIMESTAMPNS = getattr(
+    socket, "SO_TIMESTAMPNS", sys.platform == "linux" and 35 or None
+)
+
+# struct timespec
+TIMESPEC = struct.Struct("@ll")
 
 
 class TransportEndpointsBase:
@@ -68,6 +85,605 @@ class IPv6TransportEndpoints(TransportEndpointsBase):
         return udp6.Udp6Transport().openServerMode((h, p)), addr
 
 
+class BatchUdpTransport(udp.UdpAsyncioTransport):
+    """UDP transport handling datagrams in batches.
+
+    Once the socket becomes readable, up to `batch_size` pending
+    datagrams are read and processed in one go, unless `latency_cap`
+    seconds pass first. Responses sent while processing the batch are
+    held back and sent out together at the end of it.
+
+    With `queue_size` set, pending datagrams are first moved from the
+    socket into a queue of that many datagrams, the oldest ones being
+    shed once it overflows. Batches are then taken off the queue. The
+    kernel drops the newest datagrams on socket buffer overflow, while
+    the queue lets an overloaded simulator serve the most recent
+    requests, which their senders are still waiting for.
+
+    With `timestamps` on, the arrival time of the datagram being
+    handled is kept in `arrival`. The time the kernel received the
+    datagram at is used if the system supports it, otherwise the time
+    it was read off the socket.
+
+    The number of wakeups, datagrams read, the largest batch and
+    shed datagrams are counted.
+    """
+
+    WILDCARD_ADDRESS = "0.0.0.0"
+
+    MAX_DATAGRAM_SIZE = 65535
+
+    def __init__(
+        self, batch_size=1, latency_cap=0.005, queue_size=0, timestamps=False, loop=None
+    ):
+        udp.UdpAsyncioTransport.__init__(self, loop=loop)
+        self._batch_size = batch_size
+        self._latency_cap = latency_cap
+        self._queue = None
+
+        if queue_size:
+            self._queue = collections.deque(maxlen=queue_size)
+
+        self._queue_scheduled = False
+        self._timestamps = timestamps
+        self._ancbufsize = 0
+
+        if timestamps and SO_TIMESTAMPNS is not None:
+            self._ancbufsize = socket.CMSG_SPACE(TIMESPEC.size)
+
+        self.arrival = None
+        self._socket = None
+        self._outgoing = None
+        self.wakeups = self.datagrams = self.max_batch = self.shed = 0
+
+    def open_server_mode(self, iface=None, sock=None):
+        if sock is None:
+            sock = socket.socket(self.SOCK_FAMILY, socket.SOCK_DGRAM)
+
+            try:
+                self._configure(sock)
+
+                if self._ancbufsize:
+                    sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+
+                sock.bind(iface)
+
+            except OSError as exc:
+                sock.close()
+                raise error.CarrierError("Failed to bind %s: %s" % (iface, exc))
+
+        sock.setblocking(False)
+
+        self._socket = sock
+
+        self.loop.add_reader(sock.fileno(), self._read_ready)
+
+        return self
+
+    def _configure(self, sock):
+        pass
+
+    def _arrival(self, ancdata):
+        """Return datagram arrival time stamped by the kernel"""
+        for level, option, data in ancdata:
+            if level == socket.SOL_SOCKET and option == SO_TIMESTAMPNS:
+                seconds, nanoseconds = TIMESPEC.unpack(data[: TIMESPEC.size])
+                return seconds + nanoseconds / 1e9
+
+        return time.time()
+
+    def _receive(self):
+        """Read a datagram, return it with peer transport address and
+        arrival time (`None` unless timestamps are on).
+
+        Return `None` for datagrams that should be ignored.
+        """
+        if self._ancbufsize:
+            datagram, ancdata, _, address = self._socket.recvmsg(
+                self.MAX_DATAGRAM_SIZE, self._ancbufsize
+            )
+
+            return datagram, self.ADDRESS_TYPE(address), self._arrival(ancdata)
+
+        datagram, address = self._socket.recvfrom(self.MAX_DATAGRAM_SIZE)
+
+        arrival = self._timestamps and time.time() or None
+
+        return datagram, self.ADDRESS_TYPE(address), arrival
+
+    def _send(self, outgoingMessage, transportAddress):
+        self._socket.sendto(outgoingMessage, tuple(transportAddress))
+
+    def _fill_queue(self):
+        """Move pending datagrams into the queue, return the number shed"""
+        queue = self._queue
+
+        shed = 0
+
+        # let other sockets be served under flood
+        for _ in range(queue.maxlen):
+            try:
+                received = self._receive()
+
+            except (BlockingIOError, InterruptedError):
+                break
+
+            except OSError as exc:
+                log.error("Failed to receive datagram: %s", exc)
+                break
+
+            if received:
+                if len(queue) == queue.maxlen:
+                    shed += 1
+
+                queue.append(received)
+
+        return shed
+
+    def _read_ready(self):
+        started = time.perf_counter()
+
+        queue = self._queue
+
+        if queue is not None:
+            self._queue_scheduled = False
+
+            # closed while queue serving was scheduled
+            if self._socket is None:
+                return
+
+            shed = self._fill_queue()
+
+            if shed:
+                self.shed += shed
+
+                if ReportingManager.is_enabled():
+                    ReportingManager.update_metrics(
+                        transport_protocol=self.SOCK_FAMILY == socket.AF_INET6
+                        and "udpv6"
+                        or "udpv4",
+                        shed_reason="overload",
+                        shed_count=shed,
+                    )
+
+        self._outgoing = []
+
+        count = 0
+
+        try:
+            while count < self._batch_size:
+                if queue is not None:
+                    if not queue:
+                        break
+
+                    received = queue.popleft()
+
+                else:
+                    try:
+                        received = self._receive()
+
+                    except (BlockingIOError, InterruptedError):
+                        break
+
+                    except OSError as exc:
+                        log.error("Failed to receive datagram: %s", exc)
+                        break
+
+                count += 1
+
+                if received:
+                    self.arrival = received[2]
+                    self._callback_function(self, received[1], received[0])
+
+                if time.perf_counter() - started >= self._latency_cap:
+                    break
+
+        finally:
+            outgoing, self._outgoing = self._outgoing, None
+
+            for outgoingMessage, transportAddress in outgoing:
+                self.send_message(outgoingMessage, transportAddress)
+
+            # the socket may not get readable again till the queue is served
+            if queue and not self._queue_scheduled:
+                self._queue_scheduled = True
+                self.loop.call_soon(self._read_ready)
+
+        self.wakeups += 1
+        self.datagrams += count
+
+        if count > self.max_batch:
+            self.max_batch = count
+
+        if ReportingManager.is_enabled():
+            ReportingManager.update_metrics(
+                transport_protocol=self.SOCK_FAMILY == socket.AF_INET6
+                and "udpv6"
+                or "udpv4",
+                transport_wakeup_count=1,
+                transport_wakeup_datagram_count=count,
+            )
+
+    def send_message(self, outgoingMessage, transportAddress):
+        # hold back responses till the end of the batch
+        if self._outgoing is not None:
+            self._outgoing.append((outgoingMessage, transportAddress))
+            return
+
+        try:
+            self._send(outgoingMessage, transportAddress)
+
+        except OSError as exc:
+            log.error("Failed to send datagram to %s: %s", transportAddress, exc)
+
+    def close_transport(self):
+        if self._socket is not None:
+            self.loop.remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
+
+        udp.UdpAsyncioTransport.close_transport(self)
+
+
+class BatchUdp6Transport(BatchUdpTransport):
+    """UDP/IPv6 transport handling datagrams in batches"""
+
+    SOCK_FAMILY = socket.AF_INET6
+    ADDRESS_TYPE = udp6.Udp6TransportAddress
+
+    WILDCARD_ADDRESS = "::"
+
+
+class PktInfoUdpTransport(BatchUdpTransport):
+    """Serve a range of local UDP/IPv4 addresses over a single socket.
+
+    The socket is bound to the wildcard address, destination address
+    of each request is recovered from IP_PKTINFO ancillary data and
+    set as the local address of the peer transport address. Responses
+    are sent from the local address of the peer transport address.
+
+    Requests to addresses outside of the range are ignored.
+    """
+
+    DOMAIN_NAME = udp.DOMAIN_NAME
+
+    PKTINFO_LEVEL = socket.IPPROTO_IP
+    PKTINFO_OPTION = IP_PKTINFO
+    RECV_PKTINFO_OPTION = IP_PKTINFO
+
+    # interface index, local address, destination address
+    PKTINFO = struct.Struct("=I4s4s")
+
+    def __init__(self, first_address, count, transport_id, **kwargs):
+        BatchUdpTransport.__init__(self, **kwargs)
+        self._first_address = int(first_address)
+        self._count = count
+        self._transport_id = transport_id
+        self._port = None
+
+    def open_server_mode(self, iface=None, sock=None):
+        if self.RECV_PKTINFO_OPTION is None:
+            raise error.CarrierError("Packet info not supported by this system")
+
+        self._port = iface[1]
+
+        return BatchUdpTransport.open_server_mode(
+            self, (self.WILDCARD_ADDRESS, iface[1])
+        )
+
+    def _configure(self, sock):
+        sock.setsockopt(self.PKTINFO_LEVEL, self.RECV_PKTINFO_OPTION, 1)
+
+    def _unpack_pktinfo(self, data):
+        return self.PKTINFO.unpack(data[: self.PKTINFO.size])[2]
+
+    def _pack_pktinfo(self, address):
+        return self.PKTINFO.pack(0, address, bytes(4))
+
+    def _receive(self):
+        datagram, ancdata, _, address = self._socket.recvmsg(
+            self.MAX_DATAGRAM_SIZE,
+            socket.CMSG_SPACE(self.PKTINFO.size) + self._ancbufsize,
+        )
+
+        for level, option, data in ancdata:
+            if level == self.PKTINFO_LEVEL and option == self.PKTINFO_OPTION:
+                local_address = self._unpack_pktinfo(data)
+                break
+
+        else:
+            return
+
+        index = int.from_bytes(local_address, "big") - self._first_address
+
+        if not 0 <= index < self._count:
+            return
+
+        transport_address = self.ADDRESS_TYPE(address).set_local_address(
+            (socket.inet_ntop(self.SOCK_FAMILY, local_address), self._port)
+        )
+
+        arrival = self._timestamps and self._arrival(ancdata) or None
+
+        return datagram, transport_address, arrival
+
+    def address_domain(self, transport_address):
+        """Return transport domain of the local address of the request.
+
+        Each address of the range gets its own transport ID, assigned
+        in address order.
+        """
+        local_address = ipaddress.ip_address(transport_address.get_local_address()[0])
+
+        return self.DOMAIN_NAME + (
+            self._transport_id + int(local_address) - self._first_address,
+        )
+
+    def _send(self, outgoingMessage, transportAddress):
+        local_address = transportAddress.get_local_address()
+
+        ancdata = []
+
+        if local_address:
+            ancdata.append(
+                (
+                    self.PKTINFO_LEVEL,
+                    self.PKTINFO_OPTION,
+                    self._pack_pktinfo(
+                        socket.inet_pton(self.SOCK_FAMILY, local_address[0])
+                    ),
+                )
+            )
+
+        self._socket.sendmsg([outgoingMessage], ancdata, 0, tuple(transportAddress))
+
+
+class PktInfoUdp6Transport(PktInfoUdpTransport):
+    """Serve a range of local UDP/IPv6 addresses over a single socket"""
+
+    SOCK_FAMILY = socket.AF_INET6
+    ADDRESS_TYPE = udp6.Udp6TransportAddress
+
+    DOMAIN_NAME = udp6.DOMAIN_NAME
+    WILDCARD_ADDRESS = "::"
+
+    PKTINFO_LEVEL = socket.IPPROTO_IPV6
+    PKTINFO_OPTION = getattr(socket, "IPV6_PKTINFO", None)
+    RECV_PKTINFO_OPTION = getattr(socket, "IPV6_RECVPKTINFO", None)
+
+    # destination address, interface index
+    PKTINFO = struct.Struct("=16sI")
+
+    def _configure(self, sock):
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+        PktInfoUdpTransport._configure(self, sock)
+
+    def _unpack_pktinfo(self, data):
+        return self.PKTINFO.unpack(data[: self.PKTINFO.size])[0]
+
+    def _pack_pktinfo(self, address):
+        return self.PKTINFO.pack(address, 0)
+
+
+def parse_address_range(arg, ipv6=False):
+    """Parse address range given as `network/prefix` or `first-last`.
+
+    Returns first address of the range and the number of addresses in it.
+    """
+    try:
+        if "/" in arg:
+            network = ipaddress.ip_network(arg, strict=False)
+
+            first, count = network.network_address, network.num_addresses
+
+        else:
+            first, dash, last = arg.partition("-")
+
+            first = ipaddress.ip_address(first)
+            last = dash and ipaddress.ip_address(last) or first
+
+            if last.version != first.version:
+                raise ValueError("IP versions differ")
+
+            count = int(last) - int(first) + 1
+
+    except ValueError as exc:
+        raise SnmpsimError(f"Malformed address range {arg}: {exc}")
+
+    if first.version != (ipv6 and 6 or 4):
+        raise SnmpsimError(f"Address range {arg} is not IPv{ipv6 and 6 or 4}")
+
+    if count < 1:
+        raise SnmpsimError(f"Empty address range {arg}")
+
+    return first, count
+
+
+class IPv4PktInfoTransportEndpoints(TransportEndpointsBase):
+    """Single socket serving a range of local UDP/IPv4 addresses"""
+
+    TRANSPORT = PktInfoUdpTransport
+    IPV6 = False
+
+    def __init__(self, transport_id, **options):
+        TransportEndpointsBase.__init__(self)
+        self._transport_id = transport_id
+        self._options = options
+
+    def _addEndpoint(self, addr):
+        address_range, port = split_endpoint(addr, ipv6=self.IPV6)
+
+        first, count = parse_address_range(address_range, ipv6=self.IPV6)
+
+        try:
+            transport = self.TRANSPORT(
+                first, count, self._transport_id, **self._options
+            )
+            transport.open_server_mode((address_range, port))
+
+        except error.CarrierError as exc:
+            raise SnmpsimError(
+                "Failed to serve endpoint address range %s: %s" % (addr, exc)
+            )
+
+        return transport, addr, count
+
+
+class IPv6PktInfoTransportEndpoints(IPv4PktInfoTransportEndpoints):
+    """Single socket serving a range of local UDP/IPv6 addresses"""
+
+    TRANSPORT = PktInfoUdp6Transport
+    IPV6 = True
+
+
+def split_endpoint(addr, ipv6=False):
+    """Split `address:port` (or `[address]:port` for IPv6) endpoint.
+
+    Port defaults to 161.
+    """
+    if ipv6:
+        if not addr.startswith("[") or "]:" not in addr:
+            return addr.strip("[]"), 161
+
+        address, port = addr[1:].split("]:", 1)
+
+    else:
+        address, _, port = addr.rpartition(":")
+
+        if not address:
+            return addr, 161
+
+    try:
+        return address, int(port)
+
+    except ValueError:
+        raise SnmpsimError("improper endpoint %s" % addr)
+
+
+def _is_address_range(address):
+    if "/" in address:
+        return True
+
+    # host names may contain dashes
+    first, _, last = address.partition("-")
+
+    try:
+        ipaddress.ip_address(first)
+        ipaddress.ip_address(last)
+
+    except ValueError:
+        return False
+
+    return True
+
+
+# socket per address beyond that would run out of file descriptors
+MAX_RANGE_ENDPOINTS = 65536
+
+
+def expand_endpoint(addr, ipv6=False):
+    """Expand endpoint address range into endpoints of each address.
+
+    Returns a list of `(address, port)` tuples in address order or
+    `None` if `addr` is not an address range.
+    """
+    address, port = split_endpoint(addr, ipv6)
+
+    if not _is_address_range(address):
+        return None
+
+    first, count = parse_address_range(address, ipv6)
+
+    if count > MAX_RANGE_ENDPOINTS:
+        raise SnmpsimError(
+            "Address range %s holds %s addresses, over %s allowed. Consider "
+            "packet information endpoints" % (address, count, MAX_RANGE_ENDPOINTS)
+        )
+
+    return [(str(first + idx), port) for idx in range(count)]
+
+
+def bind_endpoints(
+    addr, ipv6=False, batch_size=1, latency_cap=None, queue_size=0, timestamps=False
+):
+    """Bind UDP transport endpoint or a range of endpoints.
+
+    Endpoints of an address range are bound right away to literal
+    addresses, skipping name resolution.
+
+    With `batch_size` over 1, `queue_size` or `timestamps` set, endpoints
+    are served by transports handling datagrams in batches (see
+    `BatchUdpTransport`).
+
+    Returns a list of `(transport, endpoint)` tuples in address order.
+    """
+    if ipv6 and not udp6:
+        raise SnmpsimError("This system does not support UDP/IP6")
+
+    addresses = expand_endpoint(addr, ipv6)
+
+    if batch_size <= 1 and not queue_size and not timestamps:
+        if addresses is None:
+            if ipv6:
+                endpoint = IPv6TransportEndpoints().add(addr)
+
+            else:
+                endpoint = IPv4TransportEndpoints().add(addr)
+
+            return [(endpoint[0], endpoint[1])]
+
+        transport_class = ipv6 and udp6.Udp6Transport or udp.UdpTransport
+        options = {}
+
+    else:
+        transport_class = ipv6 and BatchUdp6Transport or BatchUdpTransport
+        options = {
+            "batch_size": batch_size,
+            "queue_size": queue_size,
+            "timestamps": timestamps,
+        }
+
+        if latency_cap is not None:
+            options["latency_cap"] = latency_cap
+
+        if addresses is None:
+            try:
+                transport = transport_class(**options).open_server_mode(
+                    split_endpoint(addr, ipv6)
+                )
+
+            except error.CarrierError as exc:
+                raise SnmpsimError("Failed to serve endpoint %s: %s" % (addr, exc))
+
+            return [(transport, addr)]
+
+    family = ipv6 and socket.AF_INET6 or socket.AF_INET
+
+    sockets = []
+
+    try:
+        for address in addresses:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sockets.append(sock)
+            sock.bind(address)
+
+    except OSError as exc:
+        for sock in sockets:
+            sock.close()
+
+        raise SnmpsimError("Failed to bind endpoint %s:%s: %s" % (address + (exc,)))
+
+    endpoint_format = ipv6 and "[%s]:%s" or "%s:%s"
+
+    return [
+        (
+            transport_class(**options).open_server_mode(sock=sock),
+            endpoint_format % address,
+        )
+        for sock, address in zip(sockets, addresses)
+    ]
+
+
 def parse_endpoint(arg, ipv6=False):
     address = arg
 
@@ -86,6 +702,16 @@ def parse_endpoint(arg, ipv6=False):
     except Exception as exc:
         raise SnmpsimError(f"Malformed network endpoint address {arg}: {exc}")
 
+    if _is_address_range(address):
+        return str(parse_address_range(address, ipv6)[0]), port
+
+    try:
+        # literal addresses need no resolution
+        return str(ipaddress.ip_address(address)), port
+
+    except ValueError:
+        pass
+
     try:
         address, port = socket.getaddrinfo(
             address,
@@ -0,0 +1,206 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# Append-only journal of managed object values
+#
+import collections.abc
+import os
+import threading
+import time
+
+from pyasn1.type import univ
+
+from snmpsim import error
+from snmpsim import log
+from snmpsim.record.snmprec import SnmprecRecord
+
+
+class JournalStore(collections.abc.MutableMapping):
+    """Dict-like store of OID to SNMP value persisted in a journal file.
+
+    Every update is appended to the journal as a *.snmprec* line. Appended
+    records are written and fsync'ed in batches by a background thread
+    every `sync_interval` seconds (group commit), so updates do not wait
+    for disk I/O.
+
+    On start up, the journal is replayed into memory, a torn record at
+    its end being cut off. Obsolete records
+    are dropped by rewriting the journal from memory every
+    `compact_interval` seconds, provided the journal has grown at least
+    `compact_ratio` times larger than the number of live records.
+    """
+
+    RECORD = SnmprecRecord()
+
+    def __init__(self, path, sync_interval=0.1, compact_interval=300, compact_ratio=2):
+        self._path = path
+        self._sync_interval = sync_interval
+        self._compact_interval = compact_interval
+        self._compact_ratio = compact_ratio
+
+        self._data = {}
+        self._pending = []
+        self._tail = None
+        self._journal_size = 0
+
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        self._replay()
+
+        self._journal = open(self._path, "ab")
+
+        self._thread = threading.Thread(
+            target=self._run, name="snmpsim-journal", daemon=True
+        )
+        self._thread.start()
+
+    def _replay(self):
+        if not os.path.exists(self._path):
+            return
+
+        started = time.time()
+
+        # end of the last complete record
+        offset = 0
+
+        with open(self._path, "rb") as journal:
+            for line_no, line in enumerate(journal, 1):
+                if not line.endswith(b"\n"):
+                    # torn write on crash
+                    log.error(
+                        "journal %s: dropping torn record at line %s"
+                        % (self._path, line_no)
+                    )
+                    break
+
+                offset += len(line)
+
+                try:
+                    oid, value = self.RECORD.evaluate(line)
+
+                except error.SnmpsimError as exc:
+                    log.error(
+                        "journal %s: skipping broken record at line %s: "
+                        "%s" % (self._path, line_no, exc)
+                    )
+                    continue
+
+                self._data[str(oid)] = value
+                self._journal_size += 1
+
+        # let further records be appended after the last complete one
+        if offset < os.path.getsize(self._path):
+            os.truncate(self._path, offset)
+
+        log.info(
+            "journal %s: %s records replayed into %s values in %.3f "
+            "sec"
+            % (self._path, self._journal_size, len(self._data), time.time() - started)
+        )
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        line = self.RECORD.format(univ.ObjectIdentifier(key), value)
+
+        with self._lock:
+            self._data[key] = value
+            self._pending.append(line)
+
+            if self._tail is not None:
+                self._tail.append(line)
+
+    def __delitem__(self, key):
+        raise error.SnmpsimError("journal %s: deletion not supported" % self._path)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def _run(self):
+        last_compacted = time.time()
+
+        while not self._stopped.wait(self._sync_interval):
+            self.sync()
+
+            if time.time() - last_compacted >= self._compact_interval:
+                self.compact()
+                last_compacted = time.time()
+
+    def sync(self):
+        """Write out and fsync pending journal records"""
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+
+            if not pending:
+                return
+
+            self._journal.write(b"".join(pending))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+            self._journal_size += len(pending)
+
+    def compact(self, force=False):
+        """Rewrite journal leaving just the latest value per OID"""
+        with self._compact_lock:
+            with self._lock:
+                if not force and (
+                    self._journal_size + len(self._pending)
+                    <= self._compact_ratio * len(self._data)
+                ):
+                    return
+
+                snapshot = dict(self._data)
+
+                # capture updates made while snapshot is being written out
+                self._tail = []
+
+            started = time.time()
+
+            compacted_path = self._path + ".compact"
+
+            with open(compacted_path, "wb") as journal:
+                for key, value in snapshot.items():
+                    journal.write(self.RECORD.format(univ.ObjectIdentifier(key), value))
+
+                with self._io_lock, self._lock:
+                    journal.write(b"".join(self._tail))
+                    journal.flush()
+                    os.fsync(journal.fileno())
+
+                    os.replace(compacted_path, self._path)
+
+                    self._journal.close()
+                    self._journal = open(self._path, "ab")
+
+                    self._journal_size = len(snapshot) + len(self._tail)
+                    self._pending = []
+                    self._tail = None
+
+            log.info(
+                "journal %s: compacted to %s records in %.3f "
+                "sec" % (self._path, len(snapshot), time.time() - started)
+            )
+
+    def close(self):
+        """Stop background thread, flush pending records"""
+        self._stopped.set()
+        self._thread.join()
+
+        self.sync()
+
+        self._journal.close()
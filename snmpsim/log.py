@@ -4,8 +4,10 @@
 # Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
 # License: https://www.pysnmp.com/snmpsim/license.html
 #
+import atexit
 import logging
 import os
+import queue
 import socket
 import sys
 import time
@@ -17,13 +19,44 @@ LOG_DEBUG = 0
 LOG_INFO = 1
 LOG_ERROR = 2
 
+QUEUE_DROP = "drop"
+QUEUE_BLOCK = "block"
+
+
+class BoundedQueueHandler(handlers.QueueHandler):
+    """Pass log records to a bounded queue.
+
+    When the queue is full, the record is either dropped (and counted)
+    or the caller blocks until the queue drains, depending on `policy`.
+    """
+
+    def __init__(self, size, policy=QUEUE_DROP):
+        handlers.QueueHandler.__init__(self, queue.Queue(size))
+        self.policy = policy
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if self.policy == QUEUE_BLOCK:
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+
+        except queue.Full:
+            self.dropped += 1
+
 
 class AbstractLogger:
+    DISCARD = False
+
     def __init__(self, progId, *priv):
         self._logger = logging.getLogger(progId)
         self._logger.setLevel(logging.DEBUG)
         self._progId = progId
         self._ident = 0
+        self._queue_handler = None
+        self._listener = None
         self.init(*priv)
 
     def __call__(self, s):
@@ -40,6 +73,51 @@ class AbstractLogger:
     def init(self, *priv):
         pass
 
+    def set_queue(self, size, policy=QUEUE_DROP):
+        """Write log records from a background thread.
+
+        Logging calls just enqueue records, while a dedicated thread
+        passes them on to the handlers doing actual I/O.
+        """
+        if self._listener:
+            return
+
+        targets = self._logger.handlers[:]
+
+        for handler in targets:
+            self._logger.removeHandler(handler)
+
+        self._queue_handler = BoundedQueueHandler(size, policy)
+        self._logger.addHandler(self._queue_handler)
+
+        self._listener = handlers.QueueListener(self._queue_handler.queue, *targets)
+        self._listener.start()
+
+    def stop_queue(self):
+        """Write out queued log records, resume synchronous logging"""
+        if not self._listener:
+            return
+
+        self._listener.stop()
+
+        self._logger.removeHandler(self._queue_handler)
+
+        for handler in self._listener.handlers:
+            self._logger.addHandler(handler)
+
+        self._listener = None
+
+        if self._queue_handler.dropped:
+            self(
+                "%s log message(s) dropped on queue overflow"
+                % self._queue_handler.dropped
+            )
+
+    @property
+    def dropped(self):
+        """Number of log messages dropped on queue overflow"""
+        return self._queue_handler and self._queue_handler.dropped or 0
+
 
 class SyslogLogger(AbstractLogger):
     SYSLOG_SOCKET_PATHS = ("/dev/log", "/var/run/syslog")
@@ -258,6 +336,8 @@ class StderrLogger(StreamLogger):
 
 
 class NullLogger(AbstractLogger):
+    DISCARD = True
+
     def init(self, *priv):
         handler = logging.NullHandler()
         self._logger.addHandler(handler)
@@ -285,19 +365,47 @@ msg = lambda x: None
 log_level = LOG_INFO
 
 
-def error(message, ctx=""):
-    if log_level <= LOG_ERROR:
-        msg(f"ERROR {message} {ctx}")
+def enabled(level):
+    """Tell if messages of given level would be emitted.
+
+    Messages are discarded if below the current log level or if no
+    real logger is configured.
+    """
+    return log_level <= level and not getattr(msg, "DISCARD", True)
+
+
+def _format(message, args, ctx):
+    # message may be a callable producing the message text on demand
+    if callable(message):
+        message = message()
+
+    if args:
+        message = message % args
+
+    return f"{message} {ctx}"
+
 
+def error(message, *args, ctx=""):
+    """Log error message.
 
-def info(message, ctx=""):
-    if log_level <= LOG_INFO:
-        msg(f"{message} {ctx}")
+    Message is either a string or a callable returning a string. In
+    the former case, optional `args` are %-interpolated into the
+    message. Nothing is formatted unless the message is emitted.
+    """
+    if enabled(LOG_ERROR):
+        msg("ERROR " + _format(message, args, ctx))
 
 
-def debug(message, ctx=""):
-    if log_level <= LOG_DEBUG:
-        msg(f"DEBUG {message} {ctx}")
+def info(message, *args, ctx=""):
+    """Log informational message, see `error()` for parameters"""
+    if enabled(LOG_INFO):
+        msg(_format(message, args, ctx))
+
+
+def debug(message, *args, ctx=""):
+    """Log debugging message, see `error()` for parameters"""
+    if enabled(LOG_DEBUG):
+        msg("DEBUG " + _format(message, args, ctx))
 
 
 def set_level(level):
@@ -313,6 +421,28 @@ def set_level(level):
         )
 
 
+def set_queue(size, policy=QUEUE_DROP):
+    """Move log I/O off the calling thread.
+
+    Up to `size` log messages are queued for a background writer
+    thread. Once the queue is full, further messages are dropped or
+    block the caller until the writer catches up, as `policy` says.
+    """
+    if policy not in (QUEUE_DROP, QUEUE_BLOCK):
+        raise SnmpsimError(
+            'Unknown log queue policy "%s", known policies are: '
+            "%s, %s" % (policy, QUEUE_DROP, QUEUE_BLOCK)
+        )
+
+    if size < 1:
+        raise SnmpsimError("Log queue size must be positive: %s" % size)
+
+    if isinstance(msg, AbstractLogger) and not msg.DISCARD:
+        msg.set_queue(size, policy)
+
+        atexit.register(msg.stop_queue)
+
+
 def set_logger(progId, *priv, **options):
     global msg
 
@@ -0,0 +1,412 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# SNMP notifications sending harness
+#
+import asyncio
+import threading
+import time
+
+from pysnmp.hlapi.v3arch.asyncio import *
+from pysnmp.hlapi.v3arch.asyncio.transport import Udp6TransportTarget
+from pysnmp.proto import errind
+from pysnmp.hlapi.v3arch.asyncio.transport import UdpTransportTarget
+
+from snmpsim import log
+from snmpsim.error import SnmpsimError
+from snmpsim.utils import split
+
+TRANSPORT_TARGETS = {
+    "udp": UdpTransportTarget,
+    "udp6": Udp6TransportTarget,
+}
+
+TYPE_MAP = {
+    "s": OctetString,
+    "h": lambda x: OctetString(hexValue=x),
+    "i": Integer32,
+    "o": ObjectIdentifier,
+    "a": IpAddress,
+    "u": Unsigned32,
+    "g": Gauge32,
+    "t": TimeTicks,
+    "b": Bits,
+    "I": Counter64,
+}
+
+AUTH_PROTOCOLS = {
+    "md5": usmHMACMD5AuthProtocol,
+    "sha": usmHMACSHAAuthProtocol,
+    "none": usmNoAuthProtocol,
+}
+
+PRIV_PROTOCOLS = {
+    "des": usmDESPrivProtocol,
+    "aes": usmAesCfb128Protocol,
+    "none": usmNoPrivProtocol,
+}
+
+NOTIFICATION_OPTIONS = (
+    ("op", "set"),
+    ("community", "public"),
+    ("authkey", None),
+    ("authproto", "md5"),
+    ("privkey", None),
+    ("privproto", "des"),
+    ("proto", "udp"),
+    ("port", "162"),
+    ("ntftype", "trap"),
+    ("trapoid", "1.3.6.1.6.3.1.1.5.1"),
+)
+
+
+def parse_notification_options(value):
+    """Parse comma-separated `key=value` notification parameters"""
+    args = dict([split(x, "=") for x in split(value, ",")])
+
+    for k, v in NOTIFICATION_OPTIONS:
+        args.setdefault(k, v)
+
+    if "hexvalue" in args:
+        args["value"] = [
+            int(args["hexvalue"][x : x + 2], 16)
+            for x in range(0, len(args["hexvalue"]), 2)
+        ]
+
+    return args
+
+
+def get_auth_data(args):
+    """Build SNMP credentials from notification parameters"""
+    if args["version"] in ("1", "2c"):
+        return CommunityData(
+            args["community"], mpModel=args["version"] == "2c" and 1 or 0
+        )
+
+    elif args["version"] == "3":
+        try:
+            authProtocol = AUTH_PROTOCOLS[args["authproto"]]
+
+        except KeyError:
+            raise SnmpsimError("unknown auth proto %s" % args["authproto"])
+
+        try:
+            privProtocol = PRIV_PROTOCOLS[args["privproto"]]
+
+        except KeyError:
+            raise SnmpsimError("unknown privacy proto %s" % args["privproto"])
+
+        return UsmUserData(
+            args["user"],
+            args["authkey"],
+            args["privkey"],
+            authProtocol=authProtocol,
+            privProtocol=privProtocol,
+        )
+
+    else:
+        raise SnmpsimError("unknown SNMP version %s" % args.get("version"))
+
+
+def get_notification_type(args):
+    """Build SNMP notification from notification parameters"""
+    varBinds = []
+
+    if "uptime" in args:
+        varBinds.append(
+            (ObjectIdentifier("1.3.6.1.2.1.1.3.0"), TimeTicks(args["uptime"]))
+        )
+
+    if args["version"] == "1":
+        if "agentaddress" in args:
+            varBinds.append(
+                (
+                    ObjectIdentifier("1.3.6.1.6.3.18.1.3.0"),
+                    IpAddress(args["agentaddress"]),
+                )
+            )
+
+        if "enterprise" in args:
+            varBinds.append(
+                (
+                    ObjectIdentifier("1.3.6.1.6.3.1.1.4.3.0"),
+                    ObjectIdentifier(args["enterprise"]),
+                )
+            )
+
+    if "varbinds" in args:
+        vbs = split(args["varbinds"], ":")
+        while vbs:
+            varBinds.append((ObjectIdentifier(vbs[0]), TYPE_MAP[vbs[1]](vbs[2])))
+            vbs = vbs[3:]
+
+    return NotificationType(ObjectIdentity(args["trapoid"])).add_varbinds(*varBinds)
+
+
+class NotificationOriginator:
+    """Send SNMP notifications from a persistent event loop.
+
+    Notifications submitted from within a running asyncio event loop
+    (e.g. SNMP command responder serving a request) are sent from that
+    loop, otherwise from a single background thread running its own
+    asyncio event loop for the whole lifetime of the originator. Transport
+    targets are created once and reused for all subsequent notifications
+    sent to the same destination.
+
+    The number of notifications being sent at any moment is bounded by
+    `queue_size`. When the queue is full, submitter outside of event
+    loop is blocked for up to `queue_timeout` seconds, after that
+    notification is dropped. Submitter within a running event loop
+    is never blocked, its notification is dropped right away.
+    """
+
+    def __init__(self, queue_size=1024, queue_timeout=0):
+        self._queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self._targets = {}
+        self._loop = None
+        self._thread = None
+        self._tasks = set()
+        self._started = time.time()
+        self._counters = dict.fromkeys(
+            ("queued", "sent", "failed", "dropped", "retried"), 0
+        )
+        self._latency = 0.0
+        self._reported = dict(self._counters)
+
+    def start(self):
+        """Spin up background event loop (once)"""
+        with self._lock:
+            if self._thread:
+                return
+
+            self._loop = asyncio.new_event_loop()
+
+            self._thread = threading.Thread(
+                target=self._run, name="snmpsim-originator", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def stop(self, timeout=None):
+        """Shut down background event loop"""
+        with self._lock:
+            if not self._thread:
+                return
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def call(self, coroutine, timeout=None):
+        """Run a coroutine in background loop, wait for its result"""
+        self.start()
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+    def get_target(
+        self, proto, host, port, bindaddr=None, domain=(), auth_data=None, **options
+    ):
+        """Return transport target, create it on first reference.
+
+        Targets are distinct per credentials because SNMP engine binds
+        notification parameters to the target on first use.
+        """
+        key = (
+            proto,
+            host,
+            port,
+            bindaddr,
+            domain,
+            auth_data
+            and (
+                auth_data.securityName,
+                auth_data.message_processing_model,
+                auth_data.security_level,
+            ),
+            tuple(sorted(options.items())),
+        )
+
+        try:
+            return self._targets[key]
+
+        except KeyError:
+            pass
+
+        try:
+            target_type = TRANSPORT_TARGETS[proto]
+
+        except KeyError:
+            raise SnmpsimError("unknown transport %s" % proto)
+
+        target = self.call(target_type.create((host, port), **options))
+
+        if bindaddr:
+            target.set_local_address((bindaddr, 0))
+
+        # this will make target objects different based on their bind address
+        target.TRANSPORT_DOMAIN = target.TRANSPORT_DOMAIN + tuple(domain)
+
+        self._targets[key] = target
+
+        return target
+
+    def submit(
+        self,
+        snmp_engine,
+        auth_data,
+        target,
+        ntf_type,
+        *var_binds,
+        context_data=None,
+        retries=0,
+        cb_fun=None,
+        cb_ctx=None,
+    ):
+        """Queue notification for sending.
+
+        Timed out INFORM notifications are re-sent up to `retries` times.
+
+        Returns `True` if notification has been queued or `False` if
+        it has been dropped due to queue overflow.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+
+        except RuntimeError:
+            loop = None
+
+        if self._queue_timeout and not loop:
+            queued = self._slots.acquire(timeout=self._queue_timeout)
+
+        else:
+            # waiting would stall the loop sending notifications
+            queued = self._slots.acquire(blocking=False)
+
+        if not queued:
+            self._count("dropped")
+            return False
+
+        self._count("queued")
+
+        coroutine = self._send(
+            snmp_engine,
+            auth_data,
+            target,
+            context_data or ContextData(),
+            ntf_type,
+            var_binds,
+            retries,
+            cb_fun,
+            cb_ctx,
+        )
+
+        if not loop:
+            self.start()
+            asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+        else:
+            # stay in the thread where SNMP engine is running
+            task = loop.create_task(coroutine)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return True
+
+    async def _send(
+        self,
+        snmp_engine,
+        auth_data,
+        target,
+        context_data,
+        ntf_type,
+        var_binds,
+        retries,
+        cb_fun,
+        cb_ctx,
+    ):
+        started = time.time()
+
+        try:
+            while True:
+                (
+                    error_indication,
+                    error_status,
+                    error_index,
+                    _,
+                ) = await send_notification(
+                    snmp_engine,
+                    auth_data,
+                    target,
+                    context_data,
+                    ntf_type,
+                    *var_binds,
+                    lookupMib=False,
+                )
+
+                if (
+                    ntf_type != "inform"
+                    or not retries
+                    or not isinstance(error_indication, errind.RequestTimedOut)
+                ):
+                    break
+
+                retries -= 1
+
+                self._count("retried")
+
+        except Exception as exc:
+            error_indication, error_status, error_index = exc, 0, 0
+
+        finally:
+            self._slots.release()
+
+        latency = time.time() - started
+
+        with self._lock:
+            if error_indication or error_status:
+                self._counters["failed"] += 1
+
+            else:
+                self._counters["sent"] += 1
+                self._latency += latency
+
+        if cb_fun:
+            try:
+                cb_fun(error_indication, error_status, error_index, latency, cb_ctx)
+
+            except Exception as exc:
+                log.error("notification callback failure: %s" % exc)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def stats(self):
+        """Return a snapshot of originator counters"""
+        with self._lock:
+            stats = dict(self._counters)
+            latency = self._latency
+
+        uptime = time.time() - self._started
+
+        stats["pending"] = stats["queued"] - stats["sent"] - stats["failed"]
+        stats["rate"] = uptime and stats["sent"] / uptime or 0.0
+        stats["latency"] = stats["sent"] and latency / stats["sent"] or 0.0
+
+        return stats
+
+    def collect(self):
+        """Return counters increments since previous call"""
+        with self._lock:
+            deltas = {k: v - self._reported[k] for k, v in self._counters.items()}
+            self._reported = dict(self._counters)
+
+        return deltas
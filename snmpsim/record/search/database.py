@@ -56,6 +56,11 @@ class RecordIndex:
     def is_open(self):
         return self._db is not None
 
+    @property
+    def text_file_time(self):
+        """Modification time of the text file as of indexing"""
+        return self._text_file_time
+
     def get_handles(self):
         if self.is_open():
             if self._text_file_time != os.stat(self._text_file)[8]:
@@ -22,6 +22,7 @@ from pysnmp.entity import engine
 from snmpsim import error
 from snmpsim import log
 from snmpsim.reporting.formats import base
+from snmpsim.reporting.sketch import HotSpots
 
 
 def camel2snake(name):
@@ -125,6 +126,7 @@ class BaseJsonReporter(base.BaseReporter):
             )
 
         self._metrics = NestingDict()
+        self._hot_spots = HotSpots()
         self._next_dump = time.time() + self.REPORTING_PERIOD
 
         log.debug(
@@ -138,17 +140,18 @@ class BaseJsonReporter(base.BaseReporter):
             )
         )
 
-    def flush(self):
+    def flush(self, force=False):
         """Dump accumulated metrics into a JSON file.
 
-        Reset all counters upon success.
+        Reset all counters upon success. Unless `force` is set, do
+        nothing until reporting period expires.
         """
         if not self._metrics:
             return
 
         now = int(time.time())
 
-        if self._next_dump > now:
+        if self._next_dump > now and not force:
             return
 
         self._next_dump = now + self.REPORTING_PERIOD
@@ -156,6 +159,7 @@ class BaseJsonReporter(base.BaseReporter):
         self._metrics["format"] = self.REPORTING_FORMAT
         self._metrics["version"] = self.REPORTING_VERSION
         self._metrics["producer"] = self.PRODUCER_UUID
+        self._metrics["top"] = self._hot_spots.collect()
 
         dump_path = os.path.join(self._reports_dir, "%s.json" % now)
 
@@ -209,8 +213,16 @@ class MinimalJsonReporter(BaseJsonReporter):
         'data_files': {
             'total': 0,
             'failures': 0
+        },
+        'top': {
+            'communities': [['{community}', 0], ...],
+            'source_addresses': [['{source_address}', 0], ...],
+            'oids': [['{oid}', 0], ...]
         }
     }
+
+    Where `top` lists the most active SNMP communities, source addresses
+    and OIDs, with approximate request counts.
     """
 
     REPORTING_FORMAT = "minimaljson"
@@ -226,6 +238,7 @@ class MinimalJsonReporter(BaseJsonReporter):
         activity counters that eventually will make their way to
         consumers.
         """
+        self._hot_spots.update(**kwargs)
 
         root_metrics = self._metrics
 
@@ -293,6 +306,11 @@ class FullJsonReporter(BaseJsonReporter):
         'producer': <UUID>,
         'first_update': '{timestamp}',
         'last_update': '{timestamp}',
+        'top': {
+            'communities': [['{community}', 0], ...],
+            'source_addresses': [['{source_address}', 0], ...],
+            'oids': [['{oid}', 0], ...]
+        },
         '{transport_protocol}': {
             '{transport_endpoint}': {  # local address
                 'transport_domain': '{transport_domain}',  # endpoint ID
@@ -314,7 +332,9 @@ class FullJsonReporter(BaseJsonReporter):
                                                     'failures': 0,
                                                     '{variation_module}': {
                                                         'calls': 0,
-                                                        'failures': 0
+                                                        'failures': 0,
+                                                        '{counter}': 0,  # module-specific
+                                                        '{gauge}': 0  # module-specific
                                                     }
                                                 }
                                             }
@@ -346,6 +366,7 @@ class FullJsonReporter(BaseJsonReporter):
         activity counters that eventually will make their way to
         consumers.
         """
+        self._hot_spots.update(**kwargs)
 
         metrics = self._metrics
 
@@ -397,5 +418,21 @@ class FullJsonReporter(BaseJsonReporter):
                 "variation_failure_count", 0
             )
 
+            # module-specific counters e.g. `variation_cache_hit_count`
+            # and gauges e.g. `variation_record_contexts_gauge`
+            for key, value in kwargs.items():
+                if not key.startswith("variation_") or key in (
+                    "variation_call_count",
+                    "variation_failure_count",
+                ):
+                    continue
+
+                if key.endswith("_count"):
+                    counter = key[len("variation_") : -len("_count")]
+                    metrics[counter] = metrics.get(counter, 0) + value
+
+                elif key.endswith("_gauge"):
+                    metrics[key[len("variation_") : -len("_gauge")]] = value
+
         except KeyError:
             return
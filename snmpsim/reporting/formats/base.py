@@ -11,13 +11,20 @@
 class BaseReporter:
     """Maintain activity metrics."""
 
+    def start(self):
+        """Start background activity, if any.
+
+        Called once past daemon forking.
+        """
+
     def update_metrics(self, **kwargs):
         """Process activity update."""
 
-    def flush(self):
+    def flush(self, force=False):
         """Dump accumulated metrics into a JSON file.
 
-        Reset all counters upon success.
+        Reset all counters upon success. Unless `force` is set, do
+        nothing until reporting period expires.
         """
 
     def __str__(self):
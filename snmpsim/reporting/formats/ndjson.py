@@ -0,0 +1,293 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# SNMP Agent Simulator
+#
+import gzip
+import json
+import os
+import time
+import uuid
+
+from snmpsim import error
+from snmpsim import log
+from snmpsim.reporting.formats import base
+from snmpsim.reporting.formats.alljson import ensure_base_types
+from snmpsim.reporting.sketch import HotSpots
+
+
+class NdjsonReporter(base.BaseReporter):
+    """Collect activity metrics and stream them as newline-delimited JSON.
+
+    Activity counters are accumulated in memory for some time, then
+    appended to a report file as compact JSON documents, one per
+    activity scope per line. Consumers can tail report files as they
+    grow.
+
+    Once current report file grows beyond `max-file-size` bytes of
+    uncompressed JSON, a new file is started. Optionally, report files
+    are gzip-compressed, each dump becoming a separate gzip member.
+
+    Each line is a JSON document like this:
+
+    .. code-block:: python
+
+    {
+        'format': 'ndjson',
+        'version': 1,
+        'producer': <UUID>,
+        'first_update': '{timestamp}',
+        'last_update': '{timestamp}',
+        'transport_protocol': '{transport_protocol}',
+        'transport_domain': '{transport_domain}',
+        'snmp_engine': '{snmp_engine}',
+        'security_model': '{security_model}',
+        'security_level': '{security_level}',
+        'security_name': '{security_name}',
+        'context_engine_id': '{context_engine_id}',
+        'context_name': '{context_name}',
+        'pdu_type': '{pdu_type}',
+        'data_file': '{data_file}',
+        'variation': '{variation}',
+        'shed_reason': '{shed_reason}',
+        '{counter}': 0,
+        '{gauge}': 0
+    }
+
+    Where scope keys are only present if known for the activity being
+    reported, `{counter}` and `{gauge}` come from `*_count` and `*_gauge`
+    activity update parameters.
+
+    The last line of each dump lists the most active SNMP communities,
+    source addresses and OIDs, with approximate request counts:
+
+    .. code-block:: python
+
+    {
+        'format': 'ndjson',
+        ...
+        'top': {
+            'communities': [['{community}', 0], ...],
+            'source_addresses': [['{source_address}', 0], ...],
+            'oids': [['{oid}', 0], ...]
+        }
+    }
+    """
+
+    REPORTING_PERIOD = 300
+    REPORTING_FORMAT = "ndjson"
+    REPORTING_VERSION = 1
+    PRODUCER_UUID = str(uuid.uuid1())
+
+    MAX_FILE_SIZE = 64 * 1024 * 1024
+
+    SCOPE = (
+        "transport_protocol",
+        "transport_domain",
+        "snmp_engine",
+        "security_model",
+        "security_level",
+        "security_name",
+        "context_engine_id",
+        "context_name",
+        "pdu_type",
+        "data_file",
+        "variation",
+        "shed_reason",
+    )
+
+    def __init__(self, *args):
+        if not args:
+            raise error.SnmpsimError(
+                "Missing %s parameter(s). Expected: "
+                "<method>:<reports-dir>[:dumping-period[:max-file-size[:gzip]]]"
+                % self.__class__.__name__
+            )
+
+        self._reports_dir = os.path.join(args[0], self.REPORTING_FORMAT)
+
+        if len(args) > 1 and args[1]:
+            try:
+                self.REPORTING_PERIOD = int(args[1])
+
+            except ValueError:
+                raise error.SnmpsimError(
+                    "Malformed reports dumping period: %s" % args[1]
+                )
+
+        if len(args) > 2 and args[2]:
+            try:
+                self.MAX_FILE_SIZE = int(args[2])
+
+            except ValueError:
+                raise error.SnmpsimError("Malformed max report size: %s" % args[2])
+
+        self._compress = len(args) > 3 and args[3] == "gzip"
+
+        try:
+            if not os.path.exists(self._reports_dir):
+                os.makedirs(self._reports_dir)
+
+        except OSError as exc:
+            raise error.SnmpsimError(
+                "Failed to create reports directory %s: "
+                "%s" % (self._reports_dir, exc)
+            )
+
+        self._metrics = {}
+        self._hot_spots = HotSpots()
+        self._first_update = self._last_update = None
+        self._next_dump = time.time() + self.REPORTING_PERIOD
+
+        self._report_path = None
+        self._report_size = 0
+        self._report_seq = 0
+
+        log.debug(
+            "Initialized %s metrics reporter for instance %s, metrics "
+            "directory %s, dumping period is %s seconds, max report size "
+            "is %s bytes%s"
+            % (
+                self.__class__.__name__,
+                self.PRODUCER_UUID,
+                self._reports_dir,
+                self.REPORTING_PERIOD,
+                self.MAX_FILE_SIZE,
+                self._compress and ", compressed" or "",
+            )
+        )
+
+    @ensure_base_types
+    def update_metrics(self, **kwargs):
+        """Process activity update.
+
+        Update internal counters based on activity update information.
+
+        Parameters in `kwargs` serve two purposes: some are used to
+        build activity scope e.g. {transport_domain}, {data_file},
+        however those suffixed `*_count` are used to update corresponding
+        activity counters and `*_gauge` - to set activity gauges.
+        """
+        self._hot_spots.update(**kwargs)
+
+        now = int(time.time())
+
+        if self._first_update is None:
+            self._first_update = now
+
+        self._last_update = now
+
+        if not any(key.endswith(("_count", "_gauge")) for key in kwargs):
+            return
+
+        scope = tuple(str(kwargs.get(key, "")) for key in self.SCOPE)
+
+        try:
+            metrics = self._metrics[scope]
+
+        except KeyError:
+            metrics = self._metrics[scope] = {}
+
+        for key, value in kwargs.items():
+            if key.endswith("_count"):
+                key = key[: -len("_count")]
+                metrics[key] = metrics.get(key, 0) + value
+
+            elif key.endswith("_gauge"):
+                metrics[key[: -len("_gauge")]] = value
+
+    def _next_report(self, now):
+        self._report_seq += 1
+
+        self._report_path = os.path.join(
+            self._reports_dir,
+            "%s-%06d.ndjson%s"
+            % (now, self._report_seq, self._compress and ".gz" or ""),
+        )
+        self._report_size = 0
+
+        log.debug("Streaming NDJSON metrics to %s" % self._report_path)
+
+    def _open_report(self):
+        if self._compress:
+            return gzip.open(self._report_path, "ab")
+
+        return open(self._report_path, "ab")
+
+    def _records(self, header):
+        for scope, counters in self._metrics.items():
+            record = dict(header)
+            record.update(
+                (key, value) for key, value in zip(self.SCOPE, scope) if value
+            )
+            record.update(counters)
+
+            yield record
+
+        record = dict(header)
+        record["top"] = self._hot_spots.collect()
+
+        yield record
+
+    def flush(self, force=False):
+        """Append accumulated metrics to current report file.
+
+        Reset all counters upon success. Unless `force` is set, do
+        nothing until reporting period expires.
+        """
+        if not self._metrics:
+            return
+
+        now = int(time.time())
+
+        if self._next_dump > now and not force:
+            return
+
+        self._next_dump = now + self.REPORTING_PERIOD
+
+        header = {
+            "format": self.REPORTING_FORMAT,
+            "version": self.REPORTING_VERSION,
+            "producer": self.PRODUCER_UUID,
+            "first_update": self._first_update,
+            "last_update": self._last_update,
+        }
+
+        if self._report_path is None or self._report_size >= self.MAX_FILE_SIZE:
+            self._next_report(now)
+
+        report = None
+
+        try:
+            report = self._open_report()
+
+            for record in self._records(header):
+                line = json.dumps(record, separators=(",", ":")).encode("utf-8")
+                line += b"\n"
+
+                if self._report_size and (
+                    self._report_size + len(line) > self.MAX_FILE_SIZE
+                ):
+                    report.close()
+                    self._next_report(now)
+                    report = self._open_report()
+
+                report.write(line)
+
+                self._report_size += len(line)
+
+        except Exception as exc:
+            log.error(
+                "Failure while streaming metrics into "
+                "%s: %s" % (self._report_path, exc)
+            )
+
+        finally:
+            if report:
+                report.close()
+
+        self._metrics.clear()
+        self._first_update = self._last_update = None
@@ -0,0 +1,408 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# SNMP Agent Simulator
+#
+import math
+import re
+import threading
+from http import server
+
+from snmpsim import error
+from snmpsim import log
+from snmpsim.reporting.formats import base
+from snmpsim.reporting.formats.alljson import ensure_base_types
+from snmpsim.reporting.histogram import LogLinearHistogram
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+OVERFLOW_LABEL = "_other_"
+
+
+def escape_label(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def sanitize_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+class MetricFamily:
+    """Metric time series sharing the same name and label names.
+
+    Once `max_series` distinct label sets are seen, further label sets
+    are accounted under a single series with all labels set to
+    `OVERFLOW_LABEL`.
+    """
+
+    def __init__(self, name, kind, doc, label_names, max_series):
+        self.name = name
+        self.kind = kind
+        self.header = "# HELP %s %s\n# TYPE %s %s\n" % (name, doc, name, kind)
+        self.label_names = label_names
+        self.max_series = max_series
+        self.series = {}
+
+    def get(self, label_values):
+        """Return series for label values, create it on first reference.
+
+        Series is a list of rendered labels followed by sample value(s).
+        """
+        try:
+            return self.series[label_values]
+
+        except KeyError:
+            pass
+
+        if len(self.series) >= self.max_series:
+            label_values = (OVERFLOW_LABEL,) * len(label_values)
+
+            try:
+                return self.series[label_values]
+
+            except KeyError:
+                pass
+
+        labels = ",".join(
+            '%s="%s"' % (name, escape_label(value))
+            for name, value in zip(self.label_names, label_values)
+        )
+
+        series = self.series[label_values] = [labels, 0]
+
+        return series
+
+    def render(self, lines):
+        lines.append(self.header)
+
+        suffix = self.kind == "counter" and "_total" or ""
+
+        for labels, value in self.series.values():
+            lines.append("%s%s{%s} %s\n" % (self.name, suffix, labels, value))
+
+
+class HistogramFamily(MetricFamily):
+    """Cumulative log-linear histogram time series.
+
+    All buckets are rendered, empty or not, to keep the set of series
+    stable between scrapes.
+    """
+
+    def __init__(self, name, doc, label_names, max_series):
+        MetricFamily.__init__(self, name, "histogram", doc, label_names, max_series)
+
+    def get(self, label_values):
+        series = MetricFamily.get(self, label_values)
+
+        if not series[1]:
+            series[1] = LogLinearHistogram()
+
+        return series
+
+    def observe(self, label_values, value):
+        self.get(label_values)[1].record(value)
+
+    def render(self, lines):
+        lines.append(self.header)
+
+        name = self.name
+
+        for labels, histogram in self.series.values():
+            separator = labels and "," or ""
+
+            for bound, cumulative in histogram.buckets():
+                if bound == math.inf:
+                    continue
+
+                lines.append(
+                    '%s_bucket{%s%sle="%s"} %s\n'
+                    % (name, labels, separator, bound, cumulative)
+                )
+
+            lines.append(
+                '%s_bucket{%s%sle="+Inf"} %s\n'
+                % (name, labels, separator, histogram.count)
+            )
+            lines.append("%s_count{%s} %s\n" % (name, labels, histogram.count))
+            lines.append("%s_sum{%s} %s\n" % (name, labels, histogram.sum))
+
+
+class OpenMetricsReporter(base.BaseReporter):
+    """Serve activity metrics over HTTP in OpenMetrics text format.
+
+    Counters are accumulated in memory for the whole lifetime of
+    the process and served to Prometheus-compatible scrapers at
+    `http://<listen-address>:<listen-port>/metrics`.
+
+    HTTP server socket is bound on instantiation, while requests are
+    served by a background thread from `start` on.
+
+    The following metric families are maintained:
+
+    .. code-block:: text
+
+        snmpsim_transport_packets{protocol, domain}
+        snmpsim_requests_shed{reason}
+        snmpsim_datafile_pdus{data_file}
+        snmpsim_datafile_varbinds{data_file}
+        snmpsim_datafile_failures{data_file}
+        snmpsim_datafile_latency_seconds{data_file}  # histogram
+        snmpsim_variation_calls{variation}
+        snmpsim_variation_failures{variation}
+        snmpsim_variation_latency_seconds{variation}  # histogram
+        snmpsim_stage_latency_seconds{stage, data_file, pdu_type}  # histogram
+        snmpsim_variation_{counter}{variation}  # module-specific
+        snmpsim_variation_{gauge}{variation}  # module-specific
+
+    To keep memory and rendering costs bounded, each metric family
+    holds up to `max-series` label sets. Activity beyond that is
+    accounted under the `_other_` label values.
+    """
+
+    REPORTING_FORMAT = "openmetrics"
+
+    COUNTER_NAMES = {
+        "variation_call": "variation_calls",
+        "variation_failure": "variation_failures",
+    }
+
+    MAX_SERIES = 10000
+
+    def __init__(self, *args):
+        if len(args) < 2:
+            raise error.SnmpsimError(
+                "Missing %s parameter(s). Expected: "
+                "<method>:<listen-address>:<listen-port>[:max-series]"
+                % self.__class__.__name__
+            )
+
+        try:
+            listen_address = args[0], int(args[1])
+
+        except ValueError:
+            raise error.SnmpsimError("Malformed listen port: %s" % args[1])
+
+        if len(args) > 2:
+            try:
+                self.MAX_SERIES = int(args[2])
+
+            except ValueError:
+                raise error.SnmpsimError("Malformed max series number: %s" % args[2])
+
+        self._lock = threading.Lock()
+        self._families = {}
+        self._rendered = None
+
+        self._transport_packets = self._family(
+            "snmpsim_transport_packets",
+            "counter",
+            "SNMP messages received",
+            ("protocol", "domain"),
+        )
+        self._requests_shed = self._family(
+            "snmpsim_requests_shed",
+            "counter",
+            "SNMP requests shed under load",
+            ("reason",),
+        )
+        self._datafile_pdus = self._family(
+            "snmpsim_datafile_pdus", "counter", "SNMP PDUs processed", ("data_file",)
+        )
+        self._datafile_varbinds = self._family(
+            "snmpsim_datafile_varbinds",
+            "counter",
+            "SNMP variable-bindings processed",
+            ("data_file",),
+        )
+        self._datafile_failures = self._family(
+            "snmpsim_datafile_failures",
+            "counter",
+            "SNMP variable-bindings failed",
+            ("data_file",),
+        )
+        self._datafile_latency = self._family(
+            "snmpsim_datafile_latency_seconds",
+            "histogram",
+            "SNMP PDU processing time",
+            ("data_file",),
+        )
+        self._variation_latency = self._family(
+            "snmpsim_variation_latency_seconds",
+            "histogram",
+            "Variation module call time",
+            ("variation",),
+        )
+        self._stage_latency = self._family(
+            "snmpsim_stage_latency_seconds",
+            "histogram",
+            "SNMP request processing time by stage",
+            ("stage", "data_file", "pdu_type"),
+        )
+
+        reporter = self
+
+        class RequestHandler(server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                document = reporter.render()
+
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(document)))
+                self.end_headers()
+                self.wfile.write(document)
+
+            def log_message(self, fmt, *args):
+                log.debug("%s: %s" % (self.address_string(), fmt % args))
+
+        try:
+            self._server = server.ThreadingHTTPServer(listen_address, RequestHandler)
+
+        except OSError as exc:
+            raise error.SnmpsimError(
+                "Failed to serve metrics at %s:%s: %s" % (listen_address + (exc,))
+            )
+
+        self._server.daemon_threads = True
+
+        self._thread = None
+
+        log.debug(
+            "Initialized %s metrics reporter, serving metrics at "
+            "http://%s:%s/metrics, up to %s series per metric"
+            % ((self.__class__.__name__,) + listen_address + (self.MAX_SERIES,))
+        )
+
+    def start(self):
+        if self._thread:
+            return
+
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="snmpsim-openmetrics", daemon=True
+        )
+        self._thread.start()
+
+    def _family(self, name, kind, doc, label_names):
+        try:
+            return self._families[name]
+
+        except KeyError:
+            pass
+
+        if kind == "histogram":
+            family = HistogramFamily(name, doc, label_names, self.MAX_SERIES)
+
+        else:
+            family = MetricFamily(name, kind, doc, label_names, self.MAX_SERIES)
+
+        self._families[name] = family
+
+        return family
+
+    @ensure_base_types
+    def update_metrics(self, **kwargs):
+        """Process activity update.
+
+        Update internal counters based on activity update information.
+
+        Parameters suffixed `*_count` are added to the corresponding
+        counters, `*_gauge` set gauges and `*_latency` are observed by
+        latency histograms.
+        """
+        with self._lock:
+            self._rendered = None
+
+            if "transport_call_count" in kwargs and "transport_domain" in kwargs:
+                self._transport_packets.get(
+                    (kwargs.get("transport_protocol"), kwargs["transport_domain"])
+                )[1] += kwargs["transport_call_count"]
+
+            if "shed_count" in kwargs:
+                self._requests_shed.get((kwargs.get("shed_reason"),))[1] += kwargs[
+                    "shed_count"
+                ]
+
+            if "data_file" in kwargs:
+                labels = (kwargs["data_file"],)
+
+                if "datafile_call_count" in kwargs:
+                    self._datafile_pdus.get(labels)[1] += kwargs["datafile_call_count"]
+
+                if "varbind_count" in kwargs:
+                    self._datafile_varbinds.get(labels)[1] += kwargs["varbind_count"]
+
+                if kwargs.get("datafile_failure_count"):
+                    self._datafile_failures.get(labels)[1] += kwargs[
+                        "datafile_failure_count"
+                    ]
+
+                if "datafile_latency" in kwargs:
+                    self._datafile_latency.observe(labels, kwargs["datafile_latency"])
+
+                if "stage_latency" in kwargs:
+                    for stage, value in kwargs["stage_latency"].items():
+                        self._stage_latency.observe(
+                            (stage, kwargs["data_file"], kwargs.get("pdu_type")), value
+                        )
+
+            if "variation" not in kwargs:
+                return
+
+            labels = (kwargs["variation"],)
+
+            for key, value in kwargs.items():
+                if not key.startswith("variation_"):
+                    continue
+
+                if key == "variation_latency":
+                    self._variation_latency.observe(labels, value)
+
+                elif key.endswith("_count"):
+                    name = sanitize_name(key[: -len("_count")])
+                    name = self.COUNTER_NAMES.get(name, name)
+
+                    family = self._family(
+                        "snmpsim_" + name,
+                        "counter",
+                        "Variation module %s events" % name[len("variation_") :],
+                        ("variation",),
+                    )
+
+                    family.get(labels)[1] += value
+
+                elif key.endswith("_gauge"):
+                    name = sanitize_name(key[: -len("_gauge")])
+
+                    family = self._family(
+                        "snmpsim_" + name,
+                        "gauge",
+                        "Variation module %s" % name[len("variation_") :],
+                        ("variation",),
+                    )
+
+                    family.get(labels)[1] = value
+
+    def render(self):
+        """Return metrics as OpenMetrics text document.
+
+        Rendered document is cached until next activity update.
+        """
+        with self._lock:
+            if self._rendered is None:
+                lines = []
+
+                for family in self._families.values():
+                    if family.series:
+                        family.render(lines)
+
+                lines.append("# EOF\n")
+
+                self._rendered = "".join(lines).encode("utf-8")
+
+            return self._rendered
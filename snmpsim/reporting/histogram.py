@@ -0,0 +1,104 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# Log-linear latency histogram
+#
+import math
+
+
+class LogLinearHistogram:
+    """Histogram of non-negative values over log-linear buckets.
+
+    Each decade from 10^`MIN_EXPONENT` to 10^(`MAX_EXPONENT` + 1) is
+    split into nine equal-width buckets with upper bounds 2, 3, ... 10
+    times the power of ten. This gives no worse than 50% relative
+    resolution over the whole range at a fixed cost of one `log10`
+    call per recorded value.
+
+    A value equal to a bucket upper bound falls into that bucket. Values
+    up to 10^`MIN_EXPONENT` fall into the first bucket, values above the
+    range - into the overflow bucket.
+    """
+
+    MIN_EXPONENT = -6  # 1 usec
+    MAX_EXPONENT = 1  # up to 100 sec
+
+    BOUNDS = [float("1e%d" % MIN_EXPONENT)] + [
+        float("%de%d" % (mantissa + 1, exponent))
+        for exponent in range(MIN_EXPONENT, MAX_EXPONENT + 1)
+        for mantissa in range(1, 10)
+    ]
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    @classmethod
+    def bucket(cls, value):
+        """Return index of the bucket holding the value"""
+        bounds = cls.BOUNDS
+
+        if value <= bounds[0]:
+            return 0
+
+        exponent = math.floor(math.log10(value))
+
+        if exponent > cls.MAX_EXPONENT:
+            index = len(bounds)
+
+        else:
+            mantissa = min(max(int(value / 10.0**exponent), 1), 9)
+
+            index = 1 + (exponent - cls.MIN_EXPONENT) * 9 + mantissa - 1
+
+        # settle values at or next to bucket bounds, which floating
+        # point error may shift to an adjacent bucket
+        if value <= bounds[index - 1]:
+            return index - 1
+
+        if index < len(bounds) and value > bounds[index]:
+            return index + 1
+
+        return index
+
+    def record(self, value):
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        for idx, count in enumerate(other.counts):
+            self.counts[idx] += count
+
+        self.count += other.count
+        self.sum += other.sum
+
+    def buckets(self):
+        """Yield `(upper-bound, cumulative-count)` of all buckets.
+
+        The overflow bucket is reported with infinite upper bound.
+        """
+        cumulative = 0
+
+        for bound, count in zip(self.BOUNDS + [math.inf], self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+    def percentile(self, fraction):
+        """Return upper bound of the bucket holding given fraction of values"""
+        if not self.count:
+            return 0.0
+
+        threshold = fraction * self.count
+
+        for bound, cumulative in self.buckets():
+            if cumulative and cumulative >= threshold:
+                return bound
+
+        return math.inf
@@ -6,9 +6,15 @@
 #
 # SNMP Agent Simulator
 #
+import atexit
+import collections
+import threading
+
 from snmpsim import error
 from snmpsim.reporting.formats import alljson
+from snmpsim.reporting.formats import ndjson
 from snmpsim.reporting.formats import null
+from snmpsim.reporting.formats import openmetrics
 from snmpsim import log
 
 
@@ -21,16 +27,37 @@ class ReportingManager:
     These counters are accumulated in memory for some time, then get
     written down as a JSON file indexed by time. Consumers are expected
     to process each of these files and are free to remove them.
+
+    Activity updates are just queued by the caller. Normalization,
+    aggregation and dumping of the metrics are done by a background
+    thread every `AGGREGATION_PERIOD` seconds and once more on process
+    shutdown. Should the thread fall behind, updates in excess of
+    `MAX_UPDATES` are dropped rather than queued.
+
+    The thread is not running until `start` is called, which must be
+    done past daemon forking.
     """
 
     REPORTERS = {
         "null": null.NullReporter,
         "fulljson": alljson.FullJsonReporter,
         "minimaljson": alljson.MinimalJsonReporter,
+        "ndjson": ndjson.NdjsonReporter,
+        "openmetrics": openmetrics.OpenMetricsReporter,
     }
 
+    AGGREGATION_PERIOD = 1
+    MAX_UPDATES = 100000
+
     _reporter = null.NullReporter()
 
+    _enabled = False
+    _updates = collections.deque()
+    _thread = None
+    _stopped = threading.Event()
+
+    dropped = 0
+
     @classmethod
     def configure(cls, fmt, *args):
         try:
@@ -39,6 +66,8 @@ class ReportingManager:
         except KeyError:
             raise error.SnmpsimError("Unsupported reporting format: %s" % fmt)
 
+        cls.stop()
+
         cls._reporter = reporter(*args)
 
         log.info(
@@ -46,7 +75,78 @@ class ReportingManager:
             "params %s" % (cls._reporter, ", ".join(args))
         )
 
+    @classmethod
+    def start(cls):
+        """Start collecting activity updates in background thread"""
+        if cls._thread or isinstance(cls._reporter, null.NullReporter):
+            return
+
+        cls._stopped.clear()
+
+        cls._thread = threading.Thread(
+            target=cls._run, name="snmpsim-reporting", daemon=True
+        )
+        cls._thread.start()
+
+        cls._reporter.start()
+
+        cls._enabled = True
+
+        atexit.register(cls.stop)
+
+    @classmethod
+    def is_enabled(cls):
+        """Tell if activity updates are being collected"""
+        return cls._enabled
+
     @classmethod
     def update_metrics(cls, **kwargs):
-        cls._reporter.update_metrics(**kwargs)
-        cls._reporter.flush()
+        if not cls._enabled:
+            return
+
+        if len(cls._updates) >= cls.MAX_UPDATES:
+            cls.dropped += 1
+            return
+
+        cls._updates.append(kwargs)
+
+    @classmethod
+    def _run(cls):
+        while not cls._stopped.wait(cls.AGGREGATION_PERIOD):
+            cls._aggregate()
+
+    @classmethod
+    def _aggregate(cls, force=False):
+        updates = cls._updates
+
+        while updates:
+            kwargs = updates.popleft()
+
+            try:
+                cls._reporter.update_metrics(**kwargs)
+
+            except Exception as exc:
+                log.error("Failed to process activity update: %s" % exc)
+
+        try:
+            cls._reporter.flush(force)
+
+        except Exception as exc:
+            log.error("Failed to flush activity metrics: %s" % exc)
+
+    @classmethod
+    def stop(cls):
+        """Stop background thread, process pending updates"""
+        if not cls._thread:
+            return
+
+        cls._enabled = False
+
+        cls._stopped.set()
+        cls._thread.join()
+        cls._thread = None
+
+        cls._aggregate(force=True)
+
+        if cls.dropped:
+            log.info("%s activity update(s) dropped on queue overflow" % cls.dropped)
@@ -0,0 +1,138 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# Streaming heavy hitters tracking
+#
+import random
+
+
+class CountMinSketch:
+    """Approximate event counts in fixed memory.
+
+    Each key is counted in `depth` rows of `width` counters, at
+    hash-selected positions. The estimate is the smallest of the
+    key's counters, it never under-counts and over-counts by at most
+    `2 * total / width` with probability `1 - 1 / 2 ** depth`.
+    """
+
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, width=2048, depth=4):
+        self._width = width
+        self._rows = [[0] * width for _ in range(depth)]
+
+        # independent (universal) hash function per row
+        self._hashes = [
+            (random.randrange(1, self.PRIME), random.randrange(self.PRIME))
+            for _ in range(depth)
+        ]
+
+    def _cells(self, key):
+        width = self._width
+        prime = self.PRIME
+        value = hash(key)
+
+        for (a, b), row in zip(self._hashes, self._rows):
+            yield row, (a * value + b) % prime % width
+
+    def add(self, key, count=1):
+        """Count key occurrence, return updated estimate"""
+        estimate = None
+
+        for row, idx in self._cells(key):
+            row[idx] += count
+
+            if estimate is None or row[idx] < estimate:
+                estimate = row[idx]
+
+        return estimate
+
+    def estimate(self, key):
+        return min(row[idx] for row, idx in self._cells(key))
+
+    def clear(self):
+        for row in self._rows:
+            row[:] = [0] * self._width
+
+
+class TopK:
+    """Track `k` most frequent keys of a stream in fixed memory"""
+
+    def __init__(self, k=10, width=2048, depth=4):
+        self._k = k
+        self._sketch = CountMinSketch(width, depth)
+        self._members = {}
+        self._floor = 0
+
+    def add(self, key, count=1):
+        estimate = self._sketch.add(key, count)
+
+        members = self._members
+
+        if key in members:
+            members[key] = estimate
+
+        elif len(members) < self._k:
+            members[key] = estimate
+            self._floor = min(members.values())
+
+        elif estimate > self._floor:
+            # floor may lag behind grown member counts
+            victim = min(members, key=members.get)
+
+            if estimate > members[victim]:
+                del members[victim]
+                members[key] = estimate
+
+            self._floor = min(members.values())
+
+    def top(self):
+        """Return `(key, estimated count)` pairs, most frequent first"""
+        return sorted(self._members.items(), key=lambda x: x[1], reverse=True)
+
+    def clear(self):
+        self._sketch.clear()
+        self._members.clear()
+        self._floor = 0
+
+
+class HotSpots:
+    """Most active SNMP communities, source addresses and OIDs.
+
+    Fed from activity updates carrying `community`, `source_address`
+    and `varbind_oids` parameters.
+    """
+
+    TOP_K = 10
+
+    def __init__(self, k=TOP_K):
+        self._communities = TopK(k)
+        self._source_addresses = TopK(k)
+        self._oids = TopK(k)
+
+    def update(self, **kwargs):
+        if "community" in kwargs:
+            self._communities.add(str(kwargs["community"]))
+
+        if "source_address" in kwargs:
+            self._source_addresses.add(str(kwargs["source_address"]))
+
+        for oid in kwargs.get("varbind_oids", ()):
+            self._oids.add(str(oid))
+
+    def collect(self):
+        """Return top talkers since previous call"""
+        top = {
+            "communities": self._communities.top(),
+            "source_addresses": self._source_addresses.top(),
+            "oids": self._oids.top(),
+        }
+
+        self._communities.clear()
+        self._source_addresses.clear()
+        self._oids.clear()
+
+        return top
@@ -0,0 +1,74 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# SNMP request processing stages timing
+#
+import threading
+import time
+
+from snmpsim.reporting.manager import ReportingManager
+
+STAGES = ("decode", "probe", "lookup", "read", "variation", "encode", "send")
+
+_local = threading.local()
+
+
+class RequestTimer:
+    """Time spent by a single SNMP request in each processing stage.
+
+    Time elapsed since the previous `lap()` or `mark()` call is added to
+    the stage named in the `lap()` call.
+    """
+
+    __slots__ = ("stages", "data_file", "pdu_type", "_mark")
+
+    def __init__(self):
+        self.stages = {}
+        self.data_file = None
+        self.pdu_type = None
+        self._mark = time.perf_counter()
+
+    def mark(self):
+        """Start timing next stage"""
+        self._mark = time.perf_counter()
+
+    def lap(self, stage):
+        """Account time elapsed since previous mark to the stage"""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._mark
+        self._mark = now
+
+
+def start():
+    """Start timing new request handled by the current thread.
+
+    Returns `RequestTimer` or `None` if activity reporting is disabled.
+    """
+    timer = _local.timer = ReportingManager.is_enabled() and RequestTimer() or None
+
+    return timer
+
+
+def current():
+    """Return timer of the request being handled by the current thread"""
+    return getattr(_local, "timer", None)
+
+
+def finish():
+    """Report stage timings of the request being handled"""
+    timer = current()
+
+    if timer is None:
+        return
+
+    _local.timer = None
+
+    if timer.data_file is None:
+        return
+
+    ReportingManager.update_metrics(
+        data_file=timer.data_file, pdu_type=timer.pdu_type, stage_latency=timer.stages
+    )
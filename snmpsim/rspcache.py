@@ -0,0 +1,161 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# SNMP response cache
+#
+import collections
+import os
+import time
+
+from snmpsim import error
+from snmpsim import log
+
+CacheEntry = collections.namedtuple(
+    "CacheEntry", ("expires", "sources", "error_status", "error_index", "var_binds")
+)
+
+
+class ResponseCache:
+    """Cache of encoded responses to repeated read requests.
+
+    The cache is keyed by the data file context, SNMP version, PDU
+    type, requested OIDs and GETBULK parameters. It holds the encoded
+    variable-bindings and error status of the response, so serving a
+    cache hit only takes building the message envelope around them.
+
+    Only the responses built entirely from plain data file records
+    are cached. Responses involving variation modules, data errors or
+    no data files at all (e.g. the data index) are not.
+
+    An entry expires after `ttl` seconds or once any data file it was
+    built from is modified. Data file modification time is checked at
+    most once in `STAT_INTERVAL` seconds. Least recently used entries
+    are evicted once the cache grows beyond `max-entries`.
+    """
+
+    MAX_ENTRIES = 10000
+    TTL = 60
+
+    STAT_INTERVAL = 1
+
+    _entries = None
+
+    # data file -> (next check time, modification time)
+    _mtimes = {}
+
+    # data files read while handling current request, None if uncacheable
+    _sources = None
+
+    hits = misses = 0
+
+    @classmethod
+    def configure(cls, *args):
+        try:
+            if args and args[0]:
+                cls.MAX_ENTRIES = int(args[0])
+
+            if len(args) > 1 and args[1]:
+                cls.TTL = float(args[1])
+
+        except ValueError:
+            raise error.SnmpsimError(
+                "Malformed response cache parameters: %s. Expected: "
+                "[max-entries[:ttl]]" % ":".join(args)
+            )
+
+        if cls.MAX_ENTRIES <= 0 or cls.TTL <= 0:
+            raise error.SnmpsimError("Response cache size and TTL must be positive")
+
+        cls._entries = collections.OrderedDict()
+
+        log.info(
+            "Caching up to %s SNMP responses for %s seconds"
+            % (cls.MAX_ENTRIES, cls.TTL)
+        )
+
+    @classmethod
+    def is_enabled(cls):
+        return cls._entries is not None
+
+    @classmethod
+    def _mtime(cls, path):
+        now = time.time()
+
+        try:
+            expires, mtime = cls._mtimes[path]
+
+            if expires > now:
+                return mtime
+
+        except KeyError:
+            pass
+
+        try:
+            mtime = os.stat(path).st_mtime
+
+        except OSError:
+            mtime = None
+
+        cls._mtimes[path] = now + cls.STAT_INTERVAL, mtime
+
+        return mtime
+
+    @classmethod
+    def lookup(cls, key):
+        """Return cache entry for request key or `None` on cache miss.
+
+        Start tracking data files read to build the response on miss.
+        """
+        entry = cls._entries.get(key)
+
+        if entry is not None:
+            if entry.expires > time.time() and all(
+                cls._mtime(path) == mtime for path, mtime in entry.sources
+            ):
+                cls._entries.move_to_end(key)
+                cls.hits += 1
+                return entry
+
+            del cls._entries[key]
+
+        cls.misses += 1
+        cls._sources = set()
+
+    @classmethod
+    def track(cls, data_file, cacheable=True):
+        """Account data file read to build the response being cached"""
+        if cls._sources is None:
+            return
+
+        if cacheable:
+            cls._sources.add(data_file)
+
+        else:
+            cls._sources = None
+
+    @classmethod
+    def store(cls, key, error_status, error_index, var_binds):
+        """Cache response unless it is built from other than plain records"""
+        sources, cls._sources = cls._sources, None
+
+        if not sources:
+            return
+
+        cls._entries[key] = CacheEntry(
+            time.time() + cls.TTL,
+            [(path, cls._mtime(path)) for path in sources],
+            int(error_status),
+            int(error_index),
+            var_binds,
+        )
+
+        if len(cls._entries) > cls.MAX_ENTRIES:
+            cls._entries.popitem(last=False)
+
+    @classmethod
+    def discard(cls):
+        """Stop tracking response which is not going to be cached"""
+        cls._sources = None
@@ -0,0 +1,151 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# Retransmitted SNMP requests detection
+#
+import collections
+import hashlib
+import time
+
+from snmpsim import error
+from snmpsim import log
+
+
+class RetransmissionCache:
+    """Cache of responses to replay to retransmitted requests.
+
+    SNMP managers retransmit requests they have not got a response to
+    in time. Handling a retransmitted request all over again makes an
+    overloaded simulator even slower and may apply a SET twice, so the
+    response sent to the original request is sent once again instead.
+
+    A request is considered retransmitted if the same message comes
+    from the same transport address within `window` seconds from the
+    original one. Messages are told apart by their digest, which covers
+    SNMP version, community name or security parameters and request ID.
+
+    Responses are paired with requests by transport address, assuming
+    the response to a request is sent before the next request from the
+    same peer is received. The oldest responses are evicted once their
+    total size exceeds `max-size` octets.
+    """
+
+    WINDOW = 5
+    MAX_SIZE = 4 * 1024 * 1024
+
+    # most requests awaiting response
+    MAX_PENDING = 1024
+
+    # request key -> (expiration time, response)
+    _entries = None
+    _size = 0
+
+    # transport peer -> request key
+    _pending = None
+
+    hits = misses = 0
+
+    @classmethod
+    def configure(cls, *args):
+        try:
+            if args and args[0]:
+                cls.WINDOW = float(args[0])
+
+            if len(args) > 1 and args[1]:
+                cls.MAX_SIZE = int(args[1])
+
+        except ValueError:
+            raise error.SnmpsimError(
+                "Malformed retransmission cache parameters: %s. Expected: "
+                "[window[:max-size]]" % ":".join(args)
+            )
+
+        if cls.WINDOW <= 0 or cls.MAX_SIZE <= 0:
+            raise error.SnmpsimError(
+                "Retransmission cache window and size must be positive"
+            )
+
+        cls._entries = collections.OrderedDict()
+        cls._pending = collections.OrderedDict()
+
+        log.info(
+            "Replaying responses to requests retransmitted within %s seconds, "
+            "caching up to %s octets" % (cls.WINDOW, cls.MAX_SIZE)
+        )
+
+    @classmethod
+    def is_enabled(cls):
+        return cls._entries is not None
+
+    @staticmethod
+    def _peer(transport_domain, transport_address):
+        # requests to different local addresses of one socket are unrelated
+        try:
+            local_address = transport_address.get_local_address()
+
+        except AttributeError:
+            local_address = None
+
+        return transport_domain, transport_address, local_address
+
+    @classmethod
+    def _expire(cls, now):
+        entries = cls._entries
+
+        # entries are ordered by expiration time
+        while entries:
+            key, (expires, response) = next(iter(entries.items()))
+
+            if expires > now and cls._size <= cls.MAX_SIZE:
+                break
+
+            del entries[key]
+
+            cls._size -= len(response)
+
+    @classmethod
+    def lookup(cls, transport_domain, transport_address, whole_msg):
+        """Return response to retransmitted request or `None`.
+
+        Start waiting for the response to be cached if the request
+        is not a retransmission.
+        """
+        peer = cls._peer(transport_domain, transport_address)
+
+        key = peer + (hashlib.blake2b(whole_msg, digest_size=16).digest(),)
+
+        now = time.time()
+
+        cls._expire(now)
+
+        entry = cls._entries.get(key)
+
+        if entry is not None:
+            cls.hits += 1
+            return entry[1]
+
+        cls.misses += 1
+
+        cls._pending.pop(peer, None)
+        cls._pending[peer] = key
+
+        if len(cls._pending) > cls.MAX_PENDING:
+            cls._pending.popitem(last=False)
+
+    @classmethod
+    def store(cls, transport_domain, transport_address, response):
+        """Cache response to the last request from transport address"""
+        key = cls._pending.pop(cls._peer(transport_domain, transport_address), None)
+
+        if key is None or key in cls._entries:
+            return
+
+        cls._entries[key] = time.time() + cls.WINDOW, response
+
+        cls._size += len(response)
+
+        if cls._size > cls.MAX_SIZE:
+            cls._expire(time.time())
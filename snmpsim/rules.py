@@ -0,0 +1,117 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# Value and time list rules used by variation modules
+#
+import bisect
+
+from pyasn1.type import univ
+
+from snmpsim import log
+from snmpsim.utils import split
+
+
+def to_scalar(value):
+    """Turn SNMP value into plain, comparable Python scalar"""
+    if isinstance(value, univ.OctetString):
+        return value.asOctets()
+
+    elif isinstance(value, univ.ObjectIdentifier):
+        return value.asTuple()
+
+    elif isinstance(value, univ.Integer):
+        return int(value)
+
+    return value
+
+
+class RuleSet:
+    """Compiled list of `eq`, `lt` and `gt` rules.
+
+    Equality rules are looked up in a hash map, `lt` and `gt` thresholds
+    are kept in sorted arrays and searched by bisection. Rules are tried
+    in `eq`, `lt`, `gt` order. Among matching `lt` (or `gt`) rules, the one
+    with the closest threshold wins.
+    """
+
+    def __init__(self, eq, lt, gt):
+        self._eq = eq
+        self._lt_keys = sorted(lt)
+        self._lt_values = [lt[x] for x in self._lt_keys]
+        self._gt_keys = sorted(gt)
+        self._gt_values = [gt[x] for x in self._gt_keys]
+
+    def __bool__(self):
+        return bool(self._eq or self._lt_keys or self._gt_keys)
+
+    def match(self, value, default=None):
+        """Return result of the first rule matching `value`"""
+        value = to_scalar(value)
+
+        try:
+            return self._eq[value]
+
+        except (KeyError, TypeError):
+            pass
+
+        try:
+            if self._lt_keys:
+                idx = bisect.bisect_right(self._lt_keys, value)
+
+                if idx < len(self._lt_keys):
+                    return self._lt_values[idx]
+
+            if self._gt_keys:
+                idx = bisect.bisect_left(self._gt_keys, value)
+
+                if idx:
+                    return self._gt_values[idx - 1]
+
+        except TypeError:
+            # value is not comparable with the thresholds
+            pass
+
+        return default
+
+
+def compile_rules(rules, cast, result=None):
+    """Compile `op:value[:result]:op:value[:result]...` rule list.
+
+    Rule values are converted by `cast` callable. Rule results are
+    converted by `result` callable, if given, otherwise rules carry no
+    result part and matching rule yields `True`.
+    """
+    eq, lt, gt = {}, {}, {}
+
+    tokens = split(rules, ":")
+
+    width = result and 3 or 2
+
+    while tokens:
+        rule, tokens = tokens[:width], tokens[width:]
+
+        if len(rule) < width:
+            log.info("bad rule syntax: %s" % ":".join(rule))
+            break
+
+        op, value = rule[:2]
+
+        if op == "eq":
+            rule_set = eq
+
+        elif op == "lt":
+            rule_set = lt
+
+        elif op == "gt":
+            rule_set = gt
+
+        else:
+            log.info("bad rule syntax: %s" % ":".join(rule))
+            continue
+
+        rule_set[to_scalar(cast(value))] = result(rule[2]) if result else True
+
+    return RuleSet(eq, lt, gt)
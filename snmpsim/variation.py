@@ -6,7 +6,12 @@
 #
 # Variation module support in simulation data
 #
+import collections
+import importlib.machinery
+import importlib.util
 import os
+import sys
+import time
 
 from pyasn1.error import PyAsn1Error
 from pyasn1.type import univ
@@ -20,6 +25,7 @@ from snmpsim.record import mvc
 from snmpsim.record import sap
 from snmpsim.record import snmprec
 from snmpsim.record import walk
+from snmpsim.reporting import timing
 from snmpsim.reporting.manager import ReportingManager
 
 RECORD_TYPES = {
@@ -32,6 +38,27 @@ RECORD_TYPES = {
 
 class SnmprecRecordMixIn:
     def evaluate_value(self, oid, tag, value, **context):
+        # Pre-resolved variation module reference
+        dispatch_cache = context.get("variationCache")
+
+        if dispatch_cache is not None and "dataValidation" not in context:
+            cache_key = context["dataFile"], context["recordOffset"]
+
+            try:
+                raw_tag, dispatch = dispatch_cache[cache_key]
+
+            except KeyError:
+                pass
+
+            else:
+                # record offset may now hold another line of modified file
+                if raw_tag == tag:
+                    return self._variate_value(oid, value, *dispatch, **context)
+
+                del dispatch_cache[cache_key]
+
+        raw_tag = tag
+
         # Variation module reference
         if ":" in tag:
             mod_name, tag = tag[tag.index(":") + 1 :], tag[: tag.index(":")]
@@ -48,17 +75,7 @@ class SnmprecRecordMixIn:
                     return oid, tag, univ.Null
 
                 else:
-                    if context["setFlag"]:
-                        hexvalue = self.grammar.hexify_value(context["origValue"])
-
-                        if hexvalue is not None:
-                            context["hexvalue"] = hexvalue
-                            context["hextag"] = self.grammar.get_tag_by_type(
-                                context["origValue"]
-                            )
-                            context["hextag"] += "x"
-
-                    # prepare agent and record contexts on first reference
+                    # prepare agent context on first reference
                     (variation_module, agent_contexts, record_contexts) = context[
                         "variationModules"
                     ][mod_name]
@@ -66,28 +83,21 @@ class SnmprecRecordMixIn:
                     if context["dataFile"] not in agent_contexts:
                         agent_contexts[context["dataFile"]] = {}
 
-                    if context["dataFile"] not in record_contexts:
-                        record_contexts[context["dataFile"]] = {}
-
-                    variation_module["agentContext"] = agent_contexts[
-                        context["dataFile"]
-                    ]
-
-                    record_contexts = record_contexts[context["dataFile"]]
-
-                    if oid not in record_contexts:
-                        record_contexts[oid] = {}
-
-                    variation_module["recordContext"] = record_contexts[oid]
-
-                    handler = variation_module["variate"]
+                    dispatch = (
+                        tag,
+                        mod_name,
+                        variation_module,
+                        agent_contexts[context["dataFile"]],
+                        record_contexts,
+                    )
 
-                    # invoke variation module
-                    oid, tag, value = handler(oid, tag, value, **context)
+                    if dispatch_cache is not None and "recordOffset" in context:
+                        dispatch_cache[context["dataFile"], context["recordOffset"]] = (
+                            raw_tag,
+                            dispatch,
+                        )
 
-                    ReportingManager.update_metrics(
-                        variation=mod_name, variation_call_count=1, **context
-                    )
+                    return self._variate_value(oid, value, *dispatch, **context)
 
             else:
                 ReportingManager.update_metrics(
@@ -98,17 +108,66 @@ class SnmprecRecordMixIn:
                     'Variation module "%s" referenced but not ' "loaded\r\n" % mod_name
                 )
 
-        if not mod_name:
-            if "dataValidation" in context:
-                snmprec.SnmprecRecord.evaluate_value(self, oid, tag, value, **context)
+        if "dataValidation" in context:
+            snmprec.SnmprecRecord.evaluate_value(self, oid, tag, value, **context)
+
+        if not context["nextFlag"] and not context["exactMatch"] or context["setFlag"]:
+            return context["origOid"], tag, context["errorStatus"]
+
+        return self._evaluate_plain_value(oid, tag, value, **context)
+
+    def _variate_value(
+        self,
+        oid,
+        value,
+        tag,
+        mod_name,
+        variation_module,
+        agent_context,
+        record_contexts,
+        **context,
+    ):
+        if context["setFlag"]:
+            hexvalue = self.grammar.hexify_value(context["origValue"])
+
+            if hexvalue is not None:
+                context["hexvalue"] = hexvalue
+                context["hextag"] = self.grammar.get_tag_by_type(context["origValue"])
+                context["hextag"] += "x"
+
+        variation_module["agentContext"] = agent_context
+        variation_module["recordContext"] = record_contexts.get(
+            context["dataFile"], oid
+        )
 
-            if (
-                not context["nextFlag"]
-                and not context["exactMatch"]
-                or context["setFlag"]
-            ):
-                return context["origOid"], tag, context["errorStatus"]
+        handler = variation_module["variate"]
+
+        timer = timing.current()
+
+        if timer:
+            timer.lap("read")
+
+        started = time.time()
 
+        # invoke variation module
+        oid, tag, value = handler(oid, tag, value, **context)
+
+        if timer:
+            timer.lap("variation")
+
+        if ReportingManager.is_enabled():
+            ReportingManager.update_metrics(
+                variation=mod_name,
+                variation_call_count=1,
+                variation_latency=time.time() - started,
+                variation_record_contexts_gauge=len(record_contexts),
+                variation_record_context_evictions_count=record_contexts.collect(),
+                **context,
+            )
+
+        return self._evaluate_plain_value(oid, tag, value, **context)
+
+    def _evaluate_plain_value(self, oid, tag, value, **context):
         if not hasattr(value, "tagSet"):  # not already a pyasn1 object
             return snmprec.SnmprecRecord.evaluate_value(
                 self, oid, tag, value, **context
@@ -184,7 +243,92 @@ class CompressedSnmprecRecord(SnmprecRecordMixIn, snmprec.CompressedSnmprecRecor
 RECORD_TYPES[CompressedSnmprecRecord.ext] = CompressedSnmprecRecord()
 
 
-def load_variation_modules(search_path, modules_options):
+class RecordContexts:
+    """Variation module record contexts by data file and OID.
+
+    Record context is created on first reference. If `limit` is given,
+    at most `limit` record contexts are kept, least recently used ones
+    are dropped and get re-created empty on next reference.
+    """
+
+    def __init__(self, limit=0):
+        self._limit = limit
+        self._contexts = collections.OrderedDict()
+        self.evictions = 0
+        self._reported = 0
+
+    def get(self, data_file, oid):
+        key = data_file, oid
+
+        try:
+            record_context = self._contexts[key]
+
+        except KeyError:
+            record_context = self._contexts[key] = {}
+
+            if self._limit and len(self._contexts) > self._limit:
+                self._contexts.popitem(last=False)
+                self.evictions += 1
+
+        else:
+            if self._limit:
+                self._contexts.move_to_end(key)
+
+        return record_context
+
+    def collect(self):
+        """Return number of evictions since previous call"""
+        evictions, self._reported = self.evictions - self._reported, self.evictions
+        return evictions
+
+    def __len__(self):
+        return len(self._contexts)
+
+
+# compiled variation modules code shared by all aliases
+_CODE_OBJECTS = {}
+
+
+def load_module(path, **context):
+    """Execute variation module file in a fresh module namespace.
+
+    Module bytecode is cached on disk the same way as for regular Python
+    modules. Once compiled, module code object is reused for all further
+    instances (e.g. aliases) of the same module.
+
+    Returns module namespace populated with `context` items.
+    """
+    name = "_snmpsim_variation_%s" % context.get(
+        "alias", os.path.splitext(os.path.basename(path))[0]
+    )
+
+    loader = importlib.machinery.SourceFileLoader(name, path)
+
+    spec = importlib.util.spec_from_file_location(name, path, loader=loader)
+
+    module = importlib.util.module_from_spec(spec)
+
+    module.__dict__.update(context, path=path)
+
+    try:
+        code = _CODE_OBJECTS[path]
+
+    except KeyError:
+        code = _CODE_OBJECTS[path] = loader.get_code(name)
+
+    sys.modules[name] = module
+
+    try:
+        exec(code, module.__dict__)
+
+    except Exception:
+        del sys.modules[name]
+        raise
+
+    return module.__dict__
+
+
+def load_variation_modules(search_path, modules_options, max_record_contexts=0):
     variation_modules = {}
     modules_options = modules_options.copy()
 
@@ -226,11 +370,8 @@ def load_variation_modules(search_path, modules_options):
                     )
                     continue
 
-                ctx = {"path": mod, "alias": alias, "args": params, "moduleContext": {}}
-
                 try:
-                    with open(mod) as fl:
-                        exec(compile(fl.read(), mod, "exec"), ctx)
+                    ctx = load_module(mod, alias=alias, args=params, moduleContext={})
 
                 except Exception as exc:
                     log.error(
@@ -238,8 +379,15 @@ def load_variation_modules(search_path, modules_options):
                     )
                     return 1
 
+                # record contexts of some modules can be safely dropped
+                if ctx.get("RECONSTRUCTIBLE"):
+                    record_contexts = RecordContexts(max_record_contexts)
+
+                else:
+                    record_contexts = RecordContexts()
+
                 # moduleContext, agentContexts, recordContexts
-                variation_modules[alias] = ctx, {}, {}
+                variation_modules[alias] = ctx, {}, record_contexts
 
         log.info(
             "A total of %s modules found in "
@@ -11,8 +11,12 @@ from snmpsim import error
 from snmpsim import log
 from snmpsim.grammar.snmprec import SnmprecGrammar
 from snmpsim.record.snmprec import SnmprecRecord
+from snmpsim.rules import compile_rules
 from snmpsim.utils import split
 
+# record context holds nothing but what can be re-created from the record
+RECONSTRUCTIBLE = True
+
 
 def init(**context):
     random.seed()
@@ -46,120 +50,28 @@ def variate(oid, tag, value, **context):
             recordContext["settings"]["deviation"] = 0.0
 
         if "vlist" in recordContext["settings"]:
-            vlist = {}
+            type_tag, _ = SnmprecRecord.unpack_tag(tag)
 
-            recordContext["settings"]["vlist"] = split(
-                recordContext["settings"]["vlist"], ":"
+            recordContext["settings"]["vlist"] = compile_rules(
+                recordContext["settings"]["vlist"],
+                SnmprecGrammar.TAG_MAP[type_tag],
+                int,
             )
 
-            while recordContext["settings"]["vlist"]:
-                o, v, d = recordContext["settings"]["vlist"][:3]
-
-                recordContext["settings"]["vlist"] = recordContext["settings"]["vlist"][
-                    3:
-                ]
-
-                d = int(d)
-
-                type_tag, _ = SnmprecRecord.unpack_tag(tag)
-
-                v = SnmprecGrammar.TAG_MAP[type_tag](v)
-
-                if o not in vlist:
-                    vlist[o] = {}
-
-                if o == "eq":
-                    vlist[o][v] = d
-
-                elif o in ("lt", "gt"):
-                    vlist[o] = v, d
-
-                else:
-                    log.info(
-                        "delay: bad vlist syntax: "
-                        "%s" % recordContext["settings"]["vlist"]
-                    )
-
-            recordContext["settings"]["vlist"] = vlist
-
         if "tlist" in recordContext["settings"]:
-            tlist = {}
-
-            recordContext["settings"]["tlist"] = split(
-                recordContext["settings"]["tlist"], ":"
+            recordContext["settings"]["tlist"] = compile_rules(
+                recordContext["settings"]["tlist"], int, int
             )
 
-            while recordContext["settings"]["tlist"]:
-                o, v, d = recordContext["settings"]["tlist"][:3]
-
-                recordContext["settings"]["tlist"] = recordContext["settings"]["tlist"][
-                    3:
-                ]
-
-                v = int(v)
-                d = int(d)
-
-                if o not in tlist:
-                    tlist[o] = {}
-
-                if o == "eq":
-                    tlist[o][v] = d
-
-                elif o in ("lt", "gt"):
-                    tlist[o] = v, d
-
-                else:
-                    log.info(
-                        "delay: bad tlist syntax: "
-                        "%s" % recordContext["settings"]["tlist"]
-                    )
-
-            recordContext["settings"]["tlist"] = tlist
-
     if context["setFlag"] and "vlist" in recordContext["settings"]:
-        if (
-            "eq" in recordContext["settings"]["vlist"]
-            and context["origValue"] in recordContext["settings"]["vlist"]["eq"]
-        ):
-            delay = recordContext["settings"]["vlist"]["eq"][context["origValue"]]
-
-        elif (
-            "lt" in recordContext["settings"]["vlist"]
-            and context["origValue"] < recordContext["settings"]["vlist"]["lt"][0]
-        ):
-            delay = recordContext["settings"]["vlist"]["lt"][1]
-
-        elif (
-            "gt" in recordContext["settings"]["vlist"]
-            and context["origValue"] > recordContext["settings"]["vlist"]["gt"][0]
-        ):
-            delay = recordContext["settings"]["vlist"]["gt"][1]
-
-        else:
-            delay = recordContext["settings"]["wait"]
+        delay = recordContext["settings"]["vlist"].match(
+            context["origValue"], recordContext["settings"]["wait"]
+        )
 
     elif "tlist" in recordContext["settings"]:
-        now = int(time.time())
-        if (
-            "eq" in recordContext["settings"]["tlist"]
-            and now == recordContext["settings"]["tlist"]["eq"]
-        ):
-            delay = recordContext["settings"]["tlist"]["eq"][now]
-
-        elif (
-            "lt" in recordContext["settings"]["tlist"]
-            and now < recordContext["settings"]["tlist"]["lt"][0]
-        ):
-            delay = recordContext["settings"]["tlist"]["lt"][1]
-
-        elif (
-            "gt" in recordContext["settings"]["tlist"]
-            and now > recordContext["settings"]["tlist"]["gt"][0]
-        ):
-            delay = recordContext["settings"]["tlist"]["gt"][1]
-
-        else:
-            delay = recordContext["settings"]["wait"]
+        delay = recordContext["settings"]["tlist"].match(
+            int(time.time()), recordContext["settings"]["wait"]
+        )
 
     else:
         delay = recordContext["settings"]["wait"]
@@ -174,10 +86,10 @@ def variate(oid, tag, value, **context):
         delay = 0
 
     elif delay > 99999:
-        log.info("delay: dropping response for %s" % oid)
+        log.info("delay: dropping response for %s", oid)
         raise error.NoDataNotification()
 
-    log.info("delay: waiting %d milliseconds for %s" % (delay, oid))
+    log.info("delay: waiting %d milliseconds for %s", delay, oid)
 
     time.sleep(delay / 1000)  # ms
 
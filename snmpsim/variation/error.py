@@ -9,6 +9,7 @@ from pysnmp.smi import error
 from snmpsim import log
 from snmpsim.grammar.snmprec import SnmprecGrammar
 from snmpsim.record.snmprec import SnmprecRecord
+from snmpsim.rules import compile_rules
 from snmpsim.utils import split
 
 ERROR_TYPES = {
@@ -61,61 +62,17 @@ def variate(oid, tag, value, **context):
             recordContext["settings"]["op"] = "any"
 
         if "vlist" in recordContext["settings"]:
-            vlist = {}
+            typeTag, _ = SnmprecRecord.unpack_tag(tag)
 
-            recordContext["settings"]["vlist"] = split(
-                recordContext["settings"]["vlist"], ":"
+            recordContext["settings"]["vlist"] = compile_rules(
+                recordContext["settings"]["vlist"], SnmprecGrammar.TAG_MAP[typeTag], str
             )
 
-            while recordContext["settings"]["vlist"]:
-                o, v, e = recordContext["settings"]["vlist"][:3]
-
-                recordContext["settings"]["vlist"] = recordContext["settings"]["vlist"][
-                    3:
-                ]
-
-                typeTag, _ = SnmprecRecord.unpack_tag(tag)
-
-                v = SnmprecGrammar.TAG_MAP[typeTag](v)
-
-                if o not in vlist:
-                    vlist[o] = {}
-
-                if o == "eq":
-                    vlist[o][v] = e
-
-                elif o in ("lt", "gt"):
-                    vlist[o] = v, e
-
-                else:
-                    log.info(
-                        "error: bad vlist syntax: %s"
-                        % recordContext["settings"]["vlist"]
-                    )
-
-            recordContext["settings"]["vlist"] = vlist
-
     e = None
 
     if context["setFlag"]:
         if "vlist" in recordContext["settings"]:
-            if (
-                "eq" in recordContext["settings"]["vlist"]
-                and context["origValue"] in recordContext["settings"]["vlist"]["eq"]
-            ):
-                e = recordContext["settings"]["vlist"]["eq"][context["origValue"]]
-
-            elif (
-                "lt" in recordContext["settings"]["vlist"]
-                and context["origValue"] < recordContext["settings"]["vlist"]["lt"][0]
-            ):
-                e = recordContext["settings"]["vlist"]["lt"][1]
-
-            elif (
-                "gt" in recordContext["settings"]["vlist"]
-                and context["origValue"] > recordContext["settings"]["vlist"]["gt"][0]
-            ):
-                e = recordContext["settings"]["vlist"]["gt"][1]
+            e = recordContext["settings"]["vlist"].match(context["origValue"])
 
         elif recordContext["settings"]["op"] in ("set", "any"):
             if "status" in recordContext["settings"]:
@@ -7,59 +7,60 @@
 # Managed value variation module
 # Send SNMP Notification
 #
-import time
-import asyncio
-import threading
 from pysnmp.hlapi.asyncio import *
 from pysnmp.hlapi.v3arch.asyncio.transport import UdpTransportTarget
 
 from snmpsim import error
 from snmpsim import log
 from snmpsim.grammar.snmprec import SnmprecGrammar
+from snmpsim.originator import NotificationOriginator
+from snmpsim.originator import get_auth_data
+from snmpsim.originator import get_notification_type
+from snmpsim.originator import parse_notification_options
 from snmpsim.record.snmprec import SnmprecRecord
-from snmpsim.utils import run_in_new_loop, split, run_in_loop_with_return
+from snmpsim.reporting.manager import ReportingManager
+from snmpsim.rules import compile_rules
+from snmpsim.utils import split
+
+# record context holds nothing but what can be re-created from the record
+RECONSTRUCTIBLE = True
 
 
 def init(**context):
-    pass
-
-
-TYPE_MAP = {
-    "s": OctetString,
-    "h": lambda x: OctetString(hexValue=x),
-    "i": Integer32,
-    "o": ObjectIdentifier,
-    "a": IpAddress,
-    "u": Unsigned32,
-    "g": Gauge32,
-    "t": TimeTicks,
-    "b": Bits,
-    "I": Counter64,
+    moduleContext["settings"] = {}
+
+    if context["options"]:
+        moduleContext["settings"].update(
+            dict([split(x, ":") for x in split(context["options"], ",")])
+        )
+
+    moduleContext["originator"] = NotificationOriginator(
+        queue_size=int(moduleContext["settings"].get("queuesize", 1024)),
+        queue_timeout=float(moduleContext["settings"].get("queuetimeout", 0)),
+    )
+
+
+TRANSPORT_DOMAINS = {
+    "udp": UdpTransportTarget.TRANSPORT_DOMAIN,
+    "udp6": Udp6TransportTarget.TRANSPORT_DOMAIN,
 }
 
-MODULE_OPTIONS = (
-    ("op", "set"),
-    ("community", "public"),
-    ("authkey", None),
-    ("authproto", "md5"),
-    ("privkey", None),
-    ("privproto", "des"),
-    ("proto", "udp"),
-    ("port", "162"),
-    ("ntftype", "trap"),
-    ("trapoid", "1.3.6.1.6.3.1.1.5.1"),
-)
-
-
-def _cbFun(
-    snmpEngine,
-    sendRequestHandle,
-    errorIndication,
-    errorStatus,
-    errorIndex,
-    varBinds,
-    cbCtx,
-):
+
+def _report(**context):
+    # reporters need request scope, completions wait for the next request
+    counters = moduleContext["originator"].collect()
+
+    ReportingManager.update_metrics(
+        variation=alias,
+        variation_ntf_queued_count=counters["queued"],
+        variation_ntf_sent_count=counters["sent"],
+        variation_ntf_failed_count=counters["failed"],
+        variation_ntf_dropped_count=counters["dropped"],
+        **context,
+    )
+
+
+def _cbFun(errorIndication, errorStatus, errorIndex, latency, cbCtx):
     oid, value = cbCtx
 
     if errorIndication or errorStatus:
@@ -102,64 +103,19 @@ def variate(oid, tag, value, **context):
         return context["origOid"], tag, context["errorStatus"]
 
     if "settings" not in recordContext:
-        recordContext["settings"] = dict([split(x, "=") for x in split(value, ",")])
-
-        for k, v in MODULE_OPTIONS:
-            recordContext["settings"].setdefault(k, v)
-
-        if "hexvalue" in recordContext["settings"]:
-            recordContext["settings"]["value"] = [
-                int(recordContext["settings"]["hexvalue"][x : x + 2], 16)
-                for x in range(0, len(recordContext["settings"]["hexvalue"]), 2)
-            ]
+        recordContext["settings"] = parse_notification_options(value)
 
         if "vlist" in recordContext["settings"]:
-            vlist = {}
+            typeTag, _ = SnmprecRecord.unpack_tag(tag)
 
-            recordContext["settings"]["vlist"] = split(
-                recordContext["settings"]["vlist"], ":"
+            recordContext["settings"]["vlist"] = compile_rules(
+                recordContext["settings"]["vlist"], SnmprecGrammar.TAG_MAP[typeTag]
             )
 
-            while recordContext["settings"]["vlist"]:
-                o, v = recordContext["settings"]["vlist"][:2]
-
-                vlist = recordContext["settings"]["vlist"][2:]
-                recordContext["settings"]["vlist"] = vlist
-
-                typeTag, _ = SnmprecRecord.unpack_tag(tag)
-
-                v = SnmprecGrammar.TAG_MAP[typeTag](v)
-
-                if o not in vlist:
-                    vlist[o] = set()
-
-                if o == "eq":
-                    vlist[o].add(v)
-
-                elif o in ("lt", "gt"):
-                    vlist[o] = v
-
-                else:
-                    log.info(
-                        "notification: bad vlist syntax: "
-                        "%s" % recordContext["settings"]["vlist"]
-                    )
-
-            recordContext["settings"]["vlist"] = vlist
-
     args = recordContext["settings"]
 
     if context["setFlag"] and "vlist" in args:
-        if "eq" in args["vlist"] and context["origValue"] in args["vlist"]["eq"]:
-            pass
-
-        elif "lt" in args["vlist"] and context["origValue"] < args["vlist"]["lt"]:
-            pass
-
-        elif "gt" in args["vlist"] and context["origValue"] > args["vlist"]["gt"]:
-            pass
-
-        else:
+        if not args["vlist"].match(context["origValue"]):
             return oid, tag, context["origValue"]
 
     if args["op"] not in ("get", "set", "any", "*"):
@@ -175,50 +131,11 @@ def variate(oid, tag, value, **context):
         and context["setFlag"]
         or args["op"] in ("any", "*")
     ):
-        if args["version"] in ("1", "2c"):
-            authData = CommunityData(
-                args["community"], mpModel=args["version"] == "2c" and 1 or 0
-            )
-
-        elif args["version"] == "3":
-            if args["authproto"] == "md5":
-                authProtocol = usmHMACMD5AuthProtocol
-
-            elif args["authproto"] == "sha":
-                authProtocol = usmHMACSHAAuthProtocol
-
-            elif args["authproto"] == "none":
-                authProtocol = usmNoAuthProtocol
-
-            else:
-                log.info("notification: unknown auth proto " "%s" % args["authproto"])
-                return context["origOid"], tag, context["errorStatus"]
-
-            if args["privproto"] == "des":
-                privProtocol = usmDESPrivProtocol
-
-            elif args["privproto"] == "aes":
-                privProtocol = usmAesCfb128Protocol
-
-            elif args["privproto"] == "none":
-                privProtocol = usmNoPrivProtocol
-
-            else:
-                log.info(
-                    "notification: unknown privacy proto " "%s" % args["privproto"]
-                )
-                return context["origOid"], tag, context["errorStatus"]
-
-            authData = UsmUserData(
-                args["user"],
-                args["authkey"],
-                args["privkey"],
-                authProtocol=authProtocol,
-                privProtocol=privProtocol,
-            )
+        try:
+            authData = get_auth_data(args)
 
-        else:
-            log.info("notification: unknown SNMP version %s" % args["version"])
+        except error.SnmpsimError as exc:
+            log.info("notification: %s" % exc)
             return context["origOid"], tag, context["errorStatus"]
 
         if "host" not in args:
@@ -227,95 +144,64 @@ def variate(oid, tag, value, **context):
             )
             return context["origOid"], tag, context["errorStatus"]
 
-        address = (args["host"], int(args["port"]))
-        if args["proto"] == "udp":
-            target = run_in_loop_with_return(UdpTransportTarget.create(address))
-        elif args["proto"] == "udp6":
-            target = run_in_loop_with_return(Udp6TransportTarget.create(address))
-        else:
-            log.info("notification: unknown transport %s" % args["proto"])
-            return context["origOid"], tag, context["errorStatus"]
+        originator = moduleContext["originator"]
 
         localAddress = None
 
         if "bindaddr" in args:
             localAddress = args["bindaddr"]
-
-        else:
-            transportDomain = context["transportDomain"][: len(target.TRANSPORT_DOMAIN)]
-            if transportDomain == target.TRANSPORT_DOMAIN:
-                # localAddress = snmpEngine.transportDispatcher.getTransport(
-                #     context["transportDomain"]
-                # ).getLocalAddress()[0]
-                pass
-
-            else:
-                log.info(
-                    "notification: incompatible network transport types used by "
-                    "CommandResponder vs NotificationOriginator"
-                )
-
-                if "bindaddr" in args:
-                    localAddress = args["bindaddr"]
-
-        if localAddress:
             log.info("notification: binding to local address %s" % localAddress)
-            target.setLocalAddress((localAddress, 0))
 
-        # this will make target objects different based on their bind address
-        target.TRANSPORT_DOMAIN = target.TRANSPORT_DOMAIN + context["transportDomain"]
+        try:
+            target = originator.get_target(
+                args["proto"],
+                args["host"],
+                int(args["port"]),
+                localAddress,
+                tuple(context["transportDomain"]),
+                authData,
+            )
 
-        varBinds = []
+        except Exception as exc:
+            log.info("notification: %s" % exc)
+            return context["origOid"], tag, context["errorStatus"]
 
-        if "uptime" in args:
-            varBinds.append(
-                (ObjectIdentifier("1.3.6.1.2.1.1.3.0"), TimeTicks(args["uptime"]))
-            )
+        if not localAddress:
+            transportDomain = context["transportDomain"][
+                : len(TRANSPORT_DOMAINS[args["proto"]])
+            ]
 
-        if args["version"] == "1":
-            if "agentaddress" in args:
-                varBinds.append(
-                    (
-                        ObjectIdentifier("1.3.6.1.6.3.18.1.3.0"),
-                        IpAddress(args["agentaddress"]),
-                    )
+            if transportDomain != TRANSPORT_DOMAINS[args["proto"]]:
+                log.info(
+                    "notification: incompatible network transport types used by "
+                    "CommandResponder vs NotificationOriginator"
                 )
 
-            if "enterprise" in args:
-                varBinds.append(
-                    (
-                        ObjectIdentifier("1.3.6.1.6.3.1.1.4.3.0"),
-                        ObjectIdentifier(args["enterprise"]),
-                    )
-                )
+        notificationType = get_notification_type(args)
 
-        if "varbinds" in args:
-            vbs = split(args["varbinds"], ":")
-            while vbs:
-                varBinds.append((ObjectIdentifier(vbs[0]), TYPE_MAP[vbs[1]](vbs[2])))
-                vbs = vbs[3:]
+        queued = originator.submit(
+            snmpEngine,
+            authData,
+            target,
+            args["ntftype"],
+            notificationType,
+            cb_fun=_cbFun,
+            cb_ctx=(oid, value),
+        )
 
-        notificationType = NotificationType(
-            ObjectIdentity(args["trapoid"])
-        ).add_varbinds(*varBinds)
+        if queued:
+            log.info(
+                "notification: sending Notification to %s with credentials "
+                "%s" % (authData, target)
+            )
 
-        run_in_new_loop(
-            send_notification(
-                snmpEngine,
-                authData,
-                target,
-                ContextData(),
-                args["ntftype"],
-                notificationType,
-                cbFun=_cbFun,
-                cbCtx=(oid, value),
+        else:
+            log.info(
+                "notification: send queue full, dropping Notification "
+                "to %s" % (target,)
             )
-        )
 
-        log.info(
-            "notification: sending Notification to %s with credentials "
-            "%s" % (authData, target)
-        )
+    _report(**context)
 
     if context["setFlag"] or "value" not in args:
         return oid, tag, context["origValue"]
@@ -325,4 +211,14 @@ def variate(oid, tag, value, **context):
 
 
 def shutdown(**context):
-    pass
+    originator = moduleContext.get("originator")
+
+    if originator:
+        stats = originator.stats()
+
+        log.info(
+            "notification: %(sent)s sent (%(rate).2f/sec), %(failed)s failed, "
+            "%(dropped)s dropped, average latency %(latency).3f sec" % stats
+        )
+
+        originator.stop(timeout=1)
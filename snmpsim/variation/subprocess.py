@@ -7,14 +7,21 @@
 # Managed value variation module
 # Get/set managed value by invoking an external program
 #
+import collections
 import subprocess
 import sys
+import threading
+import time
 
 from pysnmp.proto import rfc1902
 
 from snmpsim import log
+from snmpsim.reporting.manager import ReportingManager
 from snmpsim.utils import split
 
+# record context holds nothing but what can be re-created from the record
+RECONSTRUCTIBLE = True
+
 
 def init(**context):
     moduleContext["settings"] = {}
@@ -30,6 +37,116 @@ def init(**context):
     else:
         moduleContext["settings"]["shell"] = int(moduleContext["settings"]["shell"])
 
+    # results cache is off unless TTL is configured
+    for option, default in (("cachettl", 0), ("cachestale", 0), ("cachesize", 64)):
+        moduleContext["settings"][option] = float(
+            moduleContext["settings"].get(option, default)
+        )
+
+    moduleContext["settings"]["cachesize"] = int(moduleContext["settings"]["cachesize"])
+
+    moduleContext["lock"] = threading.Lock()
+
+
+def _execute(args):
+    try:
+        handler = subprocess.check_output
+
+    except AttributeError:
+        log.info("subprocess: old Python, expect no output!")
+
+        try:
+            handler = subprocess.check_call
+
+        except AttributeError:
+            handler = subprocess.call
+
+    return handler(args, shell=moduleContext["settings"]["shell"])
+
+
+def _refresh(cache, pending, args):
+    """Re-run external program in background, update cached result"""
+    try:
+        output = _execute(list(args))
+
+    except Exception as exc:
+        log.info("subprocess: background refresh failed: %s" % exc)
+
+    else:
+        with moduleContext["lock"]:
+            cache[args] = time.time(), output
+
+    finally:
+        with moduleContext["lock"]:
+            pending.discard(args)
+
+
+def _lookup(args, **context):
+    """Serve external program output from per-record cache
+
+    Returns cached output or `None` if program needs to be run.
+    Stale entries are served while being refreshed in background.
+    """
+    settings = moduleContext["settings"]
+
+    if "cache" not in recordContext:
+        recordContext["cache"] = collections.OrderedDict()
+        recordContext["pending"] = set()
+
+    cache = recordContext["cache"]
+    pending = recordContext["pending"]
+
+    with moduleContext["lock"]:
+        try:
+            timestamp, output = cache[args]
+
+        except KeyError:
+            ReportingManager.update_metrics(
+                variation=alias, variation_cache_miss_count=1, **context
+            )
+            return
+
+        cache.move_to_end(args)
+
+        age = time.time() - timestamp
+
+        if age < settings["cachettl"]:
+            ReportingManager.update_metrics(
+                variation=alias, variation_cache_hit_count=1, **context
+            )
+            return output
+
+        if age >= settings["cachettl"] + settings["cachestale"]:
+            del cache[args]
+
+            ReportingManager.update_metrics(
+                variation=alias, variation_cache_miss_count=1, **context
+            )
+            return
+
+        if args not in pending:
+            pending.add(args)
+
+            threading.Thread(
+                target=_refresh, args=(cache, pending, args), daemon=True
+            ).start()
+
+    ReportingManager.update_metrics(
+        variation=alias, variation_cache_stale_count=1, **context
+    )
+
+    return output
+
+
+def _store(args, output):
+    cache = recordContext["cache"]
+
+    with moduleContext["lock"]:
+        cache[args] = time.time(), output
+
+        while len(cache) > moduleContext["settings"]["cachesize"]:
+            cache.popitem(last=False)
+
 
 def variate(oid, tag, value, **context):
     # in --v2c-arch some of the items are not defined
@@ -75,27 +192,32 @@ def variate(oid, tag, value, **context):
         for x in split(value, " ")
     ]
 
-    log.info('subprocess: executing external process "%s"' % " ".join(args))
+    # SET may have side effects, always pass it through
+    caching = moduleContext["settings"]["cachettl"] > 0 and not context["setFlag"]
 
-    try:
-        handler = subprocess.check_output
+    if caching:
+        args = tuple(args)
 
-    except AttributeError:
-        log.info("subprocess: old Python, expect no output!")
+        output = _lookup(args, **context)
 
-        try:
-            handler = subprocess.check_call
+        if output is not None:
+            log.info('subprocess: cached output of "%s"' % " ".join(args))
+            return oid, tag, output
 
-        except AttributeError:
-            handler = subprocess.call
+    log.info('subprocess: executing external process "%s"' % " ".join(args))
 
     try:
-        return oid, tag, handler(args, shell=moduleContext["settings"]["shell"])
+        output = _execute(list(args))
 
     except getattr(subprocess, "CalledProcessError", Exception):
         log.info("subprocess: external program execution failed")
         return context["origOid"], tag, context["errorStatus"]
 
+    if caching:
+        _store(args, output)
+
+    return oid, tag, output
+
 
 def shutdown(**context):
     pass
@@ -14,9 +14,14 @@ from pysnmp.smi import error
 
 from snmpsim import log
 from snmpsim.grammar.snmprec import SnmprecGrammar
+from snmpsim.journal import JournalStore
 from snmpsim.record.snmprec import SnmprecRecord
+from snmpsim.rules import compile_rules
 from snmpsim.utils import split
 
+# record context holds nothing but what can be re-created from the record
+RECONSTRUCTIBLE = True
+
 ERROR_TYPES = {
     "generror": error.GenError,
     "noaccess": error.NoAccessError,
@@ -45,7 +50,15 @@ def init(**context):
         )
 
     if "file" in moduleContext["settings"]:
-        moduleContext["cache"] = shelve.open(moduleContext["settings"]["file"])
+        if moduleContext["settings"].get("store") == "journal":
+            moduleContext["cache"] = JournalStore(
+                moduleContext["settings"]["file"],
+                sync_interval=float(moduleContext["settings"].get("sync", 100)) / 1000,
+                compact_interval=float(moduleContext["settings"].get("compact", 300)),
+            )
+
+        else:
+            moduleContext["cache"] = shelve.open(moduleContext["settings"]["file"])
 
     else:
         moduleContext["cache"] = {}
@@ -59,80 +72,34 @@ def variate(oid, tag, value, **context):
         recordContext["settings"] = dict([split(x, "=") for x in split(value, ",")])
 
         if "vlist" in recordContext["settings"]:
-            vlist = {}
+            type_tag, _ = SnmprecRecord.unpack_tag(tag)
 
-            recordContext["settings"]["vlist"] = split(
-                recordContext["settings"]["vlist"], ":"
+            recordContext["settings"]["vlist"] = compile_rules(
+                recordContext["settings"]["vlist"],
+                SnmprecGrammar.TAG_MAP[type_tag],
+                str,
             )
 
-            while recordContext["settings"]["vlist"]:
-                o, v, e = recordContext["settings"]["vlist"][:3]
-
-                vl = recordContext["settings"]["vlist"][3:]
-                recordContext["settings"]["vlist"] = vl
-
-                type_tag, _ = SnmprecRecord.unpack_tag(tag)
-
-                v = SnmprecGrammar.TAG_MAP[type_tag](v)
-
-                if o not in vlist:
-                    vlist[o] = {}
-
-                if o == "eq":
-                    vlist[o][v] = e
-
-                elif o in ("lt", "gt"):
-                    vlist[o] = v, e
-
-                else:
-                    log.info(
-                        "writecache: bad vlist syntax: "
-                        "%s" % recordContext["settings"]["vlist"]
-                    )
-
-            recordContext["settings"]["vlist"] = vlist
-
         if "status" in recordContext["settings"]:
             st = recordContext["settings"]["status"].lower()
             recordContext["settings"]["status"] = st
 
-    if oid not in moduleContext:
-        moduleContext[oid] = {}
-
+    if "type" not in recordContext:
         type_tag, _ = SnmprecRecord.unpack_tag(tag)
 
-        moduleContext[oid]["type"] = SnmprecGrammar.TAG_MAP[type_tag]()
+        recordContext["type"] = SnmprecGrammar.TAG_MAP[type_tag]()
 
     text_oid = str(oid)
 
     if context["setFlag"]:
         if "vlist" in recordContext["settings"]:
-            if (
-                "eq" in recordContext["settings"]["vlist"]
-                and context["origValue"] in recordContext["settings"]["vlist"]["eq"]
-            ):
-                e = recordContext["settings"]["vlist"]["eq"][context["origValue"]]
-
-            elif (
-                "lt" in recordContext["settings"]["vlist"]
-                and context["origValue"] < recordContext["settings"]["vlist"]["lt"][0]
-            ):
-                e = recordContext["settings"]["vlist"]["lt"][1]
-
-            elif (
-                "gt" in recordContext["settings"]["vlist"]
-                and context["origValue"] > recordContext["settings"]["vlist"]["gt"][0]
-            ):
-                e = recordContext["settings"]["vlist"]["gt"][1]
-
-            else:
-                e = None
+            e = recordContext["settings"]["vlist"].match(context["origValue"])
 
             if e in ERROR_TYPES:
                 idx = max(0, context["varsTotal"] - context["varsRemaining"] - 1)
                 raise ERROR_TYPES[e](name=oid, idx=idx)
 
-        if moduleContext[oid]["type"].isSameTypeWith(context["origValue"]):
+        if recordContext["type"].isSameTypeWith(context["origValue"]):
             moduleContext["cache"][text_oid] = context["origValue"]
 
         else:
@@ -160,16 +127,14 @@ def variate(oid, tag, value, **context):
         return (
             oid,
             tag,
-            moduleContext[oid]["type"].clone(
-                hexValue=recordContext["settings"]["hexvalue"]
-            ),
+            recordContext["type"].clone(hexValue=recordContext["settings"]["hexvalue"]),
         )
 
     elif "value" in recordContext["settings"]:
         return (
             oid,
             tag,
-            moduleContext[oid]["type"].clone(recordContext["settings"]["value"]),
+            recordContext["type"].clone(recordContext["settings"]["value"]),
         )
 
     else:
@@ -0,0 +1,146 @@
+#
+# This file is part of snmpsim software.
+#
+# Copyright (c) 2010-2019, Ilya Etingof <etingof@gmail.com>
+# License: https://www.pysnmp.com/snmpsim/license.html
+#
+# Fast-path BER codec vs pyasn1 benchmark, run as:
+#
+#   python tests/bench_ber.py [iterations]
+#
+import sys
+import timeit
+
+from pyasn1.codec.ber import decoder
+from pyasn1.codec.ber import encoder
+from pysnmp.proto import api
+from pysnmp.proto import rfc1905
+
+from snmpsim import ber
+
+SYS_DESCR = (1, 3, 6, 1, 2, 1, 1, 1, 0)
+IF_DESCR = (1, 3, 6, 1, 2, 1, 2, 2, 1, 2)
+
+
+def build_request(version, pdu_class, oids, max_repetitions=0):
+    p_mod = api.PROTOCOL_MODULES[version]
+
+    pdu = getattr(p_mod, pdu_class)()
+    p_mod.apiPDU.set_defaults(pdu)
+    p_mod.apiPDU.set_request_id(pdu, 123456)
+
+    if max_repetitions:
+        p_mod.apiBulkPDU.set_max_repetitions(pdu, max_repetitions)
+
+    p_mod.apiPDU.set_varbinds(pdu, [(oid, p_mod.Null("")) for oid in oids])
+
+    msg = p_mod.Message()
+    p_mod.apiMessage.set_defaults(msg)
+    p_mod.apiMessage.set_community(msg, "public")
+    p_mod.apiMessage.set_pdu(msg, pdu)
+
+    return encoder.encode(msg)
+
+
+REQUESTS = (
+    ("v1 GET, 1 OID", api.SNMP_VERSION_1, "GetRequestPDU", [SYS_DESCR], 0),
+    (
+        "v2c GET, 10 OIDs",
+        api.SNMP_VERSION_2C,
+        "GetRequestPDU",
+        [IF_DESCR + (idx,) for idx in range(10)],
+        0,
+    ),
+    ("v2c GETNEXT, 1 OID", api.SNMP_VERSION_2C, "GetNextRequestPDU", [IF_DESCR], 0),
+    ("v2c GETBULK, 1 OID", api.SNMP_VERSION_2C, "GetBulkRequestPDU", [IF_DESCR], 25),
+)
+
+
+RESPONSES = (
+    (
+        "v1 1 OctetString",
+        api.SNMP_VERSION_1,
+        [(SYS_DESCR, api.v1.OctetString("x" * 64))],
+    ),
+    (
+        "v2c 10 Counter32s",
+        api.SNMP_VERSION_2C,
+        [(IF_DESCR + (idx,), api.v2c.Counter32(idx * 1000000)) for idx in range(10)],
+    ),
+    (
+        "v2c 25 mixed values",
+        api.SNMP_VERSION_2C,
+        [
+            (IF_DESCR + (idx,), value)
+            for idx in range(5)
+            for value in (
+                api.v2c.Integer32(-idx),
+                api.v2c.OctetString("eth%s" % idx),
+                api.v2c.ObjectIdentifier(SYS_DESCR),
+                api.v2c.Counter64(idx << 40),
+                rfc1905.noSuchInstance,
+            )
+        ],
+    ),
+)
+
+
+def encode_response(version, var_binds):
+    p_mod = api.PROTOCOL_MODULES[version]
+
+    pdu = p_mod.GetResponsePDU()
+    p_mod.apiPDU.set_defaults(pdu)
+    p_mod.apiPDU.set_request_id(pdu, 123456)
+
+    msg = p_mod.Message()
+    p_mod.apiMessage.set_defaults(msg)
+    p_mod.apiMessage.set_community(msg, "public")
+    p_mod.apiMessage.set_pdu(msg, pdu)
+
+    p_mod.apiPDU.set_varbinds(p_mod.apiMessage.get_pdu(msg), var_binds)
+
+    return encoder.encode(msg)
+
+
+def bench(fun, iterations):
+    """Return average call time in microseconds"""
+    return min(timeit.repeat(fun, number=iterations, repeat=3)) / iterations * 1e6
+
+
+def main():
+    iterations = len(sys.argv) > 1 and int(sys.argv[1]) or 2000
+
+    print("%-22s %12s %12s %8s" % ("decode", "pyasn1, us", "fast, us", "speedup"))
+
+    for title, version, pdu_class, oids, max_repetitions in REQUESTS:
+        data = build_request(version, pdu_class, oids, max_repetitions)
+
+        spec = api.PROTOCOL_MODULES[version].Message()
+
+        slow = bench(lambda: decoder.decode(data, asn1Spec=spec), iterations)
+        fast = bench(lambda: ber.decode_request(data), iterations)
+
+        print("%-22s %12.1f %12.1f %7.1fx" % (title, slow, fast, slow / fast))
+
+    print("%-22s %12s %12s %8s" % ("encode", "pyasn1, us", "fast, us", "speedup"))
+
+    response_encoder = ber.ResponseEncoder()
+
+    community = api.v2c.OctetString("public")
+
+    for title, version, var_binds in RESPONSES:
+        var_binds = [(api.v2c.ObjectIdentifier(oid), value) for oid, value in var_binds]
+
+        slow = bench(lambda: encode_response(version, var_binds), iterations)
+        fast = bench(
+            lambda: response_encoder.encode(
+                version, community, 123456, 0, 0, var_binds
+            ),
+            iterations,
+        )
+
+        print("%-22s %12.1f %12.1f %7.1fx" % (title, slow, fast, slow / fast))
+
+
+if __name__ == "__main__":
+    main()
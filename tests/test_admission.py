@@ -0,0 +1,178 @@
+import collections
+import time
+import types
+
+import pytest
+from pyasn1.codec.ber import encoder
+from pysnmp.carrier.asyncio.dgram import udp
+from pysnmp.proto import api
+
+from snmpsim import admission
+from snmpsim.commands import responder
+from snmpsim.admission import AdmissionControl
+from snmpsim.admission import RequestDeadline
+from snmpsim.error import SnmpsimError
+
+PEER = ("127.0.0.1", 1161)
+
+
+@pytest.fixture
+def control(monkeypatch):
+    now = [0.0]
+
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    monkeypatch.setattr(AdmissionControl, "_source_policy", None)
+    monkeypatch.setattr(AdmissionControl, "_data_dir_policies", {})
+    monkeypatch.setattr(AdmissionControl, "_community_policies", {})
+    monkeypatch.setattr(AdmissionControl, "_buckets", collections.OrderedDict())
+    monkeypatch.setattr(AdmissionControl, "dropped", 0)
+    monkeypatch.setattr(AdmissionControl, "rejected", 0)
+
+    yield AdmissionControl, now
+
+
+@pytest.mark.parametrize(
+    "args, policy",
+    [
+        (("10",), (10.0, 10.0, admission.DROP)),
+        (("0.5",), (0.5, 1, admission.DROP)),
+        (("10", "20"), (10.0, 20.0, admission.DROP)),
+        (("10", "", "tooBig"), (10.0, 10.0, 1)),
+        (("10", "5", "resourceUnavailable"), (10.0, 5.0, 13)),
+    ],
+)
+def test_parse_policy(args, policy):
+    assert admission.parse_policy(*args) == policy
+
+
+@pytest.mark.parametrize(
+    "args",
+    [(), ("x",), ("0",), ("10", "0.5"), ("10", "", "bogus"), ("10", "", "noError")],
+)
+def test_parse_policy_failure(args):
+    with pytest.raises(SnmpsimError):
+        admission.parse_policy(*args)
+
+
+def test_token_bucket():
+    bucket = admission.TokenBucket(2, 3, 0)
+
+    assert [bucket.take(0) for _ in range(4)] == [True, True, True, False]
+
+    assert bucket.take(0.5)
+    assert not bucket.take(0.5)
+
+    # refills up to burst only
+    assert [bucket.take(10) for _ in range(4)] == [True, True, True, False]
+
+
+def test_admit_source(control):
+    control, now = control
+
+    control.configure_source("1", "2")
+
+    assert control.admit_source(udp.DOMAIN_NAME, PEER) is None
+    assert control.admit_source(udp.DOMAIN_NAME, ("127.0.0.1", 1162)) is None
+    assert control.admit_source(udp.DOMAIN_NAME, PEER) == admission.DROP
+
+    assert control.admit_source(udp.DOMAIN_NAME, ("127.0.0.2", 1161)) is None
+
+    now[0] += 1
+
+    assert control.admit_source(udp.DOMAIN_NAME, PEER) is None
+
+    assert control.dropped == 1
+
+
+def test_admit_community(control, tmp_path):
+    control, now = control
+
+    control.configure_community("1")
+    control.configure_community("%s=1:1:genErr" % tmp_path)
+
+    control.assign("public", str(tmp_path / "other"))
+    control.assign("slow", str(tmp_path))
+
+    assert control.is_enabled()
+
+    assert control.admit_community(b"public") is None
+    assert control.admit_community(b"slow") is None
+    assert control.admit_community(b"public") == admission.DROP
+    assert control.admit_community(b"slow") == 5
+
+    # not served by any data file
+    assert control.admit_community(b"private") is None
+    assert control.admit_community(b"private") is None
+
+    assert control.dropped == control.rejected == 1
+
+
+@pytest.mark.parametrize(
+    "community", ["sub/public", "public/1.3.6.1.6.1.1.0/127.0.0.1"]
+)
+def test_route_message_community(control, tmp_path, community):
+    control, now = control
+
+    control.configure_community("%s=1" % tmp_path)
+
+    control.assign(community, str(tmp_path))
+    control.assign("public", str(tmp_path / "other"))
+
+    def message(community):
+        p_mod = api.PROTOCOL_MODULES[api.SNMP_VERSION_2C]
+
+        pdu = p_mod.GetRequestPDU()
+        p_mod.apiPDU.set_defaults(pdu)
+
+        msg = p_mod.Message()
+        p_mod.apiMessage.set_defaults(msg)
+        p_mod.apiMessage.set_community(msg, community)
+        p_mod.apiMessage.set_pdu(msg, pdu)
+
+        return encoder.encode(msg)
+
+    def route(community):
+        return responder.route_message(None, udp.DOMAIN_NAME, PEER, message(community))
+
+    # data file community name is subject to its data directory policy
+    assert route(community) == udp.DOMAIN_NAME
+    assert route(community) == responder.HANDLED
+
+    assert route("public") == udp.DOMAIN_NAME
+    assert route("public") == udp.DOMAIN_NAME
+
+
+def test_error_status():
+    assert admission.error_status(13, 1) == 13
+    assert admission.error_status(13, 0) == 5
+    assert admission.error_status(1, 0) == 1
+
+
+def test_request_deadline(monkeypatch):
+    monkeypatch.setattr(RequestDeadline, "MAX_AGE", None)
+    monkeypatch.setattr(RequestDeadline, "dropped", 0)
+
+    RequestDeadline.configure(2)
+
+    assert RequestDeadline.is_enabled()
+
+    now = time.time()
+
+    transport = types.SimpleNamespace(arrival=now - 1)
+
+    assert not RequestDeadline.expired(transport, udp.DOMAIN_NAME)
+
+    transport.arrival = now - 3
+
+    assert RequestDeadline.expired(transport, udp.DOMAIN_NAME)
+
+    # not time stamped
+    transport.arrival = None
+
+    assert not RequestDeadline.expired(transport, udp.DOMAIN_NAME)
+    assert not RequestDeadline.expired(object(), udp.DOMAIN_NAME)
+
+    assert RequestDeadline.dropped == 1
+
+    with pytest.raises(SnmpsimError):
+        RequestDeadline.configure(0)
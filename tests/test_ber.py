@@ -0,0 +1,230 @@
+import pytest
+from pyasn1.codec.ber import decoder
+from pyasn1.codec.ber import encoder
+from pyasn1.error import PyAsn1Error
+from pyasn1.type import univ
+from pysnmp.proto import api
+from pysnmp.proto import rfc1905
+
+from snmpsim import ber
+
+
+def build_message(version, pdu_class, var_binds, request_id=1, max_repetitions=0):
+    p_mod = api.PROTOCOL_MODULES[version]
+
+    pdu = getattr(p_mod, pdu_class)()
+    p_mod.apiPDU.set_defaults(pdu)
+    p_mod.apiPDU.set_request_id(pdu, request_id)
+
+    if max_repetitions:
+        p_mod.apiBulkPDU.set_non_repeaters(pdu, 1)
+        p_mod.apiBulkPDU.set_max_repetitions(pdu, max_repetitions)
+
+    p_mod.apiPDU.set_varbinds(pdu, var_binds)
+
+    msg = p_mod.Message()
+    p_mod.apiMessage.set_defaults(msg)
+    p_mod.apiMessage.set_community(msg, "public")
+    p_mod.apiMessage.set_pdu(msg, pdu)
+
+    return encoder.encode(msg)
+
+
+@pytest.mark.parametrize(
+    "version, pdu_class, max_repetitions",
+    [
+        (api.SNMP_VERSION_1, "GetRequestPDU", 0),
+        (api.SNMP_VERSION_1, "GetNextRequestPDU", 0),
+        (api.SNMP_VERSION_2C, "GetRequestPDU", 0),
+        (api.SNMP_VERSION_2C, "GetNextRequestPDU", 0),
+        (api.SNMP_VERSION_2C, "GetBulkRequestPDU", 25),
+    ],
+)
+@pytest.mark.parametrize(
+    "request_id", [0, 127, 128, -128, -129, 2**31 - 1, -(2**31)]
+)
+def test_decode_request(version, pdu_class, max_repetitions, request_id):
+    p_mod = api.PROTOCOL_MODULES[version]
+
+    oids = [(1, 3, 6, 1, 2, 1, 1, 1, 0), (2, 999, 16384, 0), (0, 39, 2**32 - 1)]
+
+    data = build_message(
+        version,
+        pdu_class,
+        [(oid, p_mod.Null("")) for oid in oids],
+        request_id,
+        max_repetitions,
+    )
+
+    expected = ber.request_from_message(
+        p_mod, decoder.decode(data, asn1Spec=p_mod.Message())[0]
+    )
+
+    request = ber.decode_request(data)
+
+    assert request[:-1] == expected[:-1]
+    assert [tuple(oid) for oid, _ in request.var_binds] == oids
+    assert [val.tagSet for _, val in request.var_binds] == [
+        val.tagSet for _, val in expected.var_binds
+    ]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        # SET request
+        build_message(
+            api.SNMP_VERSION_2C,
+            "SetRequestPDU",
+            [((1, 3, 6, 1, 2, 1, 1, 5, 0), api.v2c.OctetString("x"))],
+        ),
+        # non-NULL request value
+        build_message(
+            api.SNMP_VERSION_2C,
+            "GetRequestPDU",
+            [((1, 3, 6, 1, 2, 1, 1, 5, 0), api.v2c.Integer(1))],
+        ),
+        # trailing data
+        build_message(api.SNMP_VERSION_1, "GetRequestPDU", []) + b"\x00",
+        # truncated
+        build_message(api.SNMP_VERSION_1, "GetRequestPDU", [])[:-1],
+        # SNMPv3
+        bytes.fromhex("3011020103300402020000040004000400"),
+        b"",
+    ],
+)
+def test_decode_request_fallback(data):
+    assert ber.decode_request(data) is None
+
+
+VALUES = [
+    api.v2c.Integer32(0),
+    api.v2c.Integer32(127),
+    api.v2c.Integer32(128),
+    api.v2c.Integer32(-128),
+    api.v2c.Integer32(-129),
+    api.v2c.Integer32(-(2**31)),
+    api.v2c.OctetString(""),
+    api.v2c.OctetString(b"\x00\xff" * 200),
+    api.v2c.Null(""),
+    api.v2c.ObjectIdentifier((1, 3, 6, 1, 4, 1, 20408)),
+    api.v2c.ObjectIdentifier((2, 999, 2**32 - 1)),
+    api.v2c.IpAddress("127.0.0.1"),
+    api.v2c.Counter32(2**32 - 1),
+    api.v2c.Gauge32(0),
+    api.v2c.TimeTicks(123456789),
+    api.v2c.Opaque(b"\x9f\x78\x04\x3f\x80\x00\x00"),
+    api.v2c.Bits(b"\x80"),
+    api.v2c.Counter64(2**64 - 1),
+    rfc1905.noSuchObject,
+    rfc1905.noSuchInstance,
+    rfc1905.endOfMibView,
+]
+
+V2C_TYPES = (
+    api.v2c.Counter64.tagSet,
+    rfc1905.NoSuchObject.tagSet,
+    rfc1905.NoSuchInstance.tagSet,
+    rfc1905.EndOfMibView.tagSet,
+)
+
+
+def build_response(version, community, var_binds, error_status=0, error_index=0):
+    p_mod = api.PROTOCOL_MODULES[version]
+
+    pdu = p_mod.GetResponsePDU()
+    p_mod.apiPDU.set_defaults(pdu)
+    p_mod.apiPDU.set_request_id(pdu, -129)
+
+    msg = p_mod.Message()
+    p_mod.apiMessage.set_defaults(msg)
+    p_mod.apiMessage.set_community(msg, community)
+    p_mod.apiMessage.set_pdu(msg, pdu)
+
+    pdu = p_mod.apiMessage.get_pdu(msg)
+
+    p_mod.apiPDU.set_error_status(pdu, error_status)
+    p_mod.apiPDU.set_error_index(pdu, error_index)
+    p_mod.apiPDU.set_varbinds(pdu, var_binds)
+
+    return encoder.encode(msg), encoder.encode(p_mod.apiPDU.get_varbind_list(pdu))
+
+
+@pytest.mark.parametrize("value", VALUES)
+@pytest.mark.parametrize("version", [api.SNMP_VERSION_1, api.SNMP_VERSION_2C])
+def test_encode_response(version, value):
+    if not version and value.tagSet in V2C_TYPES:
+        pytest.skip("not an SNMPv1 type")
+
+    var_binds = [
+        (api.v2c.ObjectIdentifier("1.3.6.1.2.1.1.1.0"), value),
+        (api.v2c.ObjectIdentifier("1.3.6.1.4.1.20408.999.2147483648"), value),
+    ]
+
+    message, var_bind_list = build_response(version, "public", var_binds, 2, 1)
+
+    response_encoder = ber.ResponseEncoder()
+
+    assert response_encoder.encode_var_binds(version, var_binds) == var_bind_list
+
+    assert (
+        response_encoder.encode(
+            version, api.v2c.OctetString("public"), -129, 2, 1, var_binds
+        )
+        == message
+    )
+
+    assert (
+        response_encoder.encode(
+            version, api.v2c.OctetString("public"), -129, 2, 1, var_bind_list
+        )
+        == message
+    )
+
+
+def test_encode_large_response():
+    var_binds = [
+        (api.v2c.ObjectIdentifier((1, 3, 6, 1, 2, 1, 1, 1, idx)), value)
+        for idx, value in enumerate(VALUES * 10)
+    ]
+
+    message, _ = build_response(api.SNMP_VERSION_2C, "x" * 300, var_binds)
+
+    # outgrows the buffer
+    response_encoder = ber.ResponseEncoder(size=64)
+
+    assert (
+        response_encoder.encode(
+            api.SNMP_VERSION_2C, api.v2c.OctetString("x" * 300), -129, 0, 0, var_binds
+        )
+        == message
+    )
+
+
+def test_encode_response_fallback():
+    # not an SNMP type, left to pyasn1 to reject
+    var_binds = [(api.v2c.ObjectIdentifier("1.3.6.1.2.1.1.1.0"), univ.Boolean(True))]
+
+    response_encoder = ber.ResponseEncoder()
+
+    with pytest.raises(PyAsn1Error):
+        response_encoder.encode(
+            api.SNMP_VERSION_2C, api.v2c.OctetString("public"), 1, 0, 0, var_binds
+        )
+
+
+def test_decode_community():
+    for version in (api.SNMP_VERSION_1, api.SNMP_VERSION_2C):
+        data = build_message(
+            version,
+            "SetRequestPDU",
+            [((1, 3, 6, 1, 2, 1, 1, 5, 0), api.v2c.OctetString("x"))],
+        )
+
+        assert ber.decode_community(data) == b"public"
+
+    assert (
+        ber.decode_community(bytes.fromhex("3011020103300402020000040004000400"))
+        is None
+    )
+    assert ber.decode_community(b"\x30\x03\x02\x01") is None
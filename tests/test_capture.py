@@ -0,0 +1,120 @@
+import collections
+import os
+
+import pytest
+from pysnmp.carrier.asyncio.dgram import udp
+
+from snmpsim import capture
+from snmpsim.capture import TrafficCapture
+
+PEER = ("127.0.0.1", 1161)
+OTHER_PEER = ("127.0.0.2", 1161)
+
+
+@pytest.fixture
+def traffic_capture(tmp_path, monkeypatch):
+    for name, value in (
+        ("MAX_SIZE", TrafficCapture.MAX_SIZE),
+        ("SEGMENTS", TrafficCapture.SEGMENTS),
+        ("_capture_dir", None),
+        ("_segment", None),
+        ("_segment_index", 0),
+        ("_segment_size", 0),
+        ("_sequence", 0),
+        ("_pending", collections.OrderedDict()),
+    ):
+        monkeypatch.setattr(TrafficCapture, name, value)
+
+    monkeypatch.chdir(tmp_path)
+
+    yield TrafficCapture
+
+    TrafficCapture.stop()
+
+
+def messages(records):
+    return [(record[0], record[2], record[5]) for record in records]
+
+
+def test_capture_dir(traffic_capture, tmp_path):
+    traffic_capture.configure("capture")
+
+    # daemon changes working directory
+    os.chdir("/")
+
+    traffic_capture._next_segment()
+
+    traffic_capture.request(udp.DOMAIN_NAME, PEER, b"request")
+
+    traffic_capture.stop()
+
+    assert messages(capture.read_capture(str(tmp_path / "capture"))) == [
+        (1, capture.REQUEST, b"request")
+    ]
+
+
+def test_pairing(traffic_capture, tmp_path):
+    traffic_capture.configure("capture")
+
+    first = traffic_capture.request(udp.DOMAIN_NAME, PEER, b"first")
+    second = traffic_capture.request(udp.DOMAIN_NAME, OTHER_PEER, b"second")
+    third = traffic_capture.request(udp.DOMAIN_NAME, PEER, b"third")
+
+    # deferred responses are paired by the sequence number given
+    traffic_capture.response(udp.DOMAIN_NAME, PEER, b"first-response", first)
+
+    # or with the last request of the peer
+    traffic_capture.response(udp.DOMAIN_NAME, OTHER_PEER, b"second-response")
+    traffic_capture.response(udp.DOMAIN_NAME, PEER, b"third-response")
+
+    # nothing left to pair with
+    traffic_capture.response(udp.DOMAIN_NAME, PEER, b"unpaired")
+
+    traffic_capture.stop()
+
+    assert (first, second, third) == (1, 2, 3)
+
+    assert messages(capture.read_capture("capture")) == [
+        (1, capture.REQUEST, b"first"),
+        (2, capture.REQUEST, b"second"),
+        (3, capture.REQUEST, b"third"),
+        (1, capture.RESPONSE, b"first-response"),
+        (2, capture.RESPONSE, b"second-response"),
+        (3, capture.RESPONSE, b"third-response"),
+        (0, capture.RESPONSE, b"unpaired"),
+    ]
+
+
+def test_sequence_wrap(traffic_capture):
+    traffic_capture.configure("capture")
+
+    traffic_capture._sequence = 0xFFFFFFFE
+
+    assert traffic_capture.request(udp.DOMAIN_NAME, PEER, b"") == 0xFFFFFFFF
+
+    # zero is never used for requests
+    assert traffic_capture.request(udp.DOMAIN_NAME, PEER, b"") == 1
+
+
+def test_write_failure(traffic_capture):
+    traffic_capture.configure("capture")
+
+    class BrokenSegment:
+        closed = False
+
+        def write(self, data):
+            raise OSError("No space left on device")
+
+        def close(self):
+            self.closed = True
+
+            raise OSError("No space left on device")
+
+    traffic_capture._segment.close()
+
+    segment = traffic_capture._segment = BrokenSegment()
+
+    traffic_capture.request(udp.DOMAIN_NAME, PEER, b"request")
+
+    assert segment.closed
+    assert not traffic_capture.is_enabled()
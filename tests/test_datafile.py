@@ -0,0 +1,107 @@
+import os
+import time
+
+import pytest
+from pysnmp.proto import rfc1902
+from pysnmp.smi import exval
+
+from snmpsim import confdir
+from snmpsim import datafile
+from snmpsim import variation
+from snmpsim.rspcache import ResponseCache
+
+SYS_DESCR = rfc1902.ObjectName("1.3.6.1.2.1.1.1.0")
+SYS_CONTACT = rfc1902.ObjectName("1.3.6.1.2.1.1.4.0")
+SYS_LOCATION = rfc1902.ObjectName("1.3.6.1.2.1.1.6.0")
+
+
+def variate(oid, tag, value, **context):
+    if value == "skip":
+        return oid, tag, exval.endOfMib
+
+    return oid, tag, value.upper()
+
+
+@pytest.fixture
+def data_file(tmp_path, monkeypatch):
+    (tmp_path / "cache").mkdir()
+
+    monkeypatch.setattr(confdir, "cache", str(tmp_path / "cache"))
+    monkeypatch.setattr(datafile.DataFile, "opened_queue", [])
+
+    path = tmp_path / "public.snmprec"
+
+    now = time.time() + 100
+
+    variation_modules = {
+        "upper": ({"variate": variate}, {}, variation.RecordContexts())
+    }
+
+    def write(*lines, mtime=0):
+        path.write_text("".join(line + "\n" for line in lines))
+
+        # index is rebuilt for a file newer than it
+        os.utime(path, (now + mtime, now + mtime))
+
+    def read(oid, next_flag=False):
+        ResponseCache._sources = set()
+
+        var_binds = data.process_var_binds(
+            [(oid, rfc1902.Null(""))], nextFlag=next_flag, setFlag=False
+        )
+
+        cacheable = bool(ResponseCache._sources)
+
+        ResponseCache._sources = None
+
+        return str(var_binds[0][1]), cacheable
+
+    write("1.3.6.1.2.1.1.1.0|4:upper|abc", "1.3.6.1.2.1.1.6.0|4|def")
+
+    data = datafile.DataFile(
+        str(path), variation.RECORD_TYPES["snmprec"], variation_modules
+    ).index_text()
+
+    yield write, read
+
+    data.close()
+
+
+def test_variation_cache(data_file):
+    write, read = data_file
+
+    assert read(SYS_DESCR) == ("ABC", False)
+    assert read(SYS_DESCR) == ("ABC", False)
+    assert read(SYS_LOCATION) == ("def", True)
+
+    # same record offset now holds a plain record
+    write("1.3.6.1.2.1.1.1.0|4|xyz", "1.3.6.1.2.1.1.6.0|4|def", mtime=10)
+
+    assert read(SYS_DESCR) == ("xyz", True)
+
+
+def test_variation_cache_same_mtime(data_file):
+    write, read = data_file
+
+    assert read(SYS_DESCR) == ("ABC", False)
+
+    # variation cache entry does not match the re-read record
+    write("1.3.6.1.2.1.1.1.0|4|xyz", "1.3.6.1.2.1.1.6.0|4|def")
+
+    datafile.DataFile.opened_queue[0].close()
+
+    assert read(SYS_DESCR) == ("xyz", True)
+
+
+def test_skipped_variated_record(data_file):
+    write, read = data_file
+
+    write(
+        "1.3.6.1.2.1.1.1.0|4|abc",
+        "1.3.6.1.2.1.1.4.0|4:upper|skip",
+        "1.3.6.1.2.1.1.6.0|4|def",
+        mtime=10,
+    )
+
+    # variated record is evaluated, yet skipped over as end of MIB
+    assert read(SYS_DESCR, next_flag=True) == ("def", False)
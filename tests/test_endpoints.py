@@ -0,0 +1,215 @@
+import asyncio
+import ipaddress
+import socket
+import time
+
+import pytest
+from pysnmp.carrier.asyncio.dgram import udp
+
+from snmpsim import endpoints
+from snmpsim.error import SnmpsimError
+
+
+def test_overload_queue():
+    loop = asyncio.new_event_loop()
+
+    transport = endpoints.BatchUdpTransport(batch_size=8, queue_size=16, loop=loop)
+    transport.open_server_mode(("127.0.0.1", 0))
+
+    received = []
+
+    transport.register_callback(lambda *args: received.append(args[2]))
+
+    address = transport._socket.getsockname()
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for idx in range(100):
+            sock.sendto(b"%d" % idx, address)
+
+        loop.run_until_complete(asyncio.sleep(0.5))
+
+    transport.close_transport()
+    loop.close()
+
+    assert len(received) + transport.shed == 100
+
+    # the oldest datagrams are shed
+    assert received[:8] == [b"%d" % idx for idx in range(8)]
+    assert received[8] == b"16"
+    assert received[-1] == b"99"
+
+
+def test_arrival_timestamps():
+    loop = asyncio.new_event_loop()
+
+    transport = endpoints.BatchUdpTransport(timestamps=True, loop=loop)
+    transport.open_server_mode(("127.0.0.1", 0))
+
+    # kernel may turn on time stamping with a delay
+    time.sleep(0.1)
+
+    arrivals = []
+
+    transport.register_callback(lambda *args: arrivals.append(transport.arrival))
+
+    address = transport._socket.getsockname()
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sent = time.time()
+
+        sock.sendto(b"0", address)
+
+        # wait in socket buffer
+        time.sleep(0.2)
+
+        loop.run_until_complete(asyncio.sleep(0.1))
+
+    transport.close_transport()
+    loop.close()
+
+    assert len(arrivals) == 1
+
+    if endpoints.SO_TIMESTAMPNS is not None:
+        assert sent - 0.05 < arrivals[0] < sent + 0.1
+
+    else:
+        assert arrivals[0] > sent
+
+
+@pytest.mark.parametrize(
+    "arg, ipv6, first, count",
+    [
+        ("10.0.0.1", False, "10.0.0.1", 1),
+        ("10.0.0.1-10.0.0.1", False, "10.0.0.1", 1),
+        ("10.0.0.1-10.0.1.0", False, "10.0.0.1", 256),
+        ("10.0.0.0/20", False, "10.0.0.0", 4096),
+        ("10.0.0.5/30", False, "10.0.0.4", 4),
+        ("10.0.0.1/32", False, "10.0.0.1", 1),
+        ("fd00::1-fd00::ff", True, "fd00::1", 255),
+        ("fd00::/120", True, "fd00::", 256),
+        ("fd00::/64", True, "fd00::", 2**64),
+    ],
+)
+def test_parse_address_range(arg, ipv6, first, count):
+    assert endpoints.parse_address_range(arg, ipv6) == (
+        ipaddress.ip_address(first),
+        count,
+    )
+
+
+@pytest.mark.parametrize(
+    "arg, ipv6",
+    [
+        ("", False),
+        ("10.0.0.1-", False),
+        ("10.0.0.256", False),
+        ("10.0.0.1-foo", False),
+        ("10.0.0.0/33", False),
+        ("10.0.0.0/x", False),
+        ("10.0.0.5-10.0.0.1", False),
+        ("fd00::ff-fd00::1", True),
+        ("10.0.0.1-fd00::1", False),
+        ("fd00::1-10.0.0.1", True),
+        ("10.0.0.0/24", True),
+        ("fd00::/120", False),
+    ],
+)
+def test_parse_address_range_failure(arg, ipv6):
+    with pytest.raises(SnmpsimError):
+        endpoints.parse_address_range(arg, ipv6)
+
+
+@pytest.mark.parametrize(
+    "addr, ipv6, expanded",
+    [
+        ("127.0.0.1:1161", False, None),
+        ("localhost:1161", False, None),
+        ("my-host:1161", False, None),
+        ("[::1]:1161", True, None),
+        (
+            "127.0.0.1-127.0.0.3:1161",
+            False,
+            [("127.0.0.1", 1161), ("127.0.0.2", 1161), ("127.0.0.3", 1161)],
+        ),
+        ("127.0.0.0/31", False, [("127.0.0.0", 161), ("127.0.0.1", 161)]),
+        (
+            "[fd00::fe-fd00::100]:1161",
+            True,
+            [("fd00::fe", 1161), ("fd00::ff", 1161), ("fd00::100", 1161)],
+        ),
+    ],
+)
+def test_expand_endpoint(addr, ipv6, expanded):
+    assert endpoints.expand_endpoint(addr, ipv6) == expanded
+
+
+@pytest.mark.parametrize(
+    "addr, ipv6",
+    [
+        ("127.0.0.3-127.0.0.1:1161", False),
+        ("127.0.0.1-127.0.0.3:port", False),
+        ("127.0.0.0/33:1161", False),
+        ("10.0.0.0/8:161", False),
+        ("[fd00::/64]:161", True),
+        ("[fd00::1-fd00::ff]", False),
+    ],
+)
+def test_expand_endpoint_failure(addr, ipv6):
+    with pytest.raises(SnmpsimError):
+        endpoints.expand_endpoint(addr, ipv6)
+
+
+@pytest.mark.skipif(
+    endpoints.IP_PKTINFO is None, reason="packet information not supported"
+)
+def test_pktinfo_transport():
+    loop = asyncio.new_event_loop()
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    transport = endpoints.PktInfoUdpTransport(
+        ipaddress.ip_address("127.0.0.2"), 2, 10, loop=loop
+    )
+    transport.open_server_mode(("127.0.0.2-127.0.0.3", port))
+
+    domains = []
+
+    def echo(transport, transport_address, datagram):
+        domains.append(transport.address_domain(transport_address))
+        transport.send_message(datagram, transport_address)
+
+    transport.register_callback(echo)
+
+    replies = []
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(0)
+
+        for address in ("127.0.0.3", "127.0.0.4", "127.0.0.2"):
+            sock.sendto(address.encode(), (address, port))
+
+        loop.run_until_complete(asyncio.sleep(0.2))
+
+        while True:
+            try:
+                replies.append(sock.recvfrom(100))
+
+            except BlockingIOError:
+                break
+
+    transport.close_transport()
+    loop.close()
+
+    # replies come from the address requests were sent to, out of range
+    # addresses are ignored
+    assert replies == [
+        (b"127.0.0.3", ("127.0.0.3", port)),
+        (b"127.0.0.2", ("127.0.0.2", port)),
+    ]
+
+    assert domains == [
+        udp.DOMAIN_NAME + (11,),
+        udp.DOMAIN_NAME + (10,),
+    ]
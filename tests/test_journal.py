@@ -0,0 +1,107 @@
+import pytest
+from pysnmp.proto import rfc1902
+
+from snmpsim.journal import JournalStore
+
+SYS_CONTACT = "1.3.6.1.2.1.1.4.0"
+SYS_NAME = "1.3.6.1.2.1.1.5.0"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "journal.snmprec")
+
+
+def open_store(path):
+    # leave syncing and compaction to the test
+    return JournalStore(path, sync_interval=3600, compact_interval=3600)
+
+
+def test_replay(path):
+    store = open_store(path)
+
+    store[SYS_CONTACT] = rfc1902.OctetString("admin")
+    store[SYS_NAME] = rfc1902.OctetString("old")
+    store[SYS_NAME] = rfc1902.OctetString("new")
+
+    store.close()
+
+    store = open_store(path)
+
+    assert dict(store) == {
+        SYS_CONTACT: rfc1902.OctetString("admin"),
+        SYS_NAME: rfc1902.OctetString("new"),
+    }
+
+    store.close()
+
+
+def test_replay_torn_tail(path):
+    with open(path, "wb") as journal:
+        journal.write(b"1.3.6.1.2.1.1.4.0|4|admin\n1.3.6.1.2.1.1.5.0|4|hel")
+
+    store = open_store(path)
+
+    assert dict(store) == {SYS_CONTACT: rfc1902.OctetString("admin")}
+
+    with open(path, "rb") as journal:
+        assert journal.read() == b"1.3.6.1.2.1.1.4.0|4|admin\n"
+
+    store[SYS_NAME] = rfc1902.OctetString("hello")
+
+    store.close()
+
+    store = open_store(path)
+
+    assert dict(store) == {
+        SYS_CONTACT: rfc1902.OctetString("admin"),
+        SYS_NAME: rfc1902.OctetString("hello"),
+    }
+
+    store.close()
+
+
+def test_replay_broken_record(path):
+    with open(path, "wb") as journal:
+        journal.write(b"1.3.6.1.2.1.1.4.0|999|admin\n1.3.6.1.2.1.1.5.0|4|name\n")
+
+    store = open_store(path)
+
+    assert dict(store) == {SYS_NAME: rfc1902.OctetString("name")}
+
+    store.close()
+
+
+def test_compact(path):
+    store = open_store(path)
+
+    for idx in range(10):
+        store[SYS_NAME] = rfc1902.OctetString("name%d" % idx)
+
+    store[SYS_CONTACT] = rfc1902.OctetString("admin")
+
+    store.sync()
+
+    store.compact()
+
+    with open(path, "rb") as journal:
+        assert sorted(journal.read().splitlines()) == [
+            b"1.3.6.1.2.1.1.4.0|4|admin",
+            b"1.3.6.1.2.1.1.5.0|4|name9",
+        ]
+
+    # journal no longer grown over compaction ratio
+    store.compact()
+
+    store[SYS_CONTACT] = rfc1902.OctetString("root")
+
+    store.close()
+
+    store = open_store(path)
+
+    assert dict(store) == {
+        SYS_CONTACT: rfc1902.OctetString("root"),
+        SYS_NAME: rfc1902.OctetString("name9"),
+    }
+
+    store.close()
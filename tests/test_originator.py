@@ -0,0 +1,154 @@
+import asyncio
+import collections
+import glob
+import json
+import os
+import socket
+import threading
+import time
+
+from pysnmp.carrier.asyncio.dgram import udp
+from pysnmp.carrier.asyncio.dispatch import AsyncioDispatcher
+from pysnmp.entity import engine
+from pysnmp.proto import rfc1902
+
+from snmpsim import variation
+from snmpsim.originator import NotificationOriginator
+from snmpsim.reporting.manager import ReportingManager
+
+NOTIFICATION = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "snmpsim",
+    "variation",
+    "notification.py",
+)
+
+SYS_UPTIME = rfc1902.ObjectName("1.3.6.1.2.1.1.3.0")
+
+
+def test_submit_queue_full():
+    originator = NotificationOriginator(queue_size=1, queue_timeout=5)
+
+    originator._slots.acquire()
+
+    async def submit():
+        started = time.monotonic()
+
+        queued = originator.submit(None, None, None, "trap")
+
+        return queued, time.monotonic() - started
+
+    # running event loop is never blocked
+    queued, waited = asyncio.run(submit())
+
+    assert not queued
+    assert waited < 1
+
+    # standalone submitter waits for a free slot
+    threading.Timer(0.2, originator._slots.release).start()
+
+    started = time.monotonic()
+
+    assert originator.submit(None, None, None, "trap")
+    assert 0.1 < time.monotonic() - started < 5
+
+    originator.call(asyncio.sleep(0.1))
+
+    originator.stop(timeout=1)
+
+    assert originator.collect() == {
+        "queued": 1,
+        "sent": 0,
+        "failed": 1,
+        "dropped": 1,
+        "retried": 0,
+    }
+
+
+def test_notification_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(ReportingManager, "_updates", collections.deque())
+
+    ReportingManager.configure("fulljson", str(tmp_path))
+    ReportingManager.start()
+
+    module = variation.load_module(
+        NOTIFICATION, alias="notification", args=None, moduleContext={}
+    )
+
+    module["init"](options=None, mode="variating")
+
+    loop = asyncio.new_event_loop()
+
+    snmp_engine = engine.SnmpEngine()
+    snmp_engine.register_transport_dispatcher(AsyncioDispatcher(loop=loop))
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.settimeout(5)
+
+        value = (
+            "op=set,version=2c,community=public,proto=udp,host=127.0.0.1,"
+            "port=%s,ntftype=trap,trapoid=1.3.6.1.6.3.1.1.5.1" % sock.getsockname()[1]
+        )
+
+        def variate(set_flag):
+            module["recordContext"] = {}
+
+            module["variate"](
+                SYS_UPTIME,
+                "2:notification",
+                value,
+                snmpEngine=snmp_engine,
+                transportDomain=rfc1902.ObjectIdentifier(udp.DOMAIN_NAME),
+                transportAddress=udp.UdpTransportAddress(("127.0.0.1", 1161)),
+                transportEndpoint=("127.0.0.1", 161),
+                transportProtocol="udpv4",
+                securityModel=2,
+                securityName="public",
+                securityLevel=1,
+                contextEngineId=snmp_engine.snmpEngineID,
+                pduType="SetRequestPDU",
+                dataFile="public",
+                origOid=SYS_UPTIME,
+                origValue=rfc1902.TimeTicks(1),
+                errorStatus=None,
+                nextFlag=False,
+                exactMatch=True,
+                setFlag=set_flag,
+            )
+
+        variate(True)
+
+        assert sock.recvfrom(65535)
+
+    originator = module["moduleContext"]["originator"]
+
+    while originator.stats()["pending"]:
+        time.sleep(0.1)
+
+    # completion is reported along with the next request
+    variate(False)
+
+    module["shutdown"]()
+
+    ReportingManager.stop()
+
+    snmp_engine.close_dispatcher()
+
+    loop.close()
+
+    (path,) = glob.glob(str(tmp_path / "fulljson" / "*.json"))
+
+    with open(path) as report:
+        metrics = json.load(report)
+
+    metrics = metrics["udpv4"]["127.0.0.1:161"]["127.0.0.1"]
+    metrics = metrics[snmp_engine.snmpEngineID.prettyPrint()[2:]]
+    metrics = metrics["2"]["1"]["public"]
+    metrics = metrics[snmp_engine.snmpEngineID.prettyPrint()[2:]]
+    metrics = metrics["SetRequestPDU"]["public"]["variations"]["notification"]
+
+    assert metrics["ntf_queued"] == 1
+    assert metrics["ntf_sent"] == 1
+    assert metrics["ntf_failed"] == 0
+    assert metrics["ntf_dropped"] == 0
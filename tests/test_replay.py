@@ -0,0 +1,143 @@
+import socket
+import threading
+
+import pytest
+from pyasn1.codec.ber import encoder
+from pysnmp.proto import api
+
+from snmpsim import capture
+from snmpsim.commands import replay
+
+SYS_UPTIME = "1.3.6.1.2.1.1.3.0"
+
+P_MOD = api.PROTOCOL_MODULES[api.SNMP_VERSION_2C]
+
+
+def message(pdu_type, request_id, value=None):
+    pdu = pdu_type()
+    P_MOD.apiPDU.set_defaults(pdu)
+    P_MOD.apiPDU.set_request_id(pdu, request_id)
+    P_MOD.apiPDU.set_varbinds(pdu, [(SYS_UPTIME, value or P_MOD.Null(""))])
+
+    msg = P_MOD.Message()
+    P_MOD.apiMessage.set_defaults(msg)
+    P_MOD.apiMessage.set_community(msg, "public")
+    P_MOD.apiMessage.set_pdu(msg, pdu)
+
+    return encoder.encode(msg)
+
+
+def request(request_id):
+    return message(P_MOD.GetRequestPDU, request_id)
+
+
+def response(request_id, value):
+    return message(P_MOD.GetResponsePDU, request_id, P_MOD.TimeTicks(value))
+
+
+@pytest.fixture
+def peer():
+    """Collect all requests, answer them in reverse order"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.connect(server.getsockname())
+    client.setblocking(False)
+
+    def serve(responses):
+        received = []
+
+        for _ in range(len(responses) + 1):
+            received.append(server.recvfrom(65535))
+
+        for (_, address), message in reversed(list(zip(received, responses))):
+            server.sendto(message, address)
+
+        # duplicate response is not matched to anything
+        server.sendto(responses[0], received[0][1])
+
+    def start(responses):
+        thread = threading.Thread(target=serve, args=(responses,))
+        thread.start()
+
+        return thread
+
+    yield client, start
+
+    client.close()
+    server.close()
+
+
+def test_collect_requests():
+    records = [
+        (1, 10.0, capture.REQUEST, (), (), request(1)),
+        (2, 10.5, capture.REQUEST, (), (), request(2)),
+        (1, 10.7, capture.RESPONSE, (), (), response(1, 100)),
+        (0, 10.8, capture.RESPONSE, (), (), response(2, 200)),
+    ]
+
+    assert replay._collect_requests(records, values=True) == [
+        (10.0, request(1), 1, (0, 0, (((1, 3, 6, 1, 2, 1, 1, 3, 0), b"C\x01d"),))),
+        (10.5, request(2), 2, None),
+    ]
+
+    assert replay._collect_requests(records)[0][3] == (
+        0,
+        0,
+        (((1, 3, 6, 1, 2, 1, 1, 3, 0), None),),
+    )
+
+
+def test_decode():
+    assert replay._decode(request(5))[0] == 5
+    assert replay._decode(b"garbage") == (None, None)
+
+    # request PDU carries no response contents
+    assert replay._contents(replay._decode(request(5))[1]) == (
+        0,
+        0,
+        (((1, 3, 6, 1, 2, 1, 1, 3, 0), None),),
+    )
+
+
+@pytest.mark.parametrize("values, mismatched", [(False, 0), (True, 1)])
+def test_replay(peer, values, mismatched):
+    client, start = peer
+
+    records = []
+
+    for request_id in (1, 2, 3):
+        records.append(
+            (
+                request_id,
+                request_id * 0.01,
+                capture.REQUEST,
+                (),
+                (),
+                request(request_id),
+            )
+        )
+        records.append(
+            (request_id, 0, capture.RESPONSE, (), (), response(request_id, 100))
+        )
+
+    requests = replay._collect_requests(records, values)
+
+    # third request is never responded
+    thread = start([response(1, 100), response(2, 200)])
+
+    latencies, lags, counters = replay._replay(client, requests, 1, 1, values)
+
+    thread.join()
+
+    assert len(latencies) == 2
+    assert len(lags) == 3
+
+    assert counters == {
+        "timed_out": 1,
+        "mismatched": mismatched,
+        "uncompared": 0,
+        "unmatched": 1,
+    }
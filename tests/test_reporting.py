@@ -0,0 +1,161 @@
+import collections
+import math
+import urllib.request
+
+import pytest
+
+from snmpsim.reporting.formats import base
+from snmpsim.reporting.formats import openmetrics
+from snmpsim.reporting.histogram import LogLinearHistogram
+from snmpsim.reporting.manager import ReportingManager
+
+
+class ListReporter(base.BaseReporter):
+    def __init__(self, *args):
+        self.updates = []
+        self.flushes = []
+
+    def update_metrics(self, **kwargs):
+        self.updates.append(kwargs)
+
+    def flush(self, force=False):
+        self.flushes.append(force)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setitem(ReportingManager.REPORTERS, "list", ListReporter)
+    monkeypatch.setattr(ReportingManager, "AGGREGATION_PERIOD", 3600)
+    monkeypatch.setattr(ReportingManager, "_updates", collections.deque())
+    monkeypatch.setattr(ReportingManager, "dropped", 0)
+
+    yield ReportingManager
+
+    ReportingManager.stop()
+
+
+def test_start(manager):
+    manager.configure("list")
+
+    # nothing collected until started past daemon forking
+    assert not manager.is_enabled()
+    assert manager._thread is None
+
+    manager.update_metrics(total_count=1)
+
+    manager.start()
+
+    assert manager.is_enabled()
+    assert manager._thread.name == "snmpsim-reporting"
+
+    manager.update_metrics(total_count=2)
+
+    reporter = manager._reporter
+
+    manager.stop()
+
+    assert not manager.is_enabled()
+    assert reporter.updates == [{"total_count": 2}]
+    assert reporter.flushes == [True]
+
+
+def test_queue_overflow(manager, monkeypatch):
+    monkeypatch.setattr(ReportingManager, "MAX_UPDATES", 3)
+
+    manager.configure("list")
+    manager.start()
+
+    for idx in range(5):
+        manager.update_metrics(total_count=idx)
+
+    reporter = manager._reporter
+
+    manager.stop()
+
+    assert reporter.updates == [{"total_count": idx} for idx in range(3)]
+    assert manager.dropped == 2
+
+
+def test_histogram_buckets():
+    histogram = LogLinearHistogram()
+
+    assert list(histogram.buckets()) == [
+        (bound, 0) for bound in LogLinearHistogram.BOUNDS + [math.inf]
+    ]
+
+    histogram.record(2.5e-6)
+    histogram.record(0.5)
+
+    buckets = list(histogram.buckets())
+
+    assert len(buckets) == len(LogLinearHistogram.BOUNDS) + 1
+    assert buckets[0] == (1e-6, 0)
+    assert buckets[2] == (3e-6, 1)
+    assert buckets[-1] == (math.inf, 2)
+
+    assert histogram.percentile(0.5) == 3e-6
+    assert histogram.percentile(1) == 0.5
+
+
+@pytest.mark.parametrize(
+    "value, bound",
+    [
+        (0, 1e-6),
+        (1e-7, 1e-6),
+        (1e-6, 1e-6),
+        (1.5e-6, 2e-6),
+        (2e-6, 2e-6),
+        (2.0000001e-6, 3e-6),
+        (1e-5, 1e-5),
+        (0.3, 0.3),
+        (0.7, 0.7),
+        (1, 1),
+        (9.5, 10),
+        (100, 100),
+        (100.5, math.inf),
+    ],
+)
+def test_histogram_bucket(value, bound):
+    index = LogLinearHistogram.bucket(value)
+
+    assert (LogLinearHistogram.BOUNDS + [math.inf])[index] == bound
+
+
+def test_openmetrics_reporter():
+    reporter = openmetrics.OpenMetricsReporter("127.0.0.1", "0")
+
+    url = "http://127.0.0.1:%s/metrics" % reporter._server.server_address[1]
+
+    # requests are not served until started past daemon forking
+    assert reporter._thread is None
+
+    reporter.start()
+
+    reporter.update_metrics(data_file="public", datafile_latency=0.5)
+
+    try:
+        first = urllib.request.urlopen(url, timeout=5).read().decode()
+
+        reporter.update_metrics(data_file="public", datafile_latency=5e-6)
+
+        second = urllib.request.urlopen(url, timeout=5).read().decode()
+
+    finally:
+        reporter._server.shutdown()
+        reporter._server.server_close()
+
+    def series(document):
+        return [line.split()[0] for line in document.splitlines() if "_bucket{" in line]
+
+    # same bucket series set on every scrape
+    assert series(first) == series(second)
+    assert len(series(first)) == len(LogLinearHistogram.BOUNDS) + 1
+
+    assert (
+        'snmpsim_datafile_latency_seconds_bucket{data_file="public",le="1e-06"} 0'
+        in second
+    )
+    assert (
+        'snmpsim_datafile_latency_seconds_bucket{data_file="public",le="+Inf"} 2'
+        in second
+    )
@@ -0,0 +1,264 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+from pyasn1.codec.ber import decoder
+from pyasn1.codec.ber import encoder
+from pysnmp.proto import api
+
+from snmpsim.rspcache import ResponseCache
+
+SYS_UPTIME = "1.3.6.1.2.1.1.3.0"
+SYS_CONTACT = "1.3.6.1.2.1.1.4.0"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    now = [1000.0]
+
+    monkeypatch.setattr("time.time", lambda: now[0])
+    monkeypatch.setattr(ResponseCache, "MAX_ENTRIES", ResponseCache.MAX_ENTRIES)
+    monkeypatch.setattr(ResponseCache, "TTL", ResponseCache.TTL)
+    monkeypatch.setattr(ResponseCache, "_entries", None)
+    monkeypatch.setattr(ResponseCache, "_mtimes", {})
+    monkeypatch.setattr(ResponseCache, "_sources", None)
+    monkeypatch.setattr(ResponseCache, "hits", 0)
+    monkeypatch.setattr(ResponseCache, "misses", 0)
+
+    path = tmp_path / "public.snmprec"
+    path.write_text("")
+
+    def build(key, *paths, cacheable=True):
+        """Simulate cache miss and response building"""
+        assert ResponseCache.lookup(key) is None
+
+        for data_file in paths:
+            ResponseCache.track(data_file, cacheable)
+
+        ResponseCache.store(key, 0, 0, b"response")
+
+    yield ResponseCache, now, str(path), build
+
+
+def test_lookup(cache):
+    cache, now, path, build = cache
+
+    cache.configure("2", "10")
+
+    build("a", path)
+
+    assert cache.lookup("a").var_binds == b"response"
+
+    build("b", path)
+    build("c", path)
+
+    # least recently used entry is evicted
+    assert cache.lookup("a") is None
+    assert cache.lookup("c") is not None
+
+    now[0] += 11
+
+    # expired
+    assert cache.lookup("c") is None
+
+    assert cache.hits == 2
+    assert cache.misses == 5
+
+
+def test_uncacheable(cache):
+    cache, now, path, build = cache
+
+    cache.configure()
+
+    # built from variated records
+    build("a", path, path, cacheable=False)
+    build("a", path)
+
+    # not built from data files at all
+    build("b")
+    build("b", path)
+
+    assert cache.lookup("a") is not None
+    assert cache.lookup("b") is not None
+
+
+def test_mtime_invalidation(cache):
+    cache, now, path, build = cache
+
+    cache.configure()
+
+    build("a", path)
+
+    os.utime(path, (now[0] + 5, now[0] + 5))
+
+    # modification time is not checked more often than STAT_INTERVAL
+    now[0] += cache.STAT_INTERVAL / 2
+
+    assert cache.lookup("a") is not None
+
+    now[0] += cache.STAT_INTERVAL
+
+    assert cache.lookup("a") is None
+
+    build("a", path)
+
+    now[0] += cache.STAT_INTERVAL * 2
+
+    assert cache.lookup("a") is not None
+
+    os.unlink(path)
+
+    now[0] += cache.STAT_INTERVAL * 2
+
+    assert cache.lookup("a") is None
+
+
+def message(oid, value, version=api.SNMP_VERSION_2C):
+    p_mod = api.PROTOCOL_MODULES[version]
+
+    pdu = p_mod.GetRequestPDU()
+    p_mod.apiPDU.set_defaults(pdu)
+    p_mod.apiPDU.set_varbinds(pdu, [(oid, value)])
+
+    msg = p_mod.Message()
+    p_mod.apiMessage.set_defaults(msg)
+    p_mod.apiMessage.set_community(msg, "public")
+    p_mod.apiMessage.set_pdu(msg, pdu)
+
+    return encoder.encode(msg)
+
+
+@pytest.fixture
+def responder(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+
+    path = data_dir / "public.snmprec"
+
+    mtime = [time.time() + 100]
+
+    def write(*lines):
+        path.write_text("".join(line + "\n" for line in lines))
+
+        # make data file look modified to both index and response cache
+        mtime[0] += 10
+        os.utime(path, (mtime[0], mtime[0]))
+
+    write("%s|67|100" % SYS_UPTIME)
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    log_path = tmp_path / "responder.log"
+
+    with open(log_path, "wb") as log_file:
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "snmpsim.commands.responder_lite",
+                "--data-dir=%s" % data_dir,
+                "--cache-dir=%s" % cache_dir,
+                "--agent-udpv4-endpoint=127.0.0.1:%s" % port,
+                "--response-cache",
+            ],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdout=subprocess.DEVNULL,
+            stderr=log_file,
+        )
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(0.5)
+
+    def get(oid, value=None, version=api.SNMP_VERSION_2C):
+        p_mod = api.PROTOCOL_MODULES[version]
+
+        request = message(oid, value or p_mod.Null(""), version)
+
+        for _ in range(20):
+            # simulator failed to start or crashed
+            if process.poll() is not None:
+                break
+
+            sock.sendto(request, ("127.0.0.1", port))
+
+            try:
+                response, _ = sock.recvfrom(65535)
+
+            except socket.timeout:
+                continue
+
+            msg, _ = decoder.decode(response, asn1Spec=p_mod.Message())
+
+            pdu = p_mod.apiMessage.get_pdu(msg)
+
+            return p_mod.apiPDU.get_varbinds(pdu)[0][1].prettyPrint()
+
+        pytest.fail(
+            "no response from simulator (exit code %s), its log:\n%s"
+            % (process.poll(), log_path.read_text(errors="replace"))
+        )
+
+    yield write, get
+
+    sock.close()
+
+    process.terminate()
+    process.wait()
+
+
+def test_modified_data_file(responder):
+    write, get = responder
+
+    assert get(SYS_UPTIME) == "100"
+
+    # now served from cache
+    assert get(SYS_UPTIME) == "100"
+
+    write("%s|67:numeric|rate=100,initial=1000" % SYS_UPTIME)
+
+    time.sleep(ResponseCache.STAT_INTERVAL + 0.1)
+
+    value = int(get(SYS_UPTIME))
+
+    assert value >= 1000
+
+    time.sleep(0.1)
+
+    # variated record response is not cached
+    assert int(get(SYS_UPTIME)) > value
+
+    write("%s|67|200" % SYS_UPTIME)
+
+    time.sleep(ResponseCache.STAT_INTERVAL + 0.1)
+
+    assert get(SYS_UPTIME) == "200"
+    assert get(SYS_UPTIME) == "200"
+
+    write("%s|67:numeric|rate=100,initial=1000" % SYS_UPTIME)
+
+    time.sleep(ResponseCache.STAT_INTERVAL + 0.1)
+
+    # no longer plain record is not served from cache
+    assert int(get(SYS_UPTIME)) >= 1000
+
+
+def test_request_values(responder):
+    write, get = responder
+
+    p_mod = api.PROTOCOL_MODULES[api.SNMP_VERSION_1]
+
+    # SNMPv1 error response echoes request values
+    assert (
+        get(SYS_CONTACT, p_mod.OctetString("leaked"), version=api.SNMP_VERSION_1)
+        == "leaked"
+    )
+
+    assert get(SYS_CONTACT, version=api.SNMP_VERSION_1) == ""
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+from pysnmp.carrier.asyncio.dgram import udp
+
+from snmpsim.rtxcache import RetransmissionCache
+
+PEER = ("127.0.0.1", 1161)
+
+
+@pytest.fixture
+def cache():
+    RetransmissionCache.configure("5", "100")
+    yield RetransmissionCache
+    RetransmissionCache._entries = RetransmissionCache._pending = None
+
+
+def test_replay(cache):
+    assert cache.lookup(udp.DOMAIN_NAME, PEER, b"request") is None
+
+    cache.store(udp.DOMAIN_NAME, PEER, b"response")
+
+    assert cache.lookup(udp.DOMAIN_NAME, PEER, b"request") == b"response"
+
+    # replay does not get cached
+    cache.store(udp.DOMAIN_NAME, PEER, b"other response")
+
+    assert cache.lookup(udp.DOMAIN_NAME, PEER, b"request") == b"response"
+
+    assert cache.lookup(udp.DOMAIN_NAME, PEER, b"other request") is None
+    assert cache.lookup(udp.DOMAIN_NAME, ("127.0.0.1", 1162), b"request") is None
+
+    local_peer = udp.UdpTransportAddress(PEER).set_local_address(("127.0.0.2", 161))
+
+    assert cache.lookup(udp.DOMAIN_NAME, local_peer, b"request") is None
+
+
+def test_expiration(cache, monkeypatch):
+    cache.lookup(udp.DOMAIN_NAME, PEER, b"request")
+    cache.store(udp.DOMAIN_NAME, PEER, b"response")
+
+    now = time.time() + RetransmissionCache.WINDOW
+
+    monkeypatch.setattr("time.time", lambda: now)
+
+    assert cache.lookup(udp.DOMAIN_NAME, PEER, b"request") is None
+
+
+def test_max_size(cache):
+    for idx in range(3):
+        request = b"request %d" % idx
+
+        cache.lookup(udp.DOMAIN_NAME, PEER, request)
+        cache.store(udp.DOMAIN_NAME, PEER, b"x" * 40)
+
+    assert cache.lookup(udp.DOMAIN_NAME, PEER, b"request 0") is None
+    assert cache.lookup(udp.DOMAIN_NAME, PEER, b"request 2") is not None
@@ -0,0 +1,189 @@
+import os
+
+import pytest
+from pysnmp.proto import rfc1902
+from pysnmp.smi import error
+
+from snmpsim import variation
+from snmpsim.rules import compile_rules
+
+VARIATION_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "snmpsim",
+    "variation",
+)
+
+SYS_NAME = rfc1902.ObjectName("1.3.6.1.2.1.1.5.0")
+
+
+@pytest.mark.parametrize(
+    "value, result",
+    [
+        (4, "below-5"),
+        (5, "below-10"),
+        (6, "below-10"),
+        (9, "below-10"),
+        (10, None),
+        (11, None),
+    ],
+)
+def test_lt(value, result):
+    rules = compile_rules("lt:10:below-10:lt:5:below-5", int, str)
+
+    assert rules.match(rfc1902.Integer32(value)) == result
+
+
+@pytest.mark.parametrize(
+    "value, result",
+    [
+        (4, None),
+        (5, None),
+        (6, "above-5"),
+        (10, "above-5"),
+        (11, "above-10"),
+    ],
+)
+def test_gt(value, result):
+    rules = compile_rules("gt:5:above-5:gt:10:above-10", int, str)
+
+    assert rules.match(rfc1902.Integer32(value)) == result
+
+
+@pytest.mark.parametrize(
+    "value, result",
+    [
+        (4, "below-5"),
+        (5, "is-5"),
+        (6, "below-10"),
+        (10, "is-10"),
+        (11, "above-10"),
+    ],
+)
+def test_rule_order(value, result):
+    # eq first, then lt, then gt
+    rules = compile_rules(
+        "gt:10:above-10:lt:10:below-10:lt:5:below-5:eq:5:is-5:eq:10:is-10", int, str
+    )
+
+    assert rules.match(rfc1902.Integer32(value)) == result
+
+
+def test_tie():
+    # same threshold once more overrides previous result
+    rules = compile_rules("lt:5:first:lt:5:second:eq:1:one:eq:1:uno", int, str)
+
+    assert rules.match(4) == "second"
+    assert rules.match(1) == "uno"
+
+
+def test_octet_string():
+    rules = compile_rules("eq:abc:is-abc:lt:b:below-b", rfc1902.OctetString, str)
+
+    assert rules.match(rfc1902.OctetString("abc")) == "is-abc"
+    assert rules.match(rfc1902.OctetString("abd")) == "below-b"
+    assert rules.match(rfc1902.OctetString("b")) is None
+
+    # not comparable with the thresholds
+    assert rules.match(rfc1902.Integer32(1), "default") == "default"
+
+
+def test_no_result():
+    rules = compile_rules("eq:1:gt:3", int)
+
+    assert rules.match(1) is True
+    assert rules.match(2) is None
+    assert rules.match(4) is True
+
+
+@pytest.mark.parametrize("rules", ["", "eq", "bogus:1:2", "lt:1"])
+def test_empty(rules):
+    rules = compile_rules(rules, int, str)
+
+    assert not rules
+    assert rules.match(1) is None
+    assert rules.match(1, "default") == "default"
+
+
+def load(name):
+    return variation.load_module(
+        os.path.join(VARIATION_DIR, name + ".py"),
+        alias="test-" + name,
+        args=None,
+        moduleContext={},
+    )
+
+
+def context(set_value=None):
+    return dict(
+        origOid=SYS_NAME,
+        origValue=set_value,
+        errorStatus=None,
+        nextFlag=False,
+        exactMatch=True,
+        setFlag=set_value is not None,
+        varsTotal=1,
+        varsRemaining=0,
+    )
+
+
+@pytest.fixture
+def delay(monkeypatch):
+    waits = []
+
+    monkeypatch.setattr("time.sleep", waits.append)
+
+    module = load("delay")
+
+    def variate(value, set_value=None):
+        module["recordContext"] = {}
+
+        oid, tag, value = module["variate"](SYS_NAME, "2", value, **context(set_value))
+
+        return waits.pop() * 1000
+
+    return variate
+
+
+@pytest.mark.parametrize(
+    "set_value, wait", [(4, 100), (5, 200), (6, 200), (10, 10), (11, 300), (20, 10)]
+)
+def test_delay_vlist(delay, set_value, wait):
+    value = "wait=10,vlist=lt:5:100:lt:10:200:gt:10:300:eq:20:10"
+
+    assert delay(value, rfc1902.Integer32(set_value)) == pytest.approx(wait)
+
+
+@pytest.mark.parametrize(
+    "now, wait", [(999, 100), (1000, 200), (1001, 300), (1002, 300)]
+)
+def test_delay_tlist(delay, monkeypatch, now, wait):
+    monkeypatch.setattr("time.time", lambda: now)
+
+    value = "wait=10,tlist=lt:1000:100:eq:1000:200:gt:1000:300"
+
+    assert delay(value) == pytest.approx(wait)
+
+
+def test_delay_default(delay):
+    assert delay("wait=10,vlist=eq:1:100", rfc1902.Integer32(2)) == pytest.approx(10)
+
+
+@pytest.mark.parametrize(
+    "set_value, exc",
+    [(0, error.WrongValueError), (1, None), (5, None), (10, error.NoAccessError)],
+)
+def test_error_vlist(set_value, exc):
+    module = load("error")
+
+    module["recordContext"] = {}
+
+    value = "op=set,vlist=lt:1:wrongvalue:gt:9:noaccess"
+
+    if exc:
+        with pytest.raises(exc):
+            module["variate"](
+                SYS_NAME, "2", value, **context(rfc1902.Integer32(set_value))
+            )
+
+    else:
+        module["variate"](SYS_NAME, "2", value, **context(rfc1902.Integer32(set_value)))